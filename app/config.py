@@ -37,6 +37,10 @@ class Settings(BaseSettings):
     CHANNEL_SUB_ID: Optional[str] = None
     CHANNEL_LINK: Optional[str] = None
     CHANNEL_IS_REQUIRED_SUB: bool = False
+    CHANNEL_MEMBERSHIP_POSITIVE_TTL: int = 600
+    CHANNEL_MEMBERSHIP_NEGATIVE_TTL: int = 60
+    CHANNEL_MEMBERSHIP_CACHE_SIZE: int = 10000
+    CHANNEL_MEMBERSHIP_RECHECK_RATE: float = 20.0
     
     DATABASE_URL: Optional[str] = None
     
@@ -50,8 +54,21 @@ class Settings(BaseSettings):
     LOCALES_PATH: str = "./locales"
     
     DATABASE_MODE: str = "auto"
+
+    DATABASE_POOL_MODE: str = "auto"  # auto, queue, null
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_POOL_MAX_OVERFLOW: int = 20
+    DATABASE_POOL_TIMEOUT: int = 30
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_POOL_SLOW_CHECKOUT_MS: int = 500
+
+    USER_ACTIVITY_FLUSH_INTERVAL: int = 30
     
     REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_LOCAL_MAX_ENTRIES: int = 2000
+    CACHE_LOCAL_TTL_SECONDS: int = 30
+    CACHE_KEY_PREFIX: str = "cache"
     
     REMNAWAVE_API_URL: Optional[str] = None
     REMNAWAVE_API_KEY: Optional[str] = None
@@ -62,6 +79,21 @@ class Settings(BaseSettings):
     REMNAWAVE_AUTH_TYPE: str = "api_key"
     REMNAWAVE_USER_DESCRIPTION_TEMPLATE: str = "Bot user: {full_name} {username}"
     REMNAWAVE_USER_DELETE_MODE: str = "delete"  # "delete" или "disable"
+    REMNAWAVE_API_CONNECTION_LIMIT: int = 100
+    REMNAWAVE_API_CONNECTION_LIMIT_PER_HOST: int = 20
+    REMNAWAVE_API_KEEPALIVE_TIMEOUT: int = 30
+    REMNAWAVE_API_DNS_CACHE_TTL: int = 300
+    REMNAWAVE_API_READ_TIMEOUT: int = 10
+    REMNAWAVE_API_HEAVY_READ_TIMEOUT: int = 30
+    REMNAWAVE_API_WRITE_TIMEOUT: int = 20
+    REMNAWAVE_API_RETRY_ATTEMPTS: int = 2
+    REMNAWAVE_API_RETRY_BACKOFF_SECONDS: float = 0.5
+    REMNAWAVE_API_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    REMNAWAVE_API_CIRCUIT_RECOVERY_SECONDS: int = 30
+    REMNAWAVE_SYNC_PAGE_SIZE: int = 100
+    REMNAWAVE_SYNC_CONCURRENCY: int = 4
+    REMNAWAVE_SYNC_CHUNK_SIZE: int = 500
+    REMNAWAVE_PUSH_CONCURRENCY: int = 8
     
     TRIAL_DURATION_DAYS: int = 3
     TRIAL_TRAFFIC_LIMIT_GB: int = 10
@@ -81,6 +113,16 @@ class Settings(BaseSettings):
     MONITORING_LOGS_RETENTION_DAYS: int = 30
     NOTIFICATION_CACHE_HOURS: int = 24
 
+    BROADCAST_RATE_LIMIT: float = 25.0
+    BROADCAST_CONCURRENCY: int = 10
+    BROADCAST_MAX_RETRIES: int = 3
+
+    THROTTLING_MESSAGE_LIMIT: int = 1
+    THROTTLING_MESSAGE_WINDOW_SECONDS: float = 0.5
+    THROTTLING_CALLBACK_LIMIT: int = 1
+    THROTTLING_CALLBACK_WINDOW_SECONDS: float = 0.5
+    THROTTLING_BACKEND: str = "local"
+
     SERVER_STATUS_MODE: str = "disabled"
     SERVER_STATUS_EXTERNAL_URL: Optional[str] = None
     SERVER_STATUS_METRICS_URL: Optional[str] = None
@@ -135,6 +177,15 @@ class Settings(BaseSettings):
     MIN_BALANCE_FOR_AUTOPAY_KOPEKS: int = 10000  
     
     MONITORING_INTERVAL: int = 60
+    MONITORING_NOTIFICATION_CONCURRENCY: int = 5
+    MONITORING_MAX_CONCURRENT_JOBS: int = 3
+    MONITORING_JOB_TIMEOUT_SECONDS: int = 900
+    MONITORING_JOB_INTERVALS: str = ""
+    MONITORING_EXPIRY_BATCH_SIZE: int = 500
+    MONITORING_AUTOPAY_BATCH_SIZE: int = 100
+    MONITORING_AUTOPAY_CONCURRENCY: int = 5
+    MONITORING_COORDINATION: str = "none"
+    MONITORING_LEADER_LEASE_SECONDS: int = 60
     INACTIVE_USER_DELETE_MONTHS: int = 3
 
     MAINTENANCE_MODE: bool = False
@@ -383,6 +434,14 @@ class Settings(BaseSettings):
     def is_sqlite(self) -> bool:
         """Проверяет, используется ли SQLite"""
         return "sqlite" in self.get_database_url()
+
+    def get_database_pool_mode(self) -> str:
+        """Возвращает режим пула соединений: 'queue' или 'null'"""
+        mode = (self.DATABASE_POOL_MODE or "auto").strip().lower()
+        if mode in {"null", "nullpool", "none", "disabled", "pgbouncer"}:
+            return "null"
+        # SQLite не выигрывает от пула и плохо переносит конкурентные соединения
+        return "null" if self.is_sqlite() else "queue"
     
     def is_admin(self, user_id: int) -> bool:
         return user_id in self.get_admin_ids()
@@ -462,6 +521,20 @@ class Settings(BaseSettings):
         except (ValueError, AttributeError):
             return [3, 1]
     
+    def get_monitoring_job_intervals(self) -> Dict[str, int]:
+        intervals: Dict[str, int] = {}
+        raw = self.MONITORING_JOB_INTERVALS or ""
+        for item in raw.split(','):
+            name, _, minutes = item.partition('=')
+            name = name.strip()
+            if not name or not minutes.strip():
+                continue
+            try:
+                intervals[name] = max(1, int(minutes.strip()))
+            except ValueError:
+                continue
+        return intervals
+
     def get_available_languages(self) -> List[str]:
         try:
             langs = self.AVAILABLE_LANGUAGES
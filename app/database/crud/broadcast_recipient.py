@@ -0,0 +1,342 @@
+import logging
+from datetime import datetime, timedelta
+from typing import AsyncIterable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import bindparam, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import BroadcastHistory, BroadcastRecipient
+
+
+logger = logging.getLogger(__name__)
+
+
+RECIPIENT_PENDING = "pending"
+RECIPIENT_CLAIMED = "claimed"
+RECIPIENT_SENDING = "sending"
+RECIPIENT_SENT = "sent"
+RECIPIENT_FAILED = "failed"
+
+# Этапы BroadcastHistory.recipients_phase
+RECIPIENTS_MATERIALIZING = "materializing"
+RECIPIENTS_MATERIALIZED = "materialized"
+
+TelegramIds = Union[Iterable[int], AsyncIterable[int]]
+
+
+def _insert_ignore_duplicates(db: AsyncSession):
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(BroadcastRecipient.__table__)
+    return dialect_insert(BroadcastRecipient.__table__).on_conflict_do_nothing(
+        index_elements=["broadcast_id", "telegram_id"]
+    )
+
+
+async def materialize_broadcast_recipients(
+    db: AsyncSession,
+    broadcast_id: int,
+    telegram_ids: TelegramIds,
+    chunk_size: int = 1000,
+) -> int:
+    """Сохраняет получателей рассылки пачками; повторный вызов не создаёт дублей.
+
+    Каждая пачка фиксируется отдельно, поэтому после сбоя список может быть
+    неполным: вызывающий код отмечает recipients_phase=materialized только
+    после успешного завершения и до этого повторяет вызов при возобновлении.
+    """
+
+    total = 0
+    chunk: List[Dict[str, object]] = []
+
+    async def flush() -> None:
+        nonlocal total
+        if not chunk:
+            return
+        await db.execute(_insert_ignore_duplicates(db), chunk)
+        await db.commit()
+        total += len(chunk)
+        chunk.clear()
+
+    if isinstance(telegram_ids, AsyncIterable):
+        async for telegram_id in telegram_ids:
+            chunk.append({"broadcast_id": broadcast_id, "telegram_id": telegram_id, "status": RECIPIENT_PENDING})
+            if len(chunk) >= chunk_size:
+                await flush()
+    else:
+        for telegram_id in telegram_ids:
+            chunk.append({"broadcast_id": broadcast_id, "telegram_id": telegram_id, "status": RECIPIENT_PENDING})
+            if len(chunk) >= chunk_size:
+                await flush()
+
+    await flush()
+    return total
+
+
+async def claim_pending_recipients(
+    db: AsyncSession,
+    broadcast_id: int,
+    limit: int = 100,
+) -> List[Tuple[int, int]]:
+    """Атомарно переводит следующую пачку получателей в статус claimed и возвращает (id, telegram_id).
+
+    Обновляются только строки, всё ещё находящиеся в pending, поэтому одну
+    строку не заберут два процесса. claimed означает, что отправка ещё не
+    начиналась: перед самой отправкой получатель переводится в sending
+    (mark_recipient_sending).
+    """
+
+    candidates = (
+        select(BroadcastRecipient.id)
+        .where(
+            BroadcastRecipient.broadcast_id == broadcast_id,
+            BroadcastRecipient.status == RECIPIENT_PENDING,
+        )
+        .order_by(BroadcastRecipient.id)
+        .limit(limit)
+    )
+    if db.bind.dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    claim = (
+        update(BroadcastRecipient)
+        .where(
+            BroadcastRecipient.id.in_(candidates.scalar_subquery()),
+            BroadcastRecipient.status == RECIPIENT_PENDING,
+        )
+        .values(status=RECIPIENT_CLAIMED, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+    if db.bind.dialect.update_returning:
+        result = await db.execute(claim.returning(BroadcastRecipient.id, BroadcastRecipient.telegram_id))
+        rows = sorted((row.id, row.telegram_id) for row in result)
+    else:
+        rows = []
+        result = await db.execute(candidates.add_columns(BroadcastRecipient.telegram_id))
+        for recipient_id, telegram_id in result.all():
+            claimed = await db.execute(
+                update(BroadcastRecipient)
+                .where(
+                    BroadcastRecipient.id == recipient_id,
+                    BroadcastRecipient.status == RECIPIENT_PENDING,
+                )
+                .values(status=RECIPIENT_CLAIMED, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            if claimed.rowcount:
+                rows.append((recipient_id, telegram_id))
+
+    await db.commit()
+    return rows
+
+
+async def mark_recipient_sending(db: AsyncSession, recipient_id: int) -> None:
+    """Отмечает начало отправки: после сбоя такой получатель не получит сообщение повторно."""
+
+    await db.execute(
+        update(BroadcastRecipient)
+        .where(
+            BroadcastRecipient.id == recipient_id,
+            BroadcastRecipient.status == RECIPIENT_CLAIMED,
+        )
+        .values(status=RECIPIENT_SENDING, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def record_recipient_results(
+    db: AsyncSession,
+    broadcast_id: int,
+    results: Sequence[Tuple[int, bool, Optional[str]]],
+) -> None:
+    """Записывает итоги пачки отправок и увеличивает счётчики рассылки одной транзакцией.
+
+    Каждый элемент — (recipient_id, success, error).
+    """
+
+    if not results:
+        return
+
+    now = datetime.utcnow()
+    recipients_table = BroadcastRecipient.__table__
+
+    await db.execute(
+        update(recipients_table)
+        .where(recipients_table.c.id == bindparam("b_id"))
+        .values(
+            status=bindparam("b_status"),
+            error=bindparam("b_error"),
+            updated_at=now,
+        ),
+        [
+            {
+                "b_id": recipient_id,
+                "b_status": RECIPIENT_SENT if success else RECIPIENT_FAILED,
+                "b_error": (error or "")[:255] or None,
+            }
+            for recipient_id, success, error in results
+        ],
+    )
+
+    sent = sum(1 for _, success, _ in results if success)
+    failed = len(results) - sent
+    await db.execute(
+        update(BroadcastHistory)
+        .where(BroadcastHistory.id == broadcast_id)
+        .values(
+            sent_count=func.coalesce(BroadcastHistory.sent_count, 0) + sent,
+            failed_count=func.coalesce(BroadcastHistory.failed_count, 0) + failed,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def fail_interrupted_recipients(db: AsyncSession, broadcast_id: int) -> int:
+    """Разбирает получателей, оставшихся после сбоя процесса-владельца рассылки.
+
+    claimed (отправка не начиналась) возвращаются в pending, sending (сообщение
+    могло уйти) помечаются неуспешными. Вызывать только после захвата рассылки
+    (acquire_broadcast), чтобы не задеть пачку живого процесса.
+    """
+
+    now = datetime.utcnow()
+    await db.execute(
+        update(BroadcastRecipient)
+        .where(
+            BroadcastRecipient.broadcast_id == broadcast_id,
+            BroadcastRecipient.status == RECIPIENT_CLAIMED,
+        )
+        .values(status=RECIPIENT_PENDING, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+    result = await db.execute(
+        update(BroadcastRecipient)
+        .where(
+            BroadcastRecipient.broadcast_id == broadcast_id,
+            BroadcastRecipient.status == RECIPIENT_SENDING,
+        )
+        .values(
+            status=RECIPIENT_FAILED,
+            error="interrupted",
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    interrupted = result.rowcount or 0
+
+    if interrupted:
+        await db.execute(
+            update(BroadcastHistory)
+            .where(BroadcastHistory.id == broadcast_id)
+            .values(failed_count=func.coalesce(BroadcastHistory.failed_count, 0) + interrupted)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    return interrupted
+
+
+async def release_unsent_recipients(db: AsyncSession, recipient_ids: Sequence[int]) -> None:
+    """Возвращает в очередь получателей, которым отправка так и не начиналась."""
+
+    if not recipient_ids:
+        return
+
+    await db.execute(
+        update(BroadcastRecipient)
+        .where(
+            BroadcastRecipient.id.in_(list(recipient_ids)),
+            BroadcastRecipient.status == RECIPIENT_CLAIMED,
+        )
+        .values(status=RECIPIENT_PENDING, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+def _owner_is_free(owner_id: str, stale_after: timedelta, now: datetime):
+    return or_(
+        BroadcastHistory.owner_id.is_(None),
+        BroadcastHistory.owner_id == owner_id,
+        BroadcastHistory.heartbeat_at.is_(None),
+        BroadcastHistory.heartbeat_at < now - stale_after,
+    )
+
+
+async def acquire_broadcast(
+    db: AsyncSession,
+    broadcast_id: int,
+    owner_id: str,
+    stale_after: timedelta,
+) -> bool:
+    """Закрепляет рассылку за процессом, если у неё нет живого владельца."""
+
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(BroadcastHistory)
+        .where(
+            BroadcastHistory.id == broadcast_id,
+            _owner_is_free(owner_id, stale_after, now),
+        )
+        .values(owner_id=owner_id, heartbeat_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return bool(result.rowcount)
+
+
+async def touch_broadcast(db: AsyncSession, broadcast_id: int, owner_id: str) -> Optional[str]:
+    """Продлевает владение рассылкой; возвращает её статус или None, если владение потеряно."""
+
+    result = await db.execute(
+        update(BroadcastHistory)
+        .where(
+            BroadcastHistory.id == broadcast_id,
+            BroadcastHistory.owner_id == owner_id,
+        )
+        .values(heartbeat_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    if not result.rowcount:
+        return None
+
+    status = await db.execute(select(BroadcastHistory.status).where(BroadcastHistory.id == broadcast_id))
+    return status.scalar_one_or_none()
+
+
+async def release_broadcast(db: AsyncSession, broadcast_id: int, owner_id: str) -> None:
+    await db.execute(
+        update(BroadcastHistory)
+        .where(
+            BroadcastHistory.id == broadcast_id,
+            BroadcastHistory.owner_id == owner_id,
+        )
+        .values(owner_id=None, heartbeat_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+def broadcast_has_live_owner(broadcast: BroadcastHistory, stale_after: timedelta) -> bool:
+    return bool(
+        broadcast.owner_id
+        and broadcast.heartbeat_at
+        and broadcast.heartbeat_at >= datetime.utcnow() - stale_after
+    )
+
+
+async def count_broadcast_recipients(db: AsyncSession, broadcast_id: int) -> Dict[str, int]:
+    result = await db.execute(
+        select(BroadcastRecipient.status, func.count(BroadcastRecipient.id))
+        .where(BroadcastRecipient.broadcast_id == broadcast_id)
+        .group_by(BroadcastRecipient.status)
+    )
+    return {status: count for status, count in result.all()}
@@ -0,0 +1,159 @@
+import logging
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.database.models import Subscription, SubscriptionStatus, User, UserStatus
+
+
+logger = logging.getLogger(__name__)
+
+
+EXPIRING_DAYS = 3
+
+
+def _subscription_is_active(now: datetime) -> ColumnElement:
+    return and_(
+        Subscription.status == SubscriptionStatus.ACTIVE.value,
+        Subscription.end_date > now,
+    )
+
+
+def _zero_traffic() -> ColumnElement:
+    return func.coalesce(Subscription.traffic_used_gb, 0) <= 0
+
+
+def _custom_condition(criteria: str, now: datetime) -> Optional[ColumnElement]:
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+
+    conditions = {
+        "today": User.created_at >= today,
+        "week": User.created_at >= week_ago,
+        "month": User.created_at >= month_ago,
+        "active_today": User.last_activity >= today,
+        "inactive_week": User.last_activity < week_ago,
+        "inactive_month": User.last_activity < month_ago,
+        "referrals": User.referred_by_id.isnot(None),
+        "direct": User.referred_by_id.is_(None),
+    }
+    return conditions.get(criteria)
+
+
+def build_target_condition(target: str, now: Optional[datetime] = None) -> Optional[ColumnElement]:
+    """Возвращает SQL-условие сегмента рассылки или None для неизвестного сегмента.
+
+    Условие рассчитано на выборку из users с LEFT JOIN subscriptions.
+    """
+
+    now = now or datetime.utcnow()
+    active_user = User.status == UserStatus.ACTIVE.value
+
+    if target.startswith("custom_"):
+        condition = _custom_condition(target[len("custom_"):], now)
+        return and_(active_user, condition) if condition is not None else None
+
+    is_active = _subscription_is_active(now)
+
+    if target == "all":
+        return active_user
+
+    if target == "active":
+        return and_(active_user, is_active, Subscription.is_trial.is_(False))
+
+    if target == "trial":
+        return and_(active_user, Subscription.is_trial.is_(True))
+
+    if target == "no":
+        return and_(
+            active_user,
+            or_(
+                Subscription.id.is_(None),
+                Subscription.status != SubscriptionStatus.ACTIVE.value,
+                Subscription.end_date <= now,
+            ),
+        )
+
+    if target == "expiring":
+        return and_(
+            active_user,
+            is_active,
+            Subscription.end_date <= now + timedelta(days=EXPIRING_DAYS),
+        )
+
+    if target == "expired":
+        return and_(
+            active_user,
+            or_(
+                Subscription.status.in_(
+                    [SubscriptionStatus.EXPIRED.value, SubscriptionStatus.DISABLED.value]
+                ),
+                Subscription.end_date <= now,
+                and_(
+                    Subscription.id.is_(None),
+                    User.has_had_paid_subscription.is_(True),
+                ),
+            ),
+        )
+
+    if target == "active_zero":
+        return and_(active_user, is_active, Subscription.is_trial.is_(False), _zero_traffic())
+
+    if target == "trial_zero":
+        return and_(active_user, is_active, Subscription.is_trial.is_(True), _zero_traffic())
+
+    if target == "zero":
+        return and_(active_user, is_active, _zero_traffic())
+
+    return None
+
+
+async def count_target_users(db: AsyncSession, target: str) -> int:
+    condition = build_target_condition(target)
+    if condition is None:
+        return 0
+
+    result = await db.execute(
+        select(func.count(User.id))
+        .select_from(User)
+        .outerjoin(Subscription, Subscription.user_id == User.id)
+        .where(condition)
+    )
+    return result.scalar() or 0
+
+
+async def iter_target_telegram_ids(
+    db: AsyncSession,
+    target: str,
+    chunk_size: int = 1000,
+) -> AsyncIterator[int]:
+    """Отдаёт telegram_id получателей сегмента, читая их пачками по users.id."""
+
+    condition = build_target_condition(target)
+    if condition is None:
+        logger.warning("Неизвестный сегмент рассылки: %s", target)
+        return
+
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(User.id, User.telegram_id)
+            .outerjoin(Subscription, Subscription.user_id == User.id)
+            .where(condition, User.id > last_id)
+            .order_by(User.id)
+            .limit(chunk_size)
+        )
+        rows = result.all()
+        if not rows:
+            return
+
+        for row in rows:
+            yield row.telegram_id
+
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1].id
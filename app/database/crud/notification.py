@@ -1,5 +1,5 @@
 import logging
-from typing import Optional
+from typing import Iterable, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 
@@ -43,6 +43,31 @@ async def record_notification(
     await db.commit()
 
 
+async def record_notifications(
+    db: AsyncSession,
+    notifications: Iterable[Tuple[int, int, str, Optional[int]]],
+) -> int:
+    """Записывает пачку отправленных уведомлений одной транзакцией.
+
+    Каждый элемент — (user_id, subscription_id, notification_type, days_before).
+    """
+    rows = [
+        SentNotification(
+            user_id=user_id,
+            subscription_id=subscription_id,
+            notification_type=notification_type,
+            days_before=days_before,
+        )
+        for user_id, subscription_id, notification_type, days_before in notifications
+    ]
+    if not rows:
+        return 0
+
+    db.add_all(rows)
+    await db.commit()
+    return len(rows)
+
+
 async def clear_notifications(db: AsyncSession, subscription_id: int) -> None:
     await db.execute(
         delete(SentNotification).where(
@@ -5,7 +5,9 @@ from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.database.crud.server_squad import SERVER_SQUADS_CACHE_TAG
 from app.database.models import PromoGroup, User
+from app.utils.cache import cache
 
 
 def _normalize_period_discounts(period_discounts: Optional[Dict[int, int]]) -> Dict[int, int]:
@@ -216,6 +218,8 @@ async def delete_promo_group(db: AsyncSession, group: PromoGroup) -> bool:
     )
     await db.delete(group)
     await db.commit()
+    # Кешированные данные серверов содержат список разрешённых промогрупп
+    await cache.invalidate_tags(SERVER_SQUADS_CACHE_TAG)
 
     logger.info(
         "Промогруппа '%s' (id=%s) удалена, пользователи переведены в '%s'",
@@ -17,10 +17,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database.models import PromoGroup, ServerSquad, SubscriptionServer, Subscription, User
+from app.utils.cache import cache, cached_function
 
 logger = logging.getLogger(__name__)
 
 
+SERVER_SQUADS_CACHE_TAG = "server_squads"
+
+
 async def _get_default_promo_group_id(db: AsyncSession) -> Optional[int]:
     result = await db.execute(
         select(PromoGroup.id).where(PromoGroup.is_default.is_(True)).limit(1)
@@ -76,6 +80,7 @@ async def create_server_squad(
     db.add(server_squad)
     await db.commit()
     await db.refresh(server_squad)
+    await cache.invalidate_tags(SERVER_SQUADS_CACHE_TAG)
     
     logger.info(f"✅ Создан сервер {display_name} (UUID: {squad_uuid})")
     return server_squad
@@ -94,6 +99,29 @@ async def get_server_squad_by_uuid(
     return result.scalars().unique().one_or_none()
 
 
+@cached_function("server_squad_info", expire=600, tags=(SERVER_SQUADS_CACHE_TAG,))
+async def get_server_squad_info(db: AsyncSession, squad_uuid: str) -> Optional[dict]:
+    """Кешируемые данные сервера для отображения и проверок доступа.
+
+    Для изменения сервера используйте get_server_squad_by_uuid.
+    """
+
+    server = await get_server_squad_by_uuid(db, squad_uuid)
+    if not server:
+        return None
+
+    return {
+        "id": server.id,
+        "squad_uuid": server.squad_uuid,
+        "display_name": server.display_name,
+        "country_code": server.country_code,
+        "price_kopeks": server.price_kopeks,
+        "is_available": server.is_available,
+        "is_full": server.is_full,
+        "allowed_promo_group_ids": [group.id for group in server.allowed_promo_groups],
+    }
+
+
 async def get_server_squad_by_id(
     db: AsyncSession, 
     server_id: int
@@ -180,6 +208,7 @@ async def update_server_squad_promo_groups(
     server.allowed_promo_groups = promo_groups
     await db.commit()
     await db.refresh(server)
+    await cache.invalidate_tags(SERVER_SQUADS_CACHE_TAG)
 
     logger.info(
         "Обновлены промогруппы сервера %s (ID: %s): %s",
@@ -214,6 +243,7 @@ async def update_server_squad(
     )
     
     await db.commit()
+    await cache.invalidate_tags(SERVER_SQUADS_CACHE_TAG)
     
     return await get_server_squad_by_id(db, server_id)
 
@@ -234,6 +264,7 @@ async def delete_server_squad(db: AsyncSession, server_id: int) -> bool:
         delete(ServerSquad).where(ServerSquad.id == server_id)
     )
     await db.commit()
+    await cache.invalidate_tags(SERVER_SQUADS_CACHE_TAG)
     
     logger.info(f"🗑️ Удален сервер (ID: {server_id})")
     return True
@@ -351,6 +382,7 @@ async def sync_with_remnawave(
             )
 
     await db.commit()
+    await cache.invalidate_tags(SERVER_SQUADS_CACHE_TAG)
 
     logger.info(f"🔄 Синхронизация завершена: +{created} ~{updated} -{removed}")
     return created, updated, removed
@@ -429,6 +461,7 @@ def _extract_country_code(original_name: str) -> Optional[str]:
     return None
 
 
+@cached_function("server_statistics", expire=60, tags=("statistics", SERVER_SQUADS_CACHE_TAG))
 async def get_server_statistics(db: AsyncSession) -> dict:
     
     total_result = await db.execute(select(func.count(ServerSquad.id)))
@@ -486,6 +519,7 @@ async def add_user_to_servers(
             )
         
         await db.commit()
+        await cache.invalidate_tags(SERVER_SQUADS_CACHE_TAG)
         logger.info(f"✅ Увеличен счетчик пользователей для серверов: {server_squad_ids}")
         return True
         
@@ -509,6 +543,7 @@ async def remove_user_from_servers(
             )
         
         await db.commit()
+        await cache.invalidate_tags(SERVER_SQUADS_CACHE_TAG)
         logger.info(f"✅ Уменьшен счетчик пользователей для серверов: {server_squad_ids}")
         return True
         
@@ -561,6 +596,7 @@ async def sync_server_user_counts(db: AsyncSession) -> int:
             updated_count += 1
         
         await db.commit()
+        await cache.invalidate_tags(SERVER_SQUADS_CACHE_TAG)
         logger.info(f"✅ Синхронизированы счетчики для {updated_count} серверов")
         return updated_count
         
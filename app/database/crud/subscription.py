@@ -1,11 +1,12 @@
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, List, Tuple
-from sqlalchemy import select, and_, func
+from typing import AsyncIterator, Iterable, Optional, List, Tuple
+from sqlalchemy import select, update, and_, or_, case, exists, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 
 from app.database.models import (
+    SentNotification,
     Subscription,
     SubscriptionStatus,
     User,
@@ -13,6 +14,7 @@ from app.database.models import (
     PromoGroup,
 )
 from app.database.crud.notification import clear_notifications
+from app.utils.cache import cached_function
 from app.utils.pricing_utils import calculate_months_from_days, get_remaining_months
 from app.config import settings
 
@@ -275,6 +277,53 @@ async def deactivate_subscription(
     return subscription
 
 
+async def get_pending_expiring_notifications(
+    db: AsyncSession,
+    warning_days: Iterable[int],
+    now: Optional[datetime] = None
+) -> List[Tuple[Subscription, int]]:
+    """Платные подписки, которым пора отправить предупреждение об истечении.
+
+    Одним запросом для каждой подписки выбирается самый срочный порог из
+    warning_days и отбрасываются подписки, по которым уведомление для этого
+    порога уже записано в sent_notifications.
+    """
+
+    days = sorted(set(warning_days))
+    if not days:
+        return []
+
+    current_time = now or datetime.utcnow()
+
+    bucket = case(
+        *[
+            (Subscription.end_date <= current_time + timedelta(days=day), day)
+            for day in days
+        ]
+    )
+    already_sent = exists().where(
+        SentNotification.subscription_id == Subscription.id,
+        SentNotification.user_id == Subscription.user_id,
+        SentNotification.notification_type == "expiring",
+        SentNotification.days_before == bucket,
+    )
+
+    result = await db.execute(
+        select(Subscription, bucket.label("days"))
+        .options(joinedload(Subscription.user))
+        .where(
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+            Subscription.is_trial == False,
+            Subscription.end_date > current_time,
+            Subscription.end_date <= current_time + timedelta(days=days[-1]),
+            ~already_sent,
+        )
+        .order_by(Subscription.end_date)
+    )
+
+    return [(subscription, day) for subscription, day in result.all()]
+
+
 async def get_expiring_subscriptions(
     db: AsyncSession,
     days_before: int = 3
@@ -311,32 +360,194 @@ async def get_expired_subscriptions(db: AsyncSession) -> List[Subscription]:
     return result.scalars().all()
 
 
+async def expire_overdue_subscriptions(
+    db: AsyncSession,
+    now: Optional[datetime] = None,
+    batch_size: int = 500,
+) -> List[Tuple[int, int]]:
+    """Переводит пачку просроченных активных подписок в EXPIRED одним UPDATE.
+
+    Возвращает пары (subscription_id, user_id) изменённых подписок; пустой
+    список означает, что просроченных подписок не осталось.
+    """
+
+    now = now or datetime.utcnow()
+
+    overdue_ids = (
+        select(Subscription.id)
+        .where(
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+            Subscription.end_date <= now,
+        )
+        .order_by(Subscription.id)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+
+    result = await db.execute(
+        update(Subscription)
+        .where(
+            Subscription.id.in_(overdue_ids),
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+        )
+        .values(status=SubscriptionStatus.EXPIRED.value, updated_at=now)
+        .returning(Subscription.id, Subscription.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    expired = [(row.id, row.user_id) for row in result]
+    await db.commit()
+
+    if expired:
+        logger.info(f"⏰ {len(expired)} подписок помечены как истёкшие")
+
+    return expired
+
+
+async def _autopay_due_conditions(
+    db: AsyncSession,
+    now: datetime,
+    include_overdue: bool = False,
+) -> Optional[list]:
+    """Строит SQL-условие «пора автопродлевать» для каждой подписки.
+
+    Подписка готова, когда (end_date - now).days <= autopay_days_before, т.е.
+    end_date < now + (autopay_days_before + 1) дней. Значений
+    autopay_days_before немного, поэтому условие собирается как OR по ним и
+    одинаково работает в PostgreSQL и SQLite.
+    """
+
+    base_conditions = [
+        Subscription.status == SubscriptionStatus.ACTIVE.value,
+        Subscription.autopay_enabled == True,
+        Subscription.is_trial == False,
+    ]
+
+    days_result = await db.execute(
+        select(Subscription.autopay_days_before)
+        .where(*base_conditions, Subscription.autopay_days_before.isnot(None))
+        .distinct()
+    )
+    days_values = [int(value) for value in days_result.scalars().all()]
+    if not days_values:
+        return None
+
+    conditions = list(base_conditions)
+    conditions.append(Subscription.end_date < now + timedelta(days=max(days_values) + 1))
+    conditions.append(
+        or_(
+            *(
+                and_(
+                    Subscription.autopay_days_before == days,
+                    Subscription.end_date < now + timedelta(days=days + 1),
+                )
+                for days in days_values
+            )
+        )
+    )
+    if not include_overdue:
+        conditions.append(Subscription.end_date > now)
+
+    return conditions
+
+
 async def get_subscriptions_for_autopay(db: AsyncSession) -> List[Subscription]:
     current_time = datetime.utcnow()
-    
+
+    conditions = await _autopay_due_conditions(db, current_time)
+    if conditions is None:
+        return []
+
     result = await db.execute(
         select(Subscription)
         .options(selectinload(Subscription.user))
-        .where(
-            and_(
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.autopay_enabled == True,
-                Subscription.is_trial == False 
-            )
-        )
+        .where(*conditions)
+        .order_by(Subscription.end_date)
     )
-    all_autopay_subscriptions = result.scalars().all()
-    
-    ready_for_autopay = []
-    for subscription in all_autopay_subscriptions:
-        days_until_expiry = (subscription.end_date - current_time).days
-        
-        if days_until_expiry <= subscription.autopay_days_before and subscription.end_date > current_time:
-            ready_for_autopay.append(subscription)
-    
-    return ready_for_autopay
+    return result.scalars().all()
+
+
+async def get_due_autopay_subscription_ids(
+    db: AsyncSession,
+    *,
+    after_id: int = 0,
+    limit: int = 100,
+    now: Optional[datetime] = None,
+) -> List[int]:
+    """Возвращает id подписок, готовых к автопродлению, страницей по возрастанию id.
+
+    В PostgreSQL строки, уже захваченные другим обработчиком, пропускаются
+    (FOR UPDATE SKIP LOCKED).
+    """
+
+    conditions = await _autopay_due_conditions(
+        db, now or datetime.utcnow(), include_overdue=True
+    )
+    if conditions is None:
+        return []
+
+    query = (
+        select(Subscription.id)
+        .where(Subscription.id > after_id, *conditions)
+        .order_by(Subscription.id)
+        .limit(limit)
+    )
+    if settings.is_postgresql():
+        query = query.with_for_update(skip_locked=True)
+
+    result = await db.execute(query)
+    ids = list(result.scalars().all())
+    # Снимаем блокировки выборки: каждую подписку затем захватывает свой обработчик
+    await db.commit()
+    return ids
+
+
+async def claim_autopay_subscription(
+    db: AsyncSession,
+    subscription_id: int,
+    now: Optional[datetime] = None,
+) -> Optional[Subscription]:
+    """Захватывает подписку и её пользователя для списания автоплатежа.
+
+    Возвращает None, если строка уже заблокирована другим обработчиком или
+    подписка больше не требует продления. Блокировка держится до commit.
+    """
+
+    conditions = await _autopay_due_conditions(
+        db, now or datetime.utcnow(), include_overdue=True
+    )
+    if conditions is None:
+        return None
+
+    query = (
+        select(Subscription)
+        .options(selectinload(Subscription.user))
+        .where(Subscription.id == subscription_id, *conditions)
+        .execution_options(populate_existing=True)
+    )
+    if settings.is_postgresql():
+        query = query.with_for_update(skip_locked=True)
+
+    result = await db.execute(query)
+    subscription = result.scalar_one_or_none()
+    if not subscription:
+        return None
+
+    user_query = (
+        select(User)
+        .where(User.id == subscription.user_id)
+        .execution_options(populate_existing=True)
+    )
+    if settings.is_postgresql():
+        user_query = user_query.with_for_update()
+
+    user_result = await db.execute(user_query)
+    if not user_result.scalar_one_or_none():
+        return None
+
+    return subscription
 
 
+@cached_function("subscriptions_statistics", expire=60, tags=("statistics",))
 async def get_subscriptions_statistics(db: AsyncSession) -> dict:
     
     total_result = await db.execute(select(func.count(Subscription.id)))
@@ -477,6 +688,36 @@ async def get_all_subscriptions(
     
     return subscriptions, total_count
 
+async def iter_subscriptions_by_id(
+    db: AsyncSession,
+    *conditions,
+    batch_size: int = 100
+) -> AsyncIterator[List[Subscription]]:
+    """Отдает подписки с пользователями страницами по возрастанию id (keyset-пагинация)."""
+
+    last_id = 0
+
+    while True:
+        result = await db.execute(
+            select(Subscription)
+            .options(selectinload(Subscription.user))
+            .where(Subscription.id > last_id, *conditions)
+            .order_by(Subscription.id)
+            .limit(batch_size)
+        )
+        subscriptions = result.scalars().all()
+
+        if not subscriptions:
+            break
+
+        yield subscriptions
+
+        if len(subscriptions) < batch_size:
+            break
+
+        last_id = subscriptions[-1].id
+
+
 async def add_subscription_servers(
     db: AsyncSession,
     subscription: Subscription,
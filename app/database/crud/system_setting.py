@@ -38,3 +38,9 @@ async def delete_system_setting(db: AsyncSession, key: str) -> None:
         await db.delete(setting)
         await db.flush()
 
+
+async def get_system_setting_value(db: AsyncSession, key: str) -> Optional[str]:
+    result = await db.execute(
+        select(SystemSetting.value).where(SystemSetting.key == key)
+    )
+    return result.scalar_one_or_none()
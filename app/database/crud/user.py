@@ -2,8 +2,8 @@ import logging
 import secrets
 import string
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict
-from sqlalchemy import select, and_, or_, func, case, nullslast, text
+from typing import Optional, List, Dict, Iterable
+from sqlalchemy import select, update, and_, or_, func, case, nullslast, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import IntegrityError
@@ -19,6 +19,7 @@ from app.database.models import (
     TransactionType,
 )
 from app.config import settings
+from app.utils.cache import cached_function
 from app.database.crud.promo_group import get_default_promo_group
 from app.database.crud.discount_offer import get_latest_claimed_offer_for_user
 from app.database.crud.promo_offer_log import log_promo_offer_action
@@ -118,7 +119,7 @@ async def _sync_users_sequence(db: AsyncSession) -> None:
     )
 
 
-async def _get_or_create_default_promo_group(db: AsyncSession) -> PromoGroup:
+async def get_or_create_default_promo_group(db: AsyncSession) -> PromoGroup:
     default_group = await get_default_promo_group(db)
     if default_group:
         return default_group
@@ -152,7 +153,7 @@ async def create_user(
     attempts = 3
 
     for attempt in range(1, attempts + 1):
-        default_group = await _get_or_create_default_promo_group(db)
+        default_group = await get_or_create_default_promo_group(db)
         promo_group_id = default_group.id if default_group else None
 
         try:
@@ -789,6 +790,24 @@ async def get_inactive_users(db: AsyncSession, months: int = 3) -> List[User]:
     return result.scalars().all()
 
 
+async def reset_remnawave_push_hashes(db: AsyncSession, remnawave_uuids: Iterable[str]) -> None:
+    """Сбрасывает хеш последней выгрузки в панель.
+
+    Вызывается после записи в панель в обход PanelUserPusher, чтобы следующая
+    выгрузка отправила этих пользователей заново.
+    """
+    uuids = [remnawave_uuid for remnawave_uuid in remnawave_uuids if remnawave_uuid]
+    if not uuids:
+        return
+
+    await db.execute(
+        update(User)
+        .where(User.remnawave_uuid.in_(uuids))
+        .values(remnawave_push_hash=None)
+    )
+    await db.commit()
+
+
 async def delete_user(db: AsyncSession, user: User) -> bool:
     user.status = UserStatus.DELETED.value
     user.updated_at = datetime.utcnow()
@@ -798,6 +817,7 @@ async def delete_user(db: AsyncSession, user: User) -> bool:
     return True
 
 
+@cached_function("users_statistics", expire=60, tags=("statistics",))
 async def get_users_statistics(db: AsyncSession) -> dict:
     
     total_result = await db.execute(select(func.count(User.id)))
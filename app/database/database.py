@@ -1,21 +1,170 @@
 import logging
-from typing import AsyncGenerator
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict
 
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from app.config import settings
 from app.database.models import Base
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    connects: int = 0
+    timeouts: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    total_hold_seconds: float = 0.0
+    max_hold_seconds: float = 0.0
+    checkins: int = 0
+    total_connect_seconds: float = 0.0
+    max_connect_seconds: float = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.total_wait_seconds += seconds
+        if seconds > self.max_wait_seconds:
+            self.max_wait_seconds = seconds
+
+    def record_connect(self, seconds: float) -> None:
+        self.total_connect_seconds += seconds
+        if seconds > self.max_connect_seconds:
+            self.max_connect_seconds = seconds
+
+    def record_hold(self, seconds: float) -> None:
+        self.checkins += 1
+        self.total_hold_seconds += seconds
+        if seconds > self.max_hold_seconds:
+            self.max_hold_seconds = seconds
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, замеряющий время ожидания свободного соединения.
+
+    Время установки нового соединения учитывается отдельно от ожидания,
+    чтобы медленный connect не выглядел как нехватка соединений в пуле.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        connect_seconds = 0.0
+        try:
+            record = super()._do_get()
+            connect_seconds = record.info.pop("connect_seconds", 0.0)
+            return record
+        except PoolTimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            waited = max(0.0, time.perf_counter() - started - connect_seconds)
+            pool_stats.record_wait(waited)
+            if waited * 1000 >= settings.DATABASE_POOL_SLOW_CHECKOUT_MS:
+                logger.warning(
+                    "⏳ Ожидание соединения из пула заняло %.0f мс (%s)",
+                    waited * 1000,
+                    self.status(),
+                )
+
+
+def _build_engine_kwargs() -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {
+        "echo": settings.DEBUG,
+        "future": True,
+    }
+
+    if settings.get_database_pool_mode() == "null":
+        kwargs["poolclass"] = NullPool
+        return kwargs
+
+    kwargs.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=max(1, settings.DATABASE_POOL_SIZE),
+        max_overflow=max(0, settings.DATABASE_POOL_MAX_OVERFLOW),
+        pool_timeout=max(1, settings.DATABASE_POOL_TIMEOUT),
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+    )
+    return kwargs
+
+
 engine = create_async_engine(
     settings.get_database_url(),
-    poolclass=NullPool,
-    echo=settings.DEBUG,
-    future=True
+    **_build_engine_kwargs(),
 )
 
+
+@event.listens_for(engine.sync_engine, "do_connect")
+def _on_pool_do_connect(dialect, connection_record, cargs, cparams):
+    connection_record.info["connect_started_at"] = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _on_pool_connect(dbapi_connection, connection_record):
+    pool_stats.connects += 1
+    started = connection_record.info.pop("connect_started_at", None)
+    if started is not None:
+        connect_seconds = time.perf_counter() - started
+        pool_stats.record_connect(connect_seconds)
+        # Забирается в InstrumentedQueuePool._do_get, если соединение создано при ожидании
+        connection_record.info["connect_seconds"] = connect_seconds
+
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.checkouts += 1
+    connection_record.info.pop("connect_seconds", None)
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _on_pool_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        pool_stats.record_hold(time.perf_counter() - checked_out_at)
+
+
+def get_pool_status() -> Dict[str, Any]:
+    pool = engine.pool
+    status: Dict[str, Any] = {
+        "mode": settings.get_database_pool_mode(),
+        "pool_class": type(pool).__name__,
+        "checkouts": pool_stats.checkouts,
+        "connects": pool_stats.connects,
+        "timeouts": pool_stats.timeouts,
+        "avg_wait_ms": round(
+            pool_stats.total_wait_seconds * 1000 / pool_stats.checkouts, 3
+        ) if pool_stats.checkouts else 0.0,
+        "max_wait_ms": round(pool_stats.max_wait_seconds * 1000, 3),
+        "avg_hold_ms": round(
+            pool_stats.total_hold_seconds * 1000 / pool_stats.checkins, 3
+        ) if pool_stats.checkins else 0.0,
+        "max_hold_ms": round(pool_stats.max_hold_seconds * 1000, 3),
+        "avg_connect_ms": round(
+            pool_stats.total_connect_seconds * 1000 / pool_stats.connects, 3
+        ) if pool_stats.connects else 0.0,
+        "max_connect_ms": round(pool_stats.max_connect_seconds * 1000, 3),
+    }
+
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+
+    return status
+
+
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -44,6 +193,10 @@ async def init_db():
         await conn.run_sync(Base.metadata.create_all)
     
     logger.info("✅ База данных успешно инициализирована")
+    logger.info(
+        "🔌 Пул соединений БД: %s",
+        settings.get_database_pool_mode(),
+    )
 
 
 async def close_db():
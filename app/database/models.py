@@ -394,6 +394,7 @@ class User(Base):
     promo_offer_discount_source = Column(String(100), nullable=True)
     promo_offer_discount_expires_at = Column(DateTime, nullable=True)
     last_remnawave_sync = Column(DateTime, nullable=True)
+    remnawave_push_hash = Column(String(64), nullable=True)
     trojan_password = Column(String(255), nullable=True)
     vless_uuid = Column(String(255), nullable=True)
     ss_password = Column(String(255), nullable=True)
@@ -900,12 +901,38 @@ class BroadcastHistory(Base):
     sent_count = Column(Integer, default=0)  
     failed_count = Column(Integer, default=0) 
     status = Column(String(50), default="in_progress")
+    selected_buttons = Column(JSON, nullable=True)
+    # Процесс, который выполняет рассылку, и время его последнего сигнала
+    owner_id = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    # Этап сохранения получателей: NULL (рассылка до broadcast_recipients) -> materializing -> materialized
+    recipients_phase = Column(String(20), nullable=True)
     admin_id = Column(Integer, ForeignKey("users.id")) 
     admin_name = Column(String(255)) 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     admin = relationship("User", back_populates="broadcasts")
 
+
+class BroadcastRecipient(Base):
+    __tablename__ = "broadcast_recipients"
+    __table_args__ = (
+        UniqueConstraint("broadcast_id", "telegram_id", name="uq_broadcast_recipient"),
+        Index("ix_broadcast_recipients_status", "broadcast_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    broadcast_id = Column(
+        Integer,
+        ForeignKey("broadcast_history.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    telegram_id = Column(BigInteger, nullable=False)
+    # pending -> claimed -> sending -> sent / failed
+    status = Column(String(20), nullable=False, default="pending")
+    error = Column(String(255), nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
 class ServerSquad(Base):
     __tablename__ = "server_squads"
 
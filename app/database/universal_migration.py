@@ -2067,6 +2067,108 @@ async def add_subscription_crypto_link_column() -> bool:
         return False
 
 
+async def add_user_remnawave_push_hash_column() -> bool:
+    column_exists = await check_column_exists('users', 'remnawave_push_hash')
+    if column_exists:
+        logger.info("ℹ️ Колонка remnawave_push_hash уже существует")
+        return True
+
+    try:
+        async with engine.begin() as conn:
+            db_type = await get_database_type()
+
+            if db_type == 'sqlite':
+                await conn.execute(text("ALTER TABLE users ADD COLUMN remnawave_push_hash TEXT NULL"))
+            elif db_type in ('postgresql', 'mysql'):
+                await conn.execute(text("ALTER TABLE users ADD COLUMN remnawave_push_hash VARCHAR(64) NULL"))
+            else:
+                logger.error(f"Неподдерживаемый тип БД для добавления remnawave_push_hash: {db_type}")
+                return False
+
+        logger.info("✅ Добавлена колонка remnawave_push_hash в таблицу users")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка добавления колонки remnawave_push_hash: {e}")
+        return False
+
+
+async def add_broadcast_selected_buttons_column() -> bool:
+    column_exists = await check_column_exists('broadcast_history', 'selected_buttons')
+    if column_exists:
+        logger.info("ℹ️ Колонка selected_buttons уже существует")
+        return True
+
+    try:
+        async with engine.begin() as conn:
+            db_type = await get_database_type()
+
+            if db_type == 'sqlite':
+                await conn.execute(text("ALTER TABLE broadcast_history ADD COLUMN selected_buttons JSON NULL"))
+            elif db_type == 'postgresql':
+                await conn.execute(text("ALTER TABLE broadcast_history ADD COLUMN selected_buttons JSON NULL"))
+            elif db_type == 'mysql':
+                await conn.execute(text("ALTER TABLE broadcast_history ADD COLUMN selected_buttons JSON NULL"))
+            else:
+                logger.error(f"Неподдерживаемый тип БД для добавления selected_buttons: {db_type}")
+                return False
+
+        logger.info("✅ Добавлена колонка selected_buttons в таблицу broadcast_history")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка добавления колонки selected_buttons: {e}")
+        return False
+
+
+async def add_broadcast_owner_columns() -> bool:
+    try:
+        db_type = await get_database_type()
+        timestamp_type = 'TIMESTAMP' if db_type == 'postgresql' else 'DATETIME'
+        columns = {
+            'owner_id': 'VARCHAR(100) NULL',
+            'heartbeat_at': f'{timestamp_type} NULL',
+        }
+
+        if db_type not in {'sqlite', 'postgresql', 'mysql'}:
+            logger.error(f"Неподдерживаемый тип БД для добавления владельца рассылки: {db_type}")
+            return False
+
+        missing = {
+            column: definition
+            for column, definition in columns.items()
+            if not await check_column_exists('broadcast_history', column)
+        }
+        if not missing:
+            logger.info("ℹ️ Колонки владельца рассылки уже существуют")
+            return True
+
+        async with engine.begin() as conn:
+            for column, definition in missing.items():
+                await conn.execute(text(f"ALTER TABLE broadcast_history ADD COLUMN {column} {definition}"))
+                logger.info(f"✅ Добавлена колонка {column} в таблицу broadcast_history")
+
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка добавления колонок владельца рассылки: {e}")
+        return False
+
+
+async def add_broadcast_recipients_phase_column() -> bool:
+    try:
+        if await check_column_exists('broadcast_history', 'recipients_phase'):
+            logger.info("ℹ️ Колонка recipients_phase уже существует")
+            return True
+
+        async with engine.begin() as conn:
+            await conn.execute(
+                text("ALTER TABLE broadcast_history ADD COLUMN recipients_phase VARCHAR(20) NULL")
+            )
+        logger.info("✅ Добавлена колонка recipients_phase в таблицу broadcast_history")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка добавления колонки recipients_phase: {e}")
+        return False
+
+
 async def fix_foreign_keys_for_user_deletion():
     try:
         async with engine.begin() as conn:
@@ -2828,6 +2930,33 @@ async def run_universal_migration():
         else:
             logger.warning("⚠️ Проблемы с добавлением колонки subscription_crypto_link")
 
+        logger.info("=== ДОБАВЛЕНИЕ ХЕША ВЫГРУЗКИ В ПАНЕЛЬ ДЛЯ ПОЛЬЗОВАТЕЛЕЙ ===")
+        push_hash_added = await add_user_remnawave_push_hash_column()
+        if push_hash_added:
+            logger.info("✅ Колонка remnawave_push_hash готова")
+        else:
+            logger.warning("⚠️ Проблемы с добавлением колонки remnawave_push_hash")
+
+        logger.info("=== ДОБАВЛЕНИЕ КНОПОК РАССЫЛКИ В ИСТОРИЮ РАССЫЛОК ===")
+        broadcast_buttons_added = await add_broadcast_selected_buttons_column()
+        if broadcast_buttons_added:
+            logger.info("✅ Колонка selected_buttons готова")
+        else:
+            logger.warning("⚠️ Проблемы с добавлением колонки selected_buttons")
+
+        logger.info("=== ДОБАВЛЕНИЕ ВЛАДЕЛЬЦА РАССЫЛКИ ===")
+        broadcast_owner_added = await add_broadcast_owner_columns()
+        if broadcast_owner_added:
+            logger.info("✅ Колонки владельца рассылки готовы")
+        else:
+            logger.warning("⚠️ Проблемы с добавлением колонок владельца рассылки")
+
+        recipients_phase_added = await add_broadcast_recipients_phase_column()
+        if recipients_phase_added:
+            logger.info("✅ Колонка этапа сохранения получателей рассылки готова")
+        else:
+            logger.warning("⚠️ Проблемы с добавлением колонки этапа сохранения получателей рассылки")
+
         logger.info("=== СОЗДАНИЕ ТАБЛИЦЫ АУДИТА ПОДДЕРЖКИ ===")
         try:
             async with engine.begin() as conn:
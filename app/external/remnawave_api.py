@@ -1,15 +1,20 @@
 import asyncio
 import json
+import random
 import ssl
+import time
 import base64 
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union, Any
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple, Union
 import aiohttp
 import logging
 from dataclasses import dataclass
 from enum import Enum
 from urllib.parse import urlparse, urljoin
 
+from app.config import settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -111,6 +116,201 @@ class RemnaWaveAPIError(Exception):
         super().__init__(self.message)
 
 
+class RemnaWaveCircuitOpenError(RemnaWaveAPIError):
+    """Запрос отклонен без обращения к панели: circuit breaker разомкнут."""
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Размыкается после серии сбоев панели и быстро отклоняет запросы до таймаута восстановления."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._half_open_in_flight = False
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.last_failure_at: Optional[datetime] = None
+
+    @property
+    def failure_threshold(self) -> int:
+        return max(1, settings.REMNAWAVE_API_CIRCUIT_FAILURE_THRESHOLD)
+
+    @property
+    def recovery_timeout(self) -> float:
+        return max(1, settings.REMNAWAVE_API_CIRCUIT_RECOVERY_SECONDS)
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state == CircuitState.OPEN
+            and self._opened_at is not None
+            and time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_in_flight = False
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == CircuitState.OPEN
+
+    @property
+    def consecutive_failures(self) -> int:
+        return self._consecutive_failures
+
+    def retry_after(self) -> float:
+        if self._state != CircuitState.OPEN or self._opened_at is None:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.HALF_OPEN and not self._half_open_in_flight:
+            self._half_open_in_flight = True
+            return True
+        self.total_rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self._state != CircuitState.CLOSED:
+            logger.info(f"✅ RemnaWave API {self.name}: circuit breaker замкнут")
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._half_open_in_flight = False
+
+    def release_probe(self) -> None:
+        """Освобождает пробный слот HALF_OPEN без учёта сбоя (запрос отменён)."""
+        self._half_open_in_flight = False
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        self.total_failures += 1
+        self.last_failure_at = datetime.utcnow()
+        self._half_open_in_flight = False
+
+        if self._state == CircuitState.HALF_OPEN or (
+            self._state == CircuitState.CLOSED
+            and self._consecutive_failures >= self.failure_threshold
+        ):
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+            logger.warning(
+                f"🚧 RemnaWave API {self.name}: circuit breaker разомкнут после "
+                f"{self._consecutive_failures} сбоев подряд на {self.recovery_timeout}с"
+            )
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self._consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "total_failures": self.total_failures,
+            "total_rejected": self.total_rejected,
+            "retry_after": round(self.retry_after(), 1),
+            "last_failure_at": self.last_failure_at,
+        }
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+_RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_HEAVY_READ_ENDPOINTS = {
+    '/api/users',
+    '/api/system/stats',
+    '/api/system/stats/bandwidth',
+    '/api/system/stats/nodes',
+    '/api/nodes/usage/realtime',
+}
+
+
+def get_circuit_breaker(base_url: str) -> CircuitBreaker:
+    key = (base_url or "").rstrip('/')
+    breaker = _circuit_breakers.get(key)
+    if breaker is None:
+        breaker = CircuitBreaker(key)
+        _circuit_breakers[key] = breaker
+    return breaker
+
+
+class RemnaWaveSessionPool:
+    """Хранит долгоживущие aiohttp-сессии к панели, по одной на набор учетных данных."""
+
+    def __init__(self) -> None:
+        self._sessions: Dict[Tuple[str, ...], Tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def get_session(self, api: "RemnaWaveAPI") -> aiohttp.ClientSession:
+        key = api.session_key
+        loop = asyncio.get_running_loop()
+
+        entry = self._sessions.get(key)
+        if entry and entry[0] is loop and not entry[1].closed:
+            return entry[1]
+
+        async with self._get_lock():
+            entry = self._sessions.get(key)
+            if entry and entry[0] is loop and not entry[1].closed:
+                return entry[1]
+
+            session = api._build_session()
+            self._sessions[key] = (loop, session)
+            return session
+
+    def discard(self, key: Tuple[str, ...]) -> None:
+        entry = self._sessions.pop(key, None)
+        if not entry:
+            return
+
+        loop, session = entry
+        if session.closed or loop.is_closed():
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is loop:
+            loop.create_task(session.close())
+        logger.info("♻️ Сессия RemnaWave API сброшена после изменения настроек")
+
+    async def close_all(self) -> None:
+        entries = list(self._sessions.values())
+        self._sessions.clear()
+
+        loop = asyncio.get_running_loop()
+        for session_loop, session in entries:
+            if session.closed or session_loop is not loop:
+                continue
+            try:
+                await session.close()
+            except Exception as error:
+                logger.error(f"Ошибка закрытия сессии RemnaWave: {error}")
+
+
+remnawave_session_pool = RemnaWaveSessionPool()
+
+
 class RemnaWaveAPI:
     
     def __init__(self, base_url: str, api_key: str, secret_key: Optional[str] = None, 
@@ -166,7 +366,17 @@ class RemnaWaveAPI:
         
         return headers
         
-    async def __aenter__(self):
+    @property
+    def session_key(self) -> Tuple[str, str, str, str, str]:
+        return (
+            self.base_url,
+            self.api_key or "",
+            self.secret_key or "",
+            self.username or "",
+            self.password or "",
+        )
+
+    def _build_session(self) -> aiohttp.ClientSession:
         conn_type = self._detect_connection_type()
         
         logger.info(f"Подключение к Remnawave: {self.base_url} (тип: {conn_type})")
@@ -183,7 +393,13 @@ class RemnaWaveAPI:
                 cookies = {self.secret_key: self.secret_key}
                 logger.debug(f"Используем куки: {self.secret_key}=***")
         
-        connector_kwargs = {}
+        connector_kwargs = {
+            'limit': max(0, settings.REMNAWAVE_API_CONNECTION_LIMIT),
+            'limit_per_host': max(0, settings.REMNAWAVE_API_CONNECTION_LIMIT_PER_HOST),
+            'keepalive_timeout': settings.REMNAWAVE_API_KEEPALIVE_TIMEOUT,
+            'ttl_dns_cache': settings.REMNAWAVE_API_DNS_CACHE_TTL,
+            'use_dns_cache': True,
+        }
         
         if conn_type == "local":
             logger.debug("Используют локальные заголовки proxy")
@@ -214,31 +430,116 @@ class RemnaWaveAPI:
         if cookies:
             session_kwargs['cookies'] = cookies
             
-        self.session = aiohttp.ClientSession(**session_kwargs)
+        return aiohttp.ClientSession(**session_kwargs)
+
+    async def __aenter__(self):
+        self.session = await remnawave_session_pool.get_session(self)
         self.authenticated = True 
                 
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Сессия общая для процесса и переиспользуется между запросами,
+        # поэтому здесь ее не закрываем.
+        return None
             
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        return get_circuit_breaker(self.base_url)
+
+    @staticmethod
+    def _resolve_timeout(method: str, endpoint: str) -> float:
+        if method.upper() != 'GET':
+            return settings.REMNAWAVE_API_WRITE_TIMEOUT
+
+        path = endpoint.split('?', 1)[0].rstrip('/')
+        if path in _HEAVY_READ_ENDPOINTS:
+            return settings.REMNAWAVE_API_HEAVY_READ_TIMEOUT
+
+        return settings.REMNAWAVE_API_READ_TIMEOUT
+
+    @staticmethod
+    def _is_transient_error(error: RemnaWaveAPIError) -> bool:
+        return error.status_code is None or error.status_code in _RETRYABLE_STATUS_CODES
+
+    @staticmethod
+    def _is_panel_failure(error: RemnaWaveAPIError) -> bool:
+        return error.status_code is None or error.status_code >= 500
+
     async def _make_request(
         self, 
         method: str, 
         endpoint: str, 
         data: Optional[Dict] = None,
-        params: Optional[Dict] = None
+        params: Optional[Dict] = None,
+        timeout: Optional[float] = None
     ) -> Dict:
         if not self.session:
             raise RemnaWaveAPIError("Session not initialized. Use async context manager.")
-            
+
+        breaker = self.circuit_breaker
+        if not breaker.allow_request():
+            raise RemnaWaveCircuitOpenError(
+                f"RemnaWave API временно недоступен, повтор через {breaker.retry_after():.0f}с"
+            )
+
         url = f"{self.base_url}{endpoint}"
-        
+        request_timeout = aiohttp.ClientTimeout(total=timeout or self._resolve_timeout(method, endpoint))
+        max_attempts = 1
+        if method.upper() == 'GET':
+            max_attempts += max(0, settings.REMNAWAVE_API_RETRY_ATTEMPTS)
+
+        attempt = 1
+        while True:
+            try:
+                response_data = await self._send_request(method, url, data, params, request_timeout)
+            except RemnaWaveAPIError as error:
+                if not self._is_panel_failure(error):
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+
+                if (
+                    attempt >= max_attempts
+                    or not self._is_transient_error(error)
+                    or breaker.is_open
+                ):
+                    raise
+
+                delay = random.uniform(0, settings.REMNAWAVE_API_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+                logger.warning(
+                    f"Повтор запроса {method} {endpoint} через {delay:.2f}с "
+                    f"(попытка {attempt + 1}/{max_attempts}): {error.message}"
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except asyncio.CancelledError:
+                # Отмена (таймаут задачи, остановка пула) ничего не говорит о
+                # здоровье панели: только освобождаем пробный слот HALF_OPEN
+                breaker.release_probe()
+                raise
+            except BaseException:
+                # Ошибка разбора ответа и прочие сбои освобождают слот через record_failure
+                breaker.record_failure()
+                raise
+
+            breaker.record_success()
+            return response_data
+
+    async def _send_request(
+        self,
+        method: str,
+        url: str,
+        data: Optional[Dict],
+        params: Optional[Dict],
+        timeout: aiohttp.ClientTimeout
+    ) -> Dict:
         try:
             kwargs = {
                 'url': url,
-                'params': params
+                'params': params,
+                'timeout': timeout
             }
             
             if data:
@@ -264,6 +565,9 @@ class RemnaWaveAPI:
                     
                 return response_data
                 
+        except asyncio.TimeoutError:
+            logger.error(f"Request timed out after {timeout.total}s: {method} {url}")
+            raise RemnaWaveAPIError(f"Request timed out after {timeout.total}s")
         except aiohttp.ClientError as e:
             logger.error(f"Request failed: {e}")
             raise RemnaWaveAPIError(f"Request failed: {str(e)}")
@@ -409,6 +713,73 @@ class RemnaWaveAPI:
             'users': [self._parse_user(user) for user in response['response']['users']],
             'total': response['response']['total']
         }
+
+    async def iter_user_pages(
+        self,
+        size: int = 100,
+        concurrency: int = 1,
+        on_total: Optional[Callable[[int], None]] = None
+    ) -> AsyncIterator[List[RemnaWaveUser]]:
+        """Отдает пользователей панели постранично, загружая до `concurrency` страниц параллельно.
+
+        Страницы выдаются по порядку. Шаг пагинации равен фактическому размеру
+        первой страницы (панель может ограничить `size`), а число страниц
+        определяется по `total` из первого ответа. Если последняя страница
+        оказалась полной, загрузка продолжается последовательно до пустой или
+        неполной страницы. `on_total` получает `total` из первого ответа.
+        """
+        size = max(1, size)
+        concurrency = max(1, concurrency)
+
+        first_page = await self.get_all_users(start=0, size=size)
+        total = first_page['total']
+        if on_total:
+            on_total(total)
+        if not first_page['users']:
+            return
+        yield first_page['users']
+
+        step = len(first_page['users'])
+        if step < size and step >= total:
+            return
+        if step < size:
+            logger.info(f"Панель ограничила размер страницы пользователей: {step} вместо {size}")
+
+        pending: Deque[asyncio.Task] = deque()
+        starts = iter(range(step, total, step))
+        next_start = step
+        last_batch_size = step
+
+        try:
+            for start in starts:
+                pending.append(asyncio.create_task(self.get_all_users(start=start, size=size)))
+                next_start = start + step
+                if len(pending) >= concurrency:
+                    break
+
+            while pending:
+                page = await pending.popleft()
+                last_batch_size = len(page['users'])
+
+                start = next(starts, None)
+                if start is not None:
+                    pending.append(asyncio.create_task(self.get_all_users(start=start, size=size)))
+                    next_start = start + step
+
+                if page['users']:
+                    yield page['users']
+
+            while last_batch_size >= step:
+                page = await self.get_all_users(start=next_start, size=size)
+                last_batch_size = len(page['users'])
+                next_start += step
+                if page['users']:
+                    yield page['users']
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
     
     
     async def get_internal_squads(self) -> List[RemnaWaveInternalSquad]:
@@ -67,6 +67,13 @@ async def show_maintenance_panel(
     panel_info = f"\n🌐 <b>Панель Remnawave:</b> {panel_status['description']}"
     if panel_status.get("response_time"):
         panel_info += f"\n⚡ <b>Время отклика:</b> {panel_status['response_time']}с"
+
+    breaker_info = status_info.get("circuit_breaker") or {}
+    if breaker_info.get("state") and breaker_info["state"] != "closed":
+        panel_info += (
+            f"\n🚧 <b>Circuit breaker:</b> {breaker_info['state']}"
+            f" (повтор через {breaker_info['retry_after']}с)"
+        )
     
     message_text = f"""
 🔧 <b>Управление техническими работами</b>
@@ -1,19 +1,15 @@
 import logging
-import asyncio
 from datetime import datetime, timedelta
 from typing import Optional
 from aiogram import Dispatcher, types, F
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func, and_
 
 from app.config import settings
 from app.states import AdminStates
 from app.database.models import (
     User,
-    UserStatus,
-    Subscription,
-    SubscriptionStatus,
     BroadcastHistory,
 )
 from app.keyboards.admin import (
@@ -25,8 +21,8 @@ from app.keyboards.admin import (
     get_broadcast_button_config, get_broadcast_button_labels
 )
 from app.localization.texts import get_texts
-from app.database.crud.user import get_users_list
-from app.database.crud.subscription import get_expiring_subscriptions
+from app.database.crud.broadcast_target import count_target_users, iter_target_telegram_ids
+from app.services.broadcast_engine import BroadcastEngine
 from app.utils.decorators import admin_required, error_handler
 
 logger = logging.getLogger(__name__)
@@ -237,7 +233,7 @@ async def select_custom_criteria(
         "direct": "Прямая регистрация"
     }
     
-    user_count = await get_custom_users_count(db, criteria)
+    user_count = await count_target_users(db, f"custom_{criteria}")
     
     await state.update_data(broadcast_target=f"custom_{criteria}")
     
@@ -282,7 +278,7 @@ async def select_broadcast_target(
         "trial_zero": "Триальная подписка, трафик 0 ГБ",
     }
     
-    user_count = await get_target_users_count(db, target)
+    user_count = await count_target_users(db, target)
     
     await state.update_data(broadcast_target=target)
     
@@ -614,7 +610,7 @@ async def confirm_button_selection(
     has_media = data.get('has_media', False)
     media_type = data.get('media_type')
     
-    user_count = await get_target_users_count(db, target) if not target.startswith('custom_') else await get_custom_users_count(db, target.replace('custom_', ''))
+    user_count = await count_target_users(db, target)
     target_display = get_target_display_name(target)
     
     media_info = ""
@@ -719,10 +715,7 @@ async def confirm_broadcast(
         parse_mode="HTML" 
     )
     
-    if target.startswith('custom_'):
-        users = await get_custom_users(db, target.replace('custom_', ''))
-    else:
-        users = await get_target_users(db, target)
+    total_count = await count_target_users(db, target)
     
     broadcast_history = BroadcastHistory(
         target_type=target,
@@ -731,7 +724,7 @@ async def confirm_broadcast(
         media_type=media_type,
         media_file_id=media_file_id,
         media_caption=media_caption,
-        total_count=len(users),
+        total_count=total_count,
         sent_count=0,
         failed_count=0,
         admin_id=db_user.id,
@@ -742,53 +735,45 @@ async def confirm_broadcast(
     await db.commit()
     await db.refresh(broadcast_history)
     
-    sent_count = 0
-    failed_count = 0
-    
     broadcast_keyboard = create_broadcast_keyboard(selected_buttons, db_user.language)
-    
-    for user in users:
-        try:
-            if has_media and media_file_id:
-                if media_type == "photo":
-                    await callback.bot.send_photo(
-                        chat_id=user.telegram_id,
-                        photo=media_file_id,
-                        caption=message_text,
-                        parse_mode="HTML",
-                        reply_markup=broadcast_keyboard
-                    )
-                elif media_type == "video":
-                    await callback.bot.send_video(
-                        chat_id=user.telegram_id,
-                        video=media_file_id,
-                        caption=message_text,
-                        parse_mode="HTML",
-                        reply_markup=broadcast_keyboard
-                    )
-                elif media_type == "document":
-                    await callback.bot.send_document(
-                        chat_id=user.telegram_id,
-                        document=media_file_id,
-                        caption=message_text,
-                        parse_mode="HTML",
-                        reply_markup=broadcast_keyboard
-                    )
-            else:
-                await callback.bot.send_message(
-                    chat_id=user.telegram_id,
-                    text=message_text,
+
+    async def send(telegram_id: int) -> None:
+        if has_media and media_file_id:
+            if media_type == "photo":
+                await callback.bot.send_photo(
+                    chat_id=telegram_id,
+                    photo=media_file_id,
+                    caption=message_text,
                     parse_mode="HTML",
                     reply_markup=broadcast_keyboard
                 )
-            sent_count += 1
-            
-            if sent_count % 20 == 0:
-                await asyncio.sleep(1)
-                
-        except Exception as e:
-            failed_count += 1
-            logger.error(f"Ошибка отправки рассылки пользователю {user.telegram_id}: {e}")
+            elif media_type == "video":
+                await callback.bot.send_video(
+                    chat_id=telegram_id,
+                    video=media_file_id,
+                    caption=message_text,
+                    parse_mode="HTML",
+                    reply_markup=broadcast_keyboard
+                )
+            elif media_type == "document":
+                await callback.bot.send_document(
+                    chat_id=telegram_id,
+                    document=media_file_id,
+                    caption=message_text,
+                    parse_mode="HTML",
+                    reply_markup=broadcast_keyboard
+                )
+        else:
+            await callback.bot.send_message(
+                chat_id=telegram_id,
+                text=message_text,
+                parse_mode="HTML",
+                reply_markup=broadcast_keyboard
+            )
+
+    result = await BroadcastEngine().run(iter_target_telegram_ids(db, target), send)
+    sent_count = result.sent
+    failed_count = result.failed
     
     broadcast_history.sent_count = sent_count
     broadcast_history.failed_count = failed_count
@@ -806,8 +791,8 @@ async def confirm_broadcast(
 📊 <b>Результат:</b>
 - Отправлено: {sent_count}
 - Не доставлено: {failed_count}
-- Всего пользователей: {len(users)}
-- Успешность: {round(sent_count / len(users) * 100, 1) if users else 0}%{media_info}
+- Всего пользователей: {total_count}
+- Успешность: {round(sent_count / total_count * 100, 1) if total_count else 0}%{media_info}
 
 <b>Администратор:</b> {db_user.full_name}
 """
@@ -821,150 +806,7 @@ async def confirm_broadcast(
     )
     
     await state.clear()
-    logger.info(f"Рассылка выполнена админом {db_user.telegram_id}: {sent_count}/{len(users)} (медиа: {has_media})")
-
-
-async def get_target_users_count(db: AsyncSession, target: str) -> int:
-    users = await get_target_users(db, target)
-    return len(users)
-
-
-async def get_target_users(db: AsyncSession, target: str) -> list:
-    users = await get_users_list(db, offset=0, limit=10000, status=UserStatus.ACTIVE)
-
-    if target == "all":
-        return users
-
-    if target == "active":
-        return [
-            user
-            for user in users
-            if user.subscription
-            and user.subscription.is_active
-            and not user.subscription.is_trial
-        ]
-
-    if target == "trial":
-        return [
-            user
-            for user in users
-            if user.subscription and user.subscription.is_trial
-        ]
-
-    if target == "no":
-        return [
-            user
-            for user in users
-            if not user.subscription or not user.subscription.is_active
-        ]
-
-    if target == "expiring":
-        expiring_subs = await get_expiring_subscriptions(db, 3)
-        return [sub.user for sub in expiring_subs if sub.user]
-
-    if target == "expired":
-        now = datetime.utcnow()
-        expired_statuses = {
-            SubscriptionStatus.EXPIRED.value,
-            SubscriptionStatus.DISABLED.value,
-        }
-        expired_users = []
-        for user in users:
-            subscription = user.subscription
-            if subscription:
-                if subscription.status in expired_statuses:
-                    expired_users.append(user)
-                    continue
-                if subscription.end_date <= now and not subscription.is_active:
-                    expired_users.append(user)
-                    continue
-            elif user.has_had_paid_subscription:
-                expired_users.append(user)
-        return expired_users
-
-    if target == "active_zero":
-        return [
-            user
-            for user in users
-            if user.subscription
-            and not user.subscription.is_trial
-            and user.subscription.is_active
-            and (user.subscription.traffic_used_gb or 0) <= 0
-        ]
-
-    if target == "trial_zero":
-        return [
-            user
-            for user in users
-            if user.subscription
-            and user.subscription.is_trial
-            and user.subscription.is_active
-            and (user.subscription.traffic_used_gb or 0) <= 0
-        ]
-
-    if target == "zero":
-        return [
-            user
-            for user in users
-            if user.subscription
-            and user.subscription.is_active
-            and (user.subscription.traffic_used_gb or 0) <= 0
-        ]
-
-    return []
-
-
-async def get_custom_users_count(db: AsyncSession, criteria: str) -> int:
-    users = await get_custom_users(db, criteria)
-    return len(users)
-
-
-async def get_custom_users(db: AsyncSession, criteria: str) -> list:
-    now = datetime.utcnow()
-    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_ago = now - timedelta(days=7)
-    month_ago = now - timedelta(days=30)
-    
-    if criteria == "today":
-        stmt = select(User).where(
-            and_(User.status == "active", User.created_at >= today)
-        )
-    elif criteria == "week":
-        stmt = select(User).where(
-            and_(User.status == "active", User.created_at >= week_ago)
-        )
-    elif criteria == "month":
-        stmt = select(User).where(
-            and_(User.status == "active", User.created_at >= month_ago)
-        )
-    elif criteria == "active_today":
-        stmt = select(User).where(
-            and_(User.status == "active", User.last_activity >= today)
-        )
-    elif criteria == "inactive_week":
-        stmt = select(User).where(
-            and_(User.status == "active", User.last_activity < week_ago)
-        )
-    elif criteria == "inactive_month":
-        stmt = select(User).where(
-            and_(User.status == "active", User.last_activity < month_ago)
-        )
-    elif criteria == "referrals":
-        stmt = select(User).where(
-            and_(User.status == "active", User.referred_by_id.isnot(None))
-        )
-    elif criteria == "direct":
-        stmt = select(User).where(
-            and_(
-                User.status == "active", 
-                User.referred_by_id.is_(None)
-            )
-        )
-    else:
-        return []
-    
-    result = await db.execute(stmt)
-    return result.scalars().all()
+    logger.info(f"Рассылка выполнена админом {db_user.telegram_id}: {sent_count}/{total_count} (медиа: {has_media})")
 
 
 async def get_users_statistics(db: AsyncSession) -> dict:
@@ -383,6 +383,17 @@ async def admin_monitoring_menu(callback: CallbackQuery):
             
             running_status = "🟢 Работает" if status['is_running'] else "🔴 Остановлен"
             last_update = status['last_update'].strftime('%H:%M:%S') if status['last_update'] else "Никогда"
+
+            jobs_lines = []
+            for job in status.get('jobs', []):
+                job_icon = "⏳" if job['is_running'] else ("⚠️" if job['last_error'] else "✅")
+                jobs_lines.append(
+                    f"{job_icon} {job['name']}: {job['runs']} запусков, "
+                    f"последний {job['last_duration_seconds']:.1f} с, макс {job['max_duration_seconds']:.1f} с"
+                )
+            jobs_text = "\n".join(jobs_lines) if jobs_lines else "Задачи не запущены"
+            coordination = status.get('coordination') or {}
+            leader_status = "👑 лидер" if coordination.get('is_leader') else "ожидает лидерства"
             
             text = f"""
 🔍 <b>Система мониторинга</b>
@@ -390,6 +401,7 @@ async def admin_monitoring_menu(callback: CallbackQuery):
 📊 <b>Статус:</b> {running_status}
 🕐 <b>Последнее обновление:</b> {last_update}
 ⚙️ <b>Интервал проверки:</b> {settings.MONITORING_INTERVAL} мин
+🧭 <b>Координация:</b> {coordination.get('mode', 'none')} ({leader_status})
 
 📈 <b>Статистика за 24 часа:</b>
 • Всего событий: {status['stats_24h']['total_events']}
@@ -397,6 +409,9 @@ async def admin_monitoring_menu(callback: CallbackQuery):
 • Ошибок: {status['stats_24h']['failed']}
 • Успешность: {status['stats_24h']['success_rate']}%
 
+⏱ <b>Задачи:</b>
+{jobs_text}
+
 🔧 Выберите действие:
 """
             
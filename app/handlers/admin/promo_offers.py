@@ -17,6 +17,7 @@ from app.database.crud.server_squad import (
     get_all_server_squads,
     get_server_squad_by_id,
     get_server_squad_by_uuid,
+    get_server_squad_info,
 )
 from app.database.crud.promo_offer_template import (
     ensure_default_templates,
@@ -135,8 +136,8 @@ async def _resolve_template_squad(
         return None, None
 
     squad_uuid = str(squads[0])
-    server = await get_server_squad_by_uuid(db, squad_uuid)
-    server_name = server.display_name if server else None
+    server = await get_server_squad_info(db, squad_uuid)
+    server_name = server["display_name"] if server else None
     return squad_uuid, server_name
 
 
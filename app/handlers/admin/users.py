@@ -29,7 +29,7 @@ from app.services.remnawave_service import RemnaWaveService
 from app.external.remnawave_api import TrafficLimitStrategy
 from app.database.crud.server_squad import (
     get_all_server_squads,
-    get_server_squad_by_uuid,
+    get_server_squad_info,
     get_server_squad_by_id,
     get_server_ids_by_uuids,
 )
@@ -1028,9 +1028,9 @@ async def _render_user_subscription_overview(
             text += "\n<b>Подключенные серверы:</b>\n"
             for squad_uuid in current_squads:
                 try:
-                    server = await get_server_squad_by_uuid(db, squad_uuid)
+                    server = await get_server_squad_info(db, squad_uuid)
                     if server:
-                        text += f"• {server.display_name}\n"
+                        text += f"• {server['display_name']}\n"
                     else:
                         text += f"• {squad_uuid[:8]}... (неизвестный)\n"
                 except Exception as e:
@@ -2642,6 +2642,7 @@ async def toggle_user_server(
         
         subscription.connected_squads = current_squads
         subscription.updated_at = datetime.utcnow()
+        user.remnawave_push_hash = None
         await db.commit()
         await db.refresh(subscription)
         
@@ -3026,6 +3027,7 @@ async def _update_user_devices(db: AsyncSession, user_id: int, devices: int, adm
         old_devices = subscription.device_limit
         subscription.device_limit = devices
         subscription.updated_at = datetime.utcnow()
+        user.remnawave_push_hash = None
         
         await db.commit()
         
@@ -3066,6 +3068,7 @@ async def _update_user_traffic(db: AsyncSession, user_id: int, traffic_gb: int,
         old_traffic = subscription.traffic_limit_gb
         subscription.traffic_limit_gb = traffic_gb
         subscription.updated_at = datetime.utcnow()
+        user.remnawave_push_hash = None
         
         await db.commit()
         
@@ -3166,7 +3169,7 @@ async def _deactivate_user_subscription(db: AsyncSession, user_id: int, admin_id
         user = await get_user_by_id(db, user_id)
         if user and user.remnawave_uuid:
             subscription_service = SubscriptionService()
-            await subscription_service.disable_remnawave_user(user.remnawave_uuid)
+            await subscription_service.disable_remnawave_user(user.remnawave_uuid, db)
         
         logger.info(f"Админ {admin_id} деактивировал подписку пользователя {user_id}")
         return True
@@ -3671,6 +3674,7 @@ async def admin_buy_subscription_execute(
                 subscription.device_limit = settings.DEFAULT_DEVICE_LIMIT
                 if subscription.is_trial:
                     subscription.traffic_used_gb = 0.0
+            target_user.remnawave_push_hash = None
             
             await db.commit()
             await db.refresh(subscription)
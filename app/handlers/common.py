@@ -4,9 +4,11 @@ from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.database.models import User
 from app.localization.texts import get_texts, get_rules
 from app.keyboards.inline import get_back_keyboard
+from app.services.channel_membership_service import channel_membership_service
 
 logger = logging.getLogger(__name__)
 
@@ -98,6 +100,17 @@ async def show_rules(
     await callback.answer()
 
 
+async def handle_channel_member_update(update: types.ChatMemberUpdated):
+    if not channel_membership_service.matches_channel(
+        update.chat.id,
+        update.chat.username,
+        settings.CHANNEL_SUB_ID,
+    ):
+        return
+
+    await channel_membership_service.handle_chat_member_update(update)
+
+
 def register_handlers(dp: Dispatcher):
     
     dp.callback_query.register(
@@ -120,6 +133,10 @@ def register_handlers(dp: Dispatcher):
         F.data.in_(["cancel", "subscription_cancel"])
     )
 
+    # Обновления участников обязательного канала (бот должен быть его администратором)
+    if settings.CHANNEL_IS_REQUIRED_SUB and settings.CHANNEL_SUB_ID:
+        dp.chat_member.register(handle_channel_member_update)
+
     # Самый последний: ловим любые неизвестные текстовые сообщения
     # Исключаем специальные сервисные события (например, успешные платежи),
     # чтобы их обработка не прерывалась общим хендлером неизвестных сообщений
@@ -21,6 +21,7 @@ from app.services.subscription_checkout_service import (
 )
 from app.utils.photo_message import edit_or_answer_photo
 from app.services.support_settings_service import SupportSettingsService
+from app.services.user_activity_service import user_activity_tracker
 from app.utils.promo_offer import (
     build_promo_offer_hint,
     build_test_access_hint,
@@ -38,8 +39,7 @@ async def show_main_menu(
 ):
     texts = get_texts(db_user.language)
 
-    db_user.last_activity = datetime.utcnow()
-    await db.commit()
+    user_activity_tracker.touch(db_user)
 
     has_active_subscription = bool(db_user.subscription)
     subscription_is_active = False
@@ -1,7 +1,6 @@
 import logging
 from datetime import datetime
 from aiogram import Dispatcher, types, F, Bot
-from aiogram.enums import ChatMemberStatus
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -28,6 +27,7 @@ from app.localization.loader import DEFAULT_LANGUAGE
 from app.localization.texts import get_texts, get_rules
 from app.services.referral_service import process_referral_registration
 from app.services.campaign_service import AdvertisingCampaignService
+from app.services.channel_membership_service import channel_membership_service
 from app.services.admin_notification_service import AdminNotificationService
 from app.services.subscription_service import SubscriptionService
 from app.services.support_settings_service import SupportSettingsService
@@ -1367,12 +1367,14 @@ async def required_sub_channel_check(
 
         texts = get_texts(language)
 
-        chat_member = await bot.get_chat_member(
-            chat_id=settings.CHANNEL_SUB_ID,
-            user_id=query.from_user.id
+        is_member = await channel_membership_service.is_member(
+            bot,
+            settings.CHANNEL_SUB_ID,
+            query.from_user.id,
+            force_refresh=True,
         )
 
-        if chat_member.status not in [ChatMemberStatus.MEMBER, ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR]:
+        if not is_member:
             return await query.answer(
                 texts.t("CHANNEL_SUBSCRIBE_REQUIRED_ALERT", "❌ Вы не подписались на канал!"),
                 show_alert=True,
@@ -1422,8 +1424,8 @@ async def required_sub_channel_check(
 
             menu_text = await get_main_menu_text(user, texts, db)
 
+            from app.utils.media_registry import media_registry
             from app.utils.message_patch import LOGO_PATH
-            from aiogram.types import FSInputFile
 
             is_admin = settings.is_admin(user.telegram_id)
             is_moderator = (
@@ -1443,12 +1445,15 @@ async def required_sub_channel_check(
             )
 
             if settings.ENABLE_LOGO_MODE:
-                await bot.send_photo(
-                    chat_id=query.from_user.id,
-                    photo=FSInputFile(LOGO_PATH),
-                    caption=menu_text,
-                    reply_markup=keyboard,
-                    parse_mode="HTML",
+                await media_registry.send_cached(
+                    LOGO_PATH,
+                    lambda photo: bot.send_photo(
+                        chat_id=query.from_user.id,
+                        photo=photo,
+                        caption=menu_text,
+                        reply_markup=keyboard,
+                        parse_mode="HTML",
+                    ),
                 )
             else:
                 await bot.send_message(
@@ -1494,17 +1499,20 @@ async def required_sub_channel_check(
                     )
                     await state.set_state(RegistrationStates.waiting_for_referral_code)
             else:
+                from app.utils.media_registry import media_registry
                 from app.utils.message_patch import LOGO_PATH
-                from aiogram.types import FSInputFile
 
                 rules_text = await get_rules(language)
 
                 if settings.ENABLE_LOGO_MODE:
-                    await bot.send_photo(
-                        chat_id=query.from_user.id,
-                        photo=FSInputFile(LOGO_PATH),
-                        caption=rules_text,
-                        reply_markup=get_rules_keyboard(language),
+                    await media_registry.send_cached(
+                        LOGO_PATH,
+                        lambda photo: bot.send_photo(
+                            chat_id=query.from_user.id,
+                            photo=photo,
+                            caption=rules_text,
+                            reply_markup=get_rules_keyboard(language),
+                        ),
                     )
                 else:
                     await bot.send_message(
@@ -757,16 +757,16 @@ async def get_servers_display_names(squad_uuids: List[str]) -> str:
 
     try:
         from app.database.database import AsyncSessionLocal
-        from app.database.crud.server_squad import get_server_squad_by_uuid
+        from app.database.crud.server_squad import get_server_squad_info
 
         server_names = []
 
         async with AsyncSessionLocal() as db:
             for uuid in squad_uuids:
-                server = await get_server_squad_by_uuid(db, uuid)
+                server = await get_server_squad_info(db, uuid)
                 if server:
-                    server_names.append(server.display_name)
-                    logger.debug(f"Найден сервер в БД: {uuid} -> {server.display_name}")
+                    server_names.append(server["display_name"])
+                    logger.debug(f"Найден сервер в БД: {uuid} -> {server['display_name']}")
                 else:
                     logger.warning(f"Сервер с UUID {uuid} не найден в БД")
 
@@ -909,12 +909,12 @@ async def show_trial_offer(
 
     trial_server_name = "🎯 Тестовый сервер"
     try:
-        from app.database.crud.server_squad import get_server_squad_by_uuid
+        from app.database.crud.server_squad import get_server_squad_info
 
         if settings.TRIAL_SQUAD_UUID:
-            trial_server = await get_server_squad_by_uuid(db, settings.TRIAL_SQUAD_UUID)
+            trial_server = await get_server_squad_info(db, settings.TRIAL_SQUAD_UUID)
             if trial_server:
-                trial_server_name = trial_server.display_name
+                trial_server_name = trial_server["display_name"]
             else:
                 logger.warning(f"Триальный сервер с UUID {settings.TRIAL_SQUAD_UUID} не найден в БД")
         else:
@@ -1335,21 +1335,20 @@ async def get_countries_price_by_uuids_fallback(
         promo_group_id: Optional[int] = None,
 ) -> Tuple[int, List[int]]:
     try:
-        from app.database.crud.server_squad import get_server_squad_by_uuid
+        from app.database.crud.server_squad import get_server_squad_info
 
         total_price = 0
         prices_list = []
 
         for country_uuid in country_uuids:
             try:
-                server = await get_server_squad_by_uuid(db, country_uuid)
+                server = await get_server_squad_info(db, country_uuid)
                 is_allowed = True
                 if promo_group_id is not None and server:
-                    allowed_ids = {pg.id for pg in server.allowed_promo_groups}
-                    is_allowed = promo_group_id in allowed_ids
+                    is_allowed = promo_group_id in server["allowed_promo_group_ids"]
 
-                if server and server.is_available and not server.is_full and is_allowed:
-                    price = server.price_kopeks
+                if server and server["is_available"] and not server["is_full"] and is_allowed:
+                    price = server["price_kopeks"]
                     total_price += price
                     prices_list.append(price)
                 else:
@@ -4537,78 +4536,79 @@ async def handle_subscription_cancel(
 
 async def _get_available_countries(promo_group_id: Optional[int] = None):
     from app.utils.cache import cache, cache_key
-    from app.database.database import AsyncSessionLocal
-    from app.database.crud.server_squad import get_available_server_squads
 
     cache_key_value = cache_key("available_countries", promo_group_id or "all")
-    cached_countries = await cache.get(cache_key_value)
-    if cached_countries:
-        return cached_countries
 
     try:
-        async with AsyncSessionLocal() as db:
-            available_servers = await get_available_server_squads(
-                db, promo_group_id=promo_group_id
-            )
-
-        if promo_group_id is not None and not available_servers:
-            logger.info(
-                "Промогруппа %s не имеет доступных серверов, возврат пустого списка",
-                promo_group_id,
-            )
-            await cache.set(cache_key_value, [], 60)
-            return []
+        return await cache.get_or_set(
+            cache_key_value,
+            lambda: _load_available_countries(promo_group_id),
+            expire=300,
+        )
+    except Exception as e:
+        logger.error(f"Ошибка получения списка стран: {e}")
+        fallback_countries = [
+            {"uuid": "default-free", "name": "🆓 Бесплатный сервер", "price_kopeks": 0, "is_available": True},
+        ]
+        return fallback_countries
 
-        countries = []
-        for server in available_servers:
-            countries.append({
-                "uuid": server.squad_uuid,
-                "name": server.display_name,
-                "price_kopeks": server.price_kopeks,
-                "country_code": server.country_code,
-                "is_available": server.is_available and not server.is_full
-            })
 
-        if not countries:
-            logger.info("🔄 Серверов в БД нет, получаем из RemnaWave...")
-            from app.services.remnawave_service import RemnaWaveService
+async def _load_available_countries(promo_group_id: Optional[int] = None):
+    from app.database.database import AsyncSessionLocal
+    from app.database.crud.server_squad import get_available_server_squads
 
-            service = RemnaWaveService()
-            squads = await service.get_all_squads()
-
-            for squad in squads:
-                squad_name = squad["name"]
-
-                if not any(flag in squad_name for flag in
-                           ["🇳🇱", "🇩🇪", "🇺🇸", "🇫🇷", "🇬🇧", "🇮🇹", "🇪🇸", "🇨🇦", "🇯🇵", "🇸🇬", "🇦🇺"]):
-                    name_lower = squad_name.lower()
-                    if "netherlands" in name_lower or "нидерланды" in name_lower or "nl" in name_lower:
-                        squad_name = f"🇳🇱 {squad_name}"
-                    elif "germany" in name_lower or "германия" in name_lower or "de" in name_lower:
-                        squad_name = f"🇩🇪 {squad_name}"
-                    elif "usa" in name_lower or "сша" in name_lower or "america" in name_lower or "us" in name_lower:
-                        squad_name = f"🇺🇸 {squad_name}"
-                    else:
-                        squad_name = f"🌐 {squad_name}"
+    async with AsyncSessionLocal() as db:
+        available_servers = await get_available_server_squads(
+            db, promo_group_id=promo_group_id
+        )
 
-                countries.append({
-                    "uuid": squad["uuid"],
-                    "name": squad_name,
-                    "price_kopeks": 0,
-                    "is_available": True
-                })
+    if promo_group_id is not None and not available_servers:
+        logger.info(
+            "Промогруппа %s не имеет доступных серверов, возврат пустого списка",
+            promo_group_id,
+        )
+        return []
+
+    countries = []
+    for server in available_servers:
+        countries.append({
+            "uuid": server.squad_uuid,
+            "name": server.display_name,
+            "price_kopeks": server.price_kopeks,
+            "country_code": server.country_code,
+            "is_available": server.is_available and not server.is_full
+        })
+
+    if not countries:
+        logger.info("🔄 Серверов в БД нет, получаем из RemnaWave...")
+        from app.services.remnawave_service import RemnaWaveService
 
-        await cache.set(cache_key_value, countries, 300)
-        return countries
+        service = RemnaWaveService()
+        squads = await service.get_all_squads()
+
+        for squad in squads:
+            squad_name = squad["name"]
+
+            if not any(flag in squad_name for flag in
+                       ["🇳🇱", "🇩🇪", "🇺🇸", "🇫🇷", "🇬🇧", "🇮🇹", "🇪🇸", "🇨🇦", "🇯🇵", "🇸🇬", "🇦🇺"]):
+                name_lower = squad_name.lower()
+                if "netherlands" in name_lower or "нидерланды" in name_lower or "nl" in name_lower:
+                    squad_name = f"🇳🇱 {squad_name}"
+                elif "germany" in name_lower or "германия" in name_lower or "de" in name_lower:
+                    squad_name = f"🇩🇪 {squad_name}"
+                elif "usa" in name_lower or "сша" in name_lower or "america" in name_lower or "us" in name_lower:
+                    squad_name = f"🇺🇸 {squad_name}"
+                else:
+                    squad_name = f"🌐 {squad_name}"
 
-    except Exception as e:
-        logger.error(f"Ошибка получения списка стран: {e}")
-        fallback_countries = [
-            {"uuid": "default-free", "name": "🆓 Бесплатный сервер", "price_kopeks": 0, "is_available": True},
-        ]
+            countries.append({
+                "uuid": squad["uuid"],
+                "name": squad_name,
+                "price_kopeks": 0,
+                "is_available": True
+            })
 
-        await cache.set(cache_key_value, fallback_countries, 60)
-        return fallback_countries
+    return countries
 
 
 async def _get_countries_info(squad_uuids):
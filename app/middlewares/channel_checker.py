@@ -7,14 +7,14 @@ from aiogram.types import TelegramObject, Update, Message, CallbackQuery
 from aiogram.enums import ChatMemberStatus
 
 from app.config import settings
-from app.database.database import get_db
 from app.database.crud.subscription import deactivate_subscription
-from app.database.crud.user import get_user_by_telegram_id
 from app.database.models import SubscriptionStatus
 from app.keyboards.inline import get_channel_sub_keyboard
 from app.localization.loader import DEFAULT_LANGUAGE
 from app.localization.texts import get_texts
+from app.middlewares.db_session import get_event_user
 from app.utils.check_reg_process import is_registration_process
+from app.services.channel_membership_service import channel_membership_service
 from app.services.subscription_service import SubscriptionService
 
 logger = logging.getLogger(__name__)
@@ -94,15 +94,22 @@ class ChannelCheckerMiddleware(BaseMiddleware):
         channel_link = settings.CHANNEL_LINK
         
         try:
-            member = await bot.get_chat_member(chat_id=channel_id, user_id=telegram_id)
+            # Кнопка «Я подписался» всегда перепроверяет статус в Telegram
+            force_refresh = isinstance(event, CallbackQuery) and event.data == "sub_channel_check"
+            member_status = await channel_membership_service.get_status(
+                bot,
+                channel_id,
+                telegram_id,
+                force_refresh=force_refresh,
+            )
             
-            if member.status in self.GOOD_MEMBER_STATUS:
+            if member_status in self.GOOD_MEMBER_STATUS:
                 return await handler(event, data)
-            elif member.status in self.BAD_MEMBER_STATUS:
-                logger.info(f"❌ Пользователь {telegram_id} не подписан на канал (статус: {member.status})")
+            elif member_status in self.BAD_MEMBER_STATUS:
+                logger.info(f"❌ Пользователь {telegram_id} не подписан на канал (статус: {member_status})")
 
                 if telegram_id:
-                    await self._deactivate_trial_subscription(telegram_id)
+                    await self._deactivate_trial_subscription(data, telegram_id)
 
                 if isinstance(event, CallbackQuery) and event.data == "sub_channel_check":
                     await event.answer("❌ Вы еще не подписались на канал! Подпишитесь и попробуйте снова.", show_alert=True)
@@ -110,7 +117,7 @@ class ChannelCheckerMiddleware(BaseMiddleware):
 
                 return await self._deny_message(event, bot, channel_link)
             else:
-                logger.warning(f"⚠️ Неожиданный статус пользователя {telegram_id}: {member.status}")
+                logger.warning(f"⚠️ Неожиданный статус пользователя {telegram_id}: {member_status}")
                 return await self._deny_message(event, bot, channel_link)
                 
         except TelegramForbiddenError as e:
@@ -128,52 +135,55 @@ class ChannelCheckerMiddleware(BaseMiddleware):
             logger.error(f"❌ Неожиданная ошибка при проверке подписки: {e}")
             return await handler(event, data)
 
-    async def _deactivate_trial_subscription(self, telegram_id: int) -> None:
-        async for db in get_db():
-            try:
-                user = await get_user_by_telegram_id(db, telegram_id)
-                if not user or not user.subscription:
-                    logger.debug(
-                        "⚠️ Пользователь %s отсутствует или не имеет подписки — пропускаем деактивацию",
-                        telegram_id,
-                    )
-                    break
-
-                subscription = user.subscription
-                if (not subscription.is_trial or
-                        subscription.status != SubscriptionStatus.ACTIVE.value):
-                    logger.debug(
-                        "ℹ️ Подписка пользователя %s не требует деактивации (trial=%s, status=%s)",
-                        telegram_id,
-                        subscription.is_trial,
-                        subscription.status,
-                    )
-                    break
+    async def _deactivate_trial_subscription(self, data: Dict[str, Any], telegram_id: int) -> None:
+        db = data.get('db')
+        if db is None:
+            logger.debug("⚠️ Сессия БД недоступна — пропускаем деактивацию для %s", telegram_id)
+            return
 
-                await deactivate_subscription(db, subscription)
-                logger.info(
-                    "🚫 Триальная подписка пользователя %s отключена после отписки от канала",
+        try:
+            user = await get_event_user(db, data, telegram_id)
+            if not user or not user.subscription:
+                logger.debug(
+                    "⚠️ Пользователь %s отсутствует или не имеет подписки — пропускаем деактивацию",
                     telegram_id,
                 )
+                return
 
-                if user.remnawave_uuid:
-                    service = SubscriptionService()
-                    try:
-                        await service.disable_remnawave_user(user.remnawave_uuid)
-                    except Exception as api_error:
-                        logger.error(
-                            "❌ Не удалось отключить пользователя RemnaWave %s: %s",
-                            user.remnawave_uuid,
-                            api_error,
-                        )
-            except Exception as db_error:
-                logger.error(
-                    "❌ Ошибка деактивации подписки пользователя %s после отписки: %s",
+            subscription = user.subscription
+            if (not subscription.is_trial or
+                    subscription.status != SubscriptionStatus.ACTIVE.value):
+                logger.debug(
+                    "ℹ️ Подписка пользователя %s не требует деактивации (trial=%s, status=%s)",
                     telegram_id,
-                    db_error,
+                    subscription.is_trial,
+                    subscription.status,
                 )
-            finally:
-                break
+                return
+
+            await deactivate_subscription(db, subscription)
+            logger.info(
+                "🚫 Триальная подписка пользователя %s отключена после отписки от канала",
+                telegram_id,
+            )
+
+            if user.remnawave_uuid:
+                service = SubscriptionService()
+                try:
+                    await service.disable_remnawave_user(user.remnawave_uuid, db)
+                except Exception as api_error:
+                    logger.error(
+                        "❌ Не удалось отключить пользователя RemnaWave %s: %s",
+                        user.remnawave_uuid,
+                        api_error,
+                    )
+        except Exception as db_error:
+            await db.rollback()
+            logger.error(
+                "❌ Ошибка деактивации подписки пользователя %s после отписки: %s",
+                telegram_id,
+                db_error,
+            )
 
     @staticmethod
     async def _deny_message(event: TelegramObject, bot: Bot, channel_link: str):
@@ -0,0 +1,75 @@
+import logging
+from typing import Callable, Dict, Any, Awaitable, Optional
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import AsyncSessionLocal
+from app.database.crud.user import get_user_by_telegram_id
+from app.database.models import User
+
+logger = logging.getLogger(__name__)
+
+_EVENT_USER_KEY = "_event_db_user"
+
+
+async def get_event_user(
+    db: AsyncSession,
+    data: Dict[str, Any],
+    telegram_id: int
+) -> Optional[User]:
+    """Загружает пользователя один раз на апдейт и переиспользует его во всей цепочке middleware."""
+
+    if _EVENT_USER_KEY in data:
+        return data[_EVENT_USER_KEY]
+
+    user = await get_user_by_telegram_id(db, telegram_id)
+    data[_EVENT_USER_KEY] = user
+    return user
+
+
+async def commit_middleware_changes(db: AsyncSession) -> None:
+    """Фиксирует изменения, внесённые middleware, до вызова обработчика.
+
+    Обновление профиля или статуса подписки не должно откатываться вместе
+    с транзакцией обработчика, если тот завершится исключением.
+    """
+
+    if not (db.new or db.dirty or db.deleted):
+        return
+
+    try:
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+
+class DatabaseSessionMiddleware(BaseMiddleware):
+    """Открывает одну сессию БД на апдейт и фиксирует изменения после обработчика.
+
+    Middleware, которые сами пишут в базу, фиксируют свои изменения через
+    commit_middleware_changes до передачи апдейта дальше по цепочке.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+
+        if data.get('db') is not None:
+            return await handler(event, data)
+
+        async with AsyncSessionLocal() as db:
+            data['db'] = db
+            try:
+                result = await handler(event, data)
+                await db.commit()
+                return result
+            except Exception:
+                await db.rollback()
+                raise
+            finally:
+                data.pop(_EVENT_USER_KEY, None)
@@ -1,72 +1,169 @@
-import asyncio
 import logging
 import time
-from typing import Callable, Dict, Any, Awaitable
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Any, Awaitable, Hashable, Optional, Tuple
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, TelegramObject
 from aiogram.fsm.context import FSMContext
 
+from app.config import settings
+from app.utils.cache import cache, cache_key
+
 logger = logging.getLogger(__name__)
 
 
+_SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) >= limit then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], window)
+return 1
+"""
+
+
+@dataclass(frozen=True)
+class ThrottleRule:
+    limit: int
+    window: float
+
+
+class SlidingWindowLimiter:
+    """Скользящее окно «не больше limit событий за window секунд» в памяти.
+
+    Ключи хранятся в OrderedDict в порядке последнего события, поэтому
+    устаревшие ключи снимаются с начала очереди — амортизированно O(1)
+    на событие вместо пересборки всего словаря.
+    """
+
+    def __init__(self, max_window: float = 60.0):
+        self.max_window = max_window
+        self._events: "OrderedDict[Hashable, Deque[float]]" = OrderedDict()
+
+    def hit(self, key: Hashable, rule: ThrottleRule, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        events = self._events.get(key)
+        if events is None:
+            events = deque(maxlen=max(1, rule.limit))
+            self._events[key] = events
+
+        threshold = now - rule.window
+        while events and events[0] <= threshold:
+            events.popleft()
+
+        if len(events) >= rule.limit:
+            return False
+
+        events.append(now)
+        self._events.move_to_end(key)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def _expire(self, now: float) -> None:
+        threshold = now - self.max_window
+        while self._events:
+            key, events = next(iter(self._events.items()))
+            if events and events[-1] > threshold:
+                break
+            self._events.popitem(last=False)
+
+
 class ThrottlingMiddleware(BaseMiddleware):
-    
-    def __init__(self, rate_limit: float = 0.5):
-        self.rate_limit = rate_limit
-        self.user_buckets: Dict[int, float] = {}
-    
+    """Ограничивает частоту сообщений и нажатий кнопок от одного пользователя.
+
+    Лимиты задаются отдельно для message и callback_query. При
+    THROTTLING_BACKEND=redis счётчики общие для всех реплик бота; если Redis
+    недоступен, используется локальный лимитер.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[Dict[str, ThrottleRule]] = None,
+        backend: Optional[str] = None,
+    ):
+        self.rules = rules or {
+            "message": ThrottleRule(
+                settings.THROTTLING_MESSAGE_LIMIT,
+                settings.THROTTLING_MESSAGE_WINDOW_SECONDS,
+            ),
+            "callback_query": ThrottleRule(
+                settings.THROTTLING_CALLBACK_LIMIT,
+                settings.THROTTLING_CALLBACK_WINDOW_SECONDS,
+            ),
+        }
+        self.backend = (backend or settings.THROTTLING_BACKEND or "local").strip().lower()
+        self.limiter = SlidingWindowLimiter(
+            max_window=max([rule.window for rule in self.rules.values()] + [1.0])
+        )
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        
+
         user_id = None
         if isinstance(event, (Message, CallbackQuery)):
             user_id = event.from_user.id
-        
+
         if not user_id:
             return await handler(event, data)
-        
-        now = time.time()
-        last_call = self.user_buckets.get(user_id, 0)
-        
-        if now - last_call < self.rate_limit:
-            logger.warning(f"🚫 Throttling для пользователя {user_id}")
-
-            # Для сообщений: молчим только если это состояние работы с тикетами; иначе показываем блок
-            if isinstance(event, Message):
-                try:
-                    fsm: FSMContext = data.get("state")  # может отсутствовать
-                    current = await fsm.get_state() if fsm else None
-                except Exception:
-                    current = None
-                is_ticket_state = False
-                if current:
-                    # Молчим только в состояниях работы с тикетами (user/admin): waiting_for_message / waiting_for_reply
-                    lowered = str(current)
-                    is_ticket_state = (
-                        (":waiting_for_message" in lowered or ":waiting_for_reply" in lowered) and
-                        ("TicketStates" in lowered or "AdminTicketStates" in lowered)
-                    )
-                if is_ticket_state:
-                    return
-                # В остальных случаях — явный блок
-                await event.answer("⏳ Пожалуйста, не отправляйте сообщения так часто!")
-                return
-            # Для callback допустим краткое уведомление
-            elif isinstance(event, CallbackQuery):
-                await event.answer("⏳ Слишком быстро! Подождите немного.", show_alert=True)
+
+        action = "message" if isinstance(event, Message) else "callback_query"
+        rule = self.rules.get(action)
+        if rule is None or await self._allow((action, user_id), rule):
+            return await handler(event, data)
+
+        logger.warning(f"🚫 Throttling для пользователя {user_id}")
+
+        # Для сообщений: молчим только если это состояние работы с тикетами; иначе показываем блок
+        if isinstance(event, Message):
+            try:
+                fsm: FSMContext = data.get("state")  # может отсутствовать
+                current = await fsm.get_state() if fsm else None
+            except Exception:
+                current = None
+            is_ticket_state = False
+            if current:
+                # Молчим только в состояниях работы с тикетами (user/admin): waiting_for_message / waiting_for_reply
+                lowered = str(current)
+                is_ticket_state = (
+                    (":waiting_for_message" in lowered or ":waiting_for_reply" in lowered) and
+                    ("TicketStates" in lowered or "AdminTicketStates" in lowered)
+                )
+            if is_ticket_state:
                 return
-        
-        self.user_buckets[user_id] = now
-        
-        cleanup_threshold = now - 60
-        self.user_buckets = {
-            uid: timestamp 
-            for uid, timestamp in self.user_buckets.items() 
-            if timestamp > cleanup_threshold
-        }
-        
-        return await handler(event, data)
\ No newline at end of file
+            # В остальных случаях — явный блок
+            await event.answer("⏳ Пожалуйста, не отправляйте сообщения так часто!")
+            return
+        # Для callback допустим краткое уведомление
+        await event.answer("⏳ Слишком быстро! Подождите немного.", show_alert=True)
+
+    async def _allow(self, key: Tuple[str, int], rule: ThrottleRule) -> bool:
+        if self.backend == "redis" and cache.is_connected:
+            try:
+                allowed = await cache.redis_client.eval(
+                    _SLIDING_WINDOW_SCRIPT,
+                    1,
+                    cache_key("throttle", *key),
+                    int(time.time() * 1000),
+                    max(1, int(rule.window * 1000)),
+                    rule.limit,
+                    uuid.uuid4().hex,
+                )
+                return bool(allowed)
+            except Exception as error:
+                logger.error(f"Ошибка проверки лимита в Redis, используется локальный лимит: {error}")
+
+        return self.limiter.hit(key, rule)
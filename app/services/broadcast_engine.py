@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, Optional, Tuple, Union
+
+from aiogram.exceptions import (
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+Recipients = Union[Iterable[int], AsyncIterable[int]]
+SendFunc = Callable[[int], Awaitable[Any]]
+ProgressCallback = Callable[["BroadcastResult"], Awaitable[None]]
+ResultCallback = Callable[[int, bool, Optional[str]], Awaitable[None]]
+
+TRANSIENT_ERRORS = (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)
+
+
+class TokenBucket:
+    """Глобальный ограничитель частоты отправки с адаптацией к RetryAfter.
+
+    После RetryAfter все отправители ждут указанное Telegram время, а
+    скорость снижается; затем она постепенно возвращается к исходной.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.max_rate = max(0.1, rate)
+        self.rate = self.max_rate
+        self.capacity = max(1.0, capacity if capacity is not None else self.max_rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self._successes_since_penalty = 0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def penalize(self, retry_after: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        self._paused_until = max(self._paused_until, now + max(0.0, retry_after))
+        self._tokens = 0.0
+        self.rate = max(1.0, self.rate * 0.7)
+        self._successes_since_penalty = 0
+
+    def record_success(self) -> None:
+        if self.rate >= self.max_rate:
+            return
+        self._successes_since_penalty += 1
+        if self._successes_since_penalty >= 50:
+            self.rate = min(self.max_rate, self.rate * 1.1)
+            self._successes_since_penalty = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+
+@dataclass
+class BroadcastResult:
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    cancelled: bool = False
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
+
+
+class BroadcastEngine:
+    """Рассылает сообщения несколькими отправителями через общий TokenBucket.
+
+    send(telegram_id) выполняет саму отправку. RetryAfter соблюдается для
+    всех отправителей сразу, временные ошибки сети и сервера Telegram
+    повторяются с экспоненциальной задержкой, остальные ошибки (бот
+    заблокирован, чат не найден) считаются окончательными.
+
+    Исключение в любом участнике (например, в on_result при записи итогов)
+    останавливает остальных: новые получатели не забираются и сообщения
+    больше не отправляются, а исключение передаётся вызывающему коду.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        progress_every: int = 100,
+    ):
+        self.rate = rate or settings.BROADCAST_RATE_LIMIT
+        self.concurrency = max(1, concurrency or settings.BROADCAST_CONCURRENCY)
+        self.max_retries = max(0, settings.BROADCAST_MAX_RETRIES if max_retries is None else max_retries)
+        self.progress_every = max(1, progress_every)
+
+    async def run(
+        self,
+        recipients: Recipients,
+        send: SendFunc,
+        *,
+        cancel_event: Optional[asyncio.Event] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        on_result: Optional[ResultCallback] = None,
+        result: Optional[BroadcastResult] = None,
+    ) -> BroadcastResult:
+        result = result or BroadcastResult()
+        bucket = TokenBucket(self.rate)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 4)
+        cancel_event = cancel_event or asyncio.Event()
+        next_progress = result.processed + self.progress_every
+        aborted = asyncio.Event()
+
+        async def guarded_send(telegram_id: int) -> Any:
+            if aborted.is_set():
+                # Другой участник упал, задачи вот-вот будут отменены
+                raise asyncio.CancelledError()
+            return await send(telegram_id)
+
+        async def report_progress() -> None:
+            nonlocal next_progress
+            if on_progress is None or result.processed < next_progress:
+                return
+            next_progress = result.processed + self.progress_every
+            try:
+                await on_progress(result)
+            except Exception as error:  # noqa: BLE001
+                logger.warning("Ошибка обновления прогресса рассылки: %s", error)
+
+        async def producer() -> None:
+            try:
+                if isinstance(recipients, AsyncIterable):
+                    async for telegram_id in recipients:
+                        if cancel_event.is_set() or aborted.is_set():
+                            break
+                        await queue.put(telegram_id)
+                else:
+                    for telegram_id in recipients:
+                        if cancel_event.is_set() or aborted.is_set():
+                            break
+                        await queue.put(telegram_id)
+            finally:
+                for _ in range(self.concurrency):
+                    await queue.put(None)
+
+        async def worker() -> None:
+            while True:
+                telegram_id = await queue.get()
+                if telegram_id is None or aborted.is_set():
+                    return
+                if cancel_event.is_set():
+                    continue
+
+                success, error = await self._send_with_retries(
+                    bucket, guarded_send, telegram_id, result, cancel_event
+                )
+                if success:
+                    result.sent += 1
+                    bucket.record_success()
+                else:
+                    result.failed += 1
+
+                if on_result is not None:
+                    await on_result(telegram_id, success, error)
+
+                await report_progress()
+
+        async def guarded(coro: Awaitable[None]) -> None:
+            try:
+                await coro
+            except BaseException:
+                aborted.set()
+                raise
+
+        tasks = [
+            asyncio.create_task(guarded(producer())),
+            *(asyncio.create_task(guarded(worker())) for _ in range(self.concurrency)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        result.cancelled = cancel_event.is_set()
+        return result
+
+    async def _send_with_retries(
+        self,
+        bucket: TokenBucket,
+        send: SendFunc,
+        telegram_id: int,
+        result: BroadcastResult,
+        cancel_event: asyncio.Event,
+    ) -> Tuple[bool, Optional[str]]:
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            try:
+                await send(telegram_id)
+                return True, None
+            except TelegramRetryAfter as error:
+                bucket.penalize(error.retry_after)
+                logger.warning(
+                    "⏳ Telegram ограничил рассылку: пауза %s с, скорость снижена до %.1f сообщ./с",
+                    error.retry_after,
+                    bucket.rate,
+                )
+            except TRANSIENT_ERRORS as error:
+                if attempt >= self.max_retries:
+                    logger.error(
+                        "Ошибка отправки рассылки пользователю %s после %s повторов: %s",
+                        telegram_id,
+                        attempt,
+                        error,
+                    )
+                    return False, str(error)
+                await asyncio.sleep(min(30, 2 ** attempt))
+            except Exception as error:  # noqa: BLE001
+                logger.error("Ошибка отправки рассылки пользователю %s: %s", telegram_id, error)
+                return False, str(error)
+
+            if cancel_event.is_set():
+                return False, "cancelled"
+            attempt += 1
+            result.retried += 1
+            # RetryAfter повторяется дольше временных ошибок, но не бесконечно
+            if attempt > self.max_retries + 5:
+                return False, "retry limit exceeded"
@@ -2,20 +2,39 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import os
+import socket
+import uuid
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup
 
+from sqlalchemy import select
+
+from app.database.crud.broadcast_recipient import (
+    RECIPIENT_PENDING,
+    RECIPIENTS_MATERIALIZED,
+    RECIPIENTS_MATERIALIZING,
+    acquire_broadcast,
+    broadcast_has_live_owner,
+    claim_pending_recipients,
+    count_broadcast_recipients,
+    fail_interrupted_recipients,
+    mark_recipient_sending,
+    materialize_broadcast_recipients,
+    record_recipient_results,
+    release_broadcast,
+    release_unsent_recipients,
+    touch_broadcast,
+)
+from app.database.crud.broadcast_target import iter_target_telegram_ids
 from app.database.database import AsyncSessionLocal
 from app.database.models import BroadcastHistory
-from app.handlers.admin.messages import (
-    create_broadcast_keyboard,
-    get_custom_users,
-    get_target_users,
-)
+from app.services.broadcast_engine import BroadcastEngine, BroadcastResult
+from app.handlers.admin.messages import create_broadcast_keyboard
 try:
     from app.webapi.routes.notifications import broker as sse_broker  # type: ignore
 except Exception:  # pragma: no cover
@@ -26,6 +45,9 @@ logger = logging.getLogger(__name__)
 
 
 VALID_MEDIA_TYPES = {"photo", "video", "document"}
+RECIPIENT_BATCH_SIZE = 100
+HEARTBEAT_INTERVAL_SECONDS = 30
+OWNER_STALE_AFTER = timedelta(seconds=HEARTBEAT_INTERVAL_SECONDS * 3)
 
 
 @dataclass(slots=True)
@@ -57,6 +79,7 @@ class BroadcastService:
         self._bot: Optional[Bot] = None
         self._tasks: dict[int, _BroadcastTask] = {}
         self._lock = asyncio.Lock()
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
 
     def set_bot(self, bot: Bot) -> None:
         self._bot = bot
@@ -65,7 +88,13 @@ class BroadcastService:
         task_entry = self._tasks.get(broadcast_id)
         return bool(task_entry and not task_entry.task.done())
 
-    async def start_broadcast(self, broadcast_id: int, config: BroadcastConfig) -> None:
+    async def start_broadcast(
+        self,
+        broadcast_id: int,
+        config: BroadcastConfig,
+        *,
+        resume: bool = False,
+    ) -> None:
         if self._bot is None:
             logger.error("Невозможно запустить рассылку %s: бот не инициализирован", broadcast_id)
             await self._mark_failed(broadcast_id)
@@ -79,7 +108,7 @@ class BroadcastService:
                 return
 
             task = asyncio.create_task(
-                self._run_broadcast(broadcast_id, config, cancel_event),
+                self._run_broadcast(broadcast_id, config, cancel_event, resume),
                 name=f"broadcast-{broadcast_id}",
             )
             self._tasks[broadcast_id] = _BroadcastTask(task=task, cancel_event=cancel_event)
@@ -99,13 +128,57 @@ class BroadcastService:
         broadcast_id: int,
         config: BroadcastConfig,
         cancel_event: asyncio.Event,
+        resume: bool = False,
     ) -> None:
-        sent_count = 0
-        failed_count = 0
+        async with AsyncSessionLocal() as session:
+            acquired = await acquire_broadcast(session, broadcast_id, self.instance_id, OWNER_STALE_AFTER)
+        if not acquired:
+            logger.info("Рассылка %s выполняется другим экземпляром бота", broadcast_id)
+            return
 
+        heartbeat = asyncio.create_task(self._heartbeat(broadcast_id, cancel_event))
+        try:
+            await self._execute_broadcast(broadcast_id, config, cancel_event, resume)
+        finally:
+            heartbeat.cancel()
+            try:
+                await heartbeat
+            except asyncio.CancelledError:
+                pass
+            try:
+                async with AsyncSessionLocal() as session:
+                    await release_broadcast(session, broadcast_id, self.instance_id)
+            except Exception as error:  # noqa: BLE001
+                logger.warning("Не удалось освободить рассылку %s: %s", broadcast_id, error)
+
+    async def _heartbeat(self, broadcast_id: int, cancel_event: asyncio.Event) -> None:
+        """Продлевает владение рассылкой и подхватывает остановку, запрошенную на другой реплике."""
+
+        while not cancel_event.is_set():
+            await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+            try:
+                async with AsyncSessionLocal() as session:
+                    status = await touch_broadcast(session, broadcast_id, self.instance_id)
+            except Exception as error:  # noqa: BLE001
+                logger.warning("Ошибка продления владения рассылкой %s: %s", broadcast_id, error)
+                continue
+
+            if status is None:
+                logger.warning("Рассылка %s перехвачена другим экземпляром, отправка остановлена", broadcast_id)
+                cancel_event.set()
+            elif status in {"cancelling", "cancelled"}:
+                cancel_event.set()
+
+    async def _execute_broadcast(
+        self,
+        broadcast_id: int,
+        config: BroadcastConfig,
+        cancel_event: asyncio.Event,
+        resume: bool = False,
+    ) -> None:
         try:
             if cancel_event.is_set():
-                await self._mark_cancelled(broadcast_id, sent_count, failed_count)
+                await self._mark_cancelled(broadcast_id)
                 return
 
             async with AsyncSessionLocal() as session:
@@ -115,8 +188,12 @@ class BroadcastService:
                     return
 
                 broadcast.status = "in_progress"
-                broadcast.sent_count = 0
-                broadcast.failed_count = 0
+                if not resume:
+                    broadcast.sent_count = 0
+                    broadcast.failed_count = 0
+                if broadcast.recipients_phase is None:
+                    broadcast.recipients_phase = RECIPIENTS_MATERIALIZING
+                materialized = broadcast.recipients_phase == RECIPIENTS_MATERIALIZED
                 await session.commit()
                 # Notify UI that broadcast started
                 try:
@@ -125,15 +202,34 @@ class BroadcastService:
                 except Exception:
                     pass
 
-            recipients = await self._fetch_recipients(config.target)
-
             async with AsyncSessionLocal() as session:
+                interrupted = await fail_interrupted_recipients(session, broadcast_id)
+                if interrupted:
+                    logger.warning(
+                        "Рассылка %s: %s получателей с прерванной отправкой помечены неуспешными",
+                        broadcast_id,
+                        interrupted,
+                    )
+
+                if not materialized:
+                    # Список мог сохраниться частично до сбоя: вставка идемпотентна,
+                    # поэтому просто повторяем её целиком
+                    async with AsyncSessionLocal() as target_session:
+                        await materialize_broadcast_recipients(
+                            session,
+                            broadcast_id,
+                            iter_target_telegram_ids(target_session, config.target),
+                        )
+
+                recipient_counts = await count_broadcast_recipients(session, broadcast_id)
+
                 broadcast = await session.get(BroadcastHistory, broadcast_id)
                 if not broadcast:
                     logger.error("Запись рассылки %s удалена до запуска", broadcast_id)
                     return
 
-                broadcast.total_count = len(recipients)
+                broadcast.recipients_phase = RECIPIENTS_MATERIALIZED
+                broadcast.total_count = sum(recipient_counts.values())
                 await session.commit()
                 try:
                     if sse_broker is not None:
@@ -142,77 +238,171 @@ class BroadcastService:
                     pass
 
             if cancel_event.is_set():
-                await self._mark_cancelled(broadcast_id, sent_count, failed_count)
+                await self._mark_cancelled(broadcast_id)
                 return
 
-            if not recipients:
-                logger.info("Рассылка %s: получатели не найдены", broadcast_id)
-                await self._mark_finished(broadcast_id, sent_count, failed_count, cancelled=False)
+            if not recipient_counts.get(RECIPIENT_PENDING):
+                logger.info("Рассылка %s: получатели для отправки не найдены", broadcast_id)
+                await self._mark_finished(broadcast_id, cancelled=False)
                 return
 
             keyboard = self._build_keyboard(config.selected_buttons)
+            result = await self._send_pending(broadcast_id, config, keyboard, cancel_event)
 
-            for index, user in enumerate(recipients, start=1):
-                if cancel_event.is_set():
-                    await self._mark_cancelled(broadcast_id, sent_count, failed_count)
-                    return
-
-                telegram_id = getattr(user, "telegram_id", None)
-                if telegram_id is None:
-                    failed_count += 1
-                    continue
-
-                try:
-                    await self._deliver_message(telegram_id, config, keyboard)
-                    sent_count += 1
-                except Exception as exc:  # noqa: BLE001
-                    failed_count += 1
-                    logger.error(
-                        "Ошибка отправки рассылки %s пользователю %s: %s",
-                        broadcast_id,
-                        telegram_id,
-                        exc,
-                    )
-
-                if index % 20 == 0:
-                    await asyncio.sleep(1)
-                    # Periodic progress ping
-                    try:
-                        if sse_broker is not None:
-                            await sse_broker.publish("broadcasts.update")
-                    except Exception:
-                        pass
+            if result.cancelled:
+                await self._mark_cancelled(broadcast_id)
+                return
 
-            await self._mark_finished(broadcast_id, sent_count, failed_count, cancelled=False)
-            try:
-                if sse_broker is not None:
-                    await sse_broker.publish("broadcasts.update")
-            except Exception:
-                pass
+            await self._mark_finished(broadcast_id, cancelled=False)
 
         except asyncio.CancelledError:
-            await self._mark_cancelled(broadcast_id, sent_count, failed_count)
-            try:
-                if sse_broker is not None:
-                    await sse_broker.publish("broadcasts.update")
-            except Exception:
-                pass
+            await self._mark_cancelled(broadcast_id)
             raise
         except Exception as exc:  # noqa: BLE001
             logger.exception("Критическая ошибка при выполнении рассылки %s: %s", broadcast_id, exc)
-            await self._mark_failed(broadcast_id, sent_count, failed_count)
+            await self._mark_failed(broadcast_id)
+
+    async def _send_pending(
+        self,
+        broadcast_id: int,
+        config: BroadcastConfig,
+        keyboard: Optional[InlineKeyboardMarkup],
+        cancel_event: asyncio.Event,
+    ) -> BroadcastResult:
+        """Отправляет сообщения ещё не обработанным получателям рассылки.
+
+        Получатели забираются из broadcast_recipients пачками (claimed),
+        непосредственно перед отправкой каждый переводится в sending, итоги
+        записываются пачками по RECIPIENT_BATCH_SIZE вместе со
+        счётчиками в broadcast_history.
+        """
+
+        batch_size = RECIPIENT_BATCH_SIZE
+        recipient_ids: dict[int, int] = {}
+        pending_results: list[tuple[int, bool, Optional[str]]] = []
+        started: set[int] = set()
+        flush_lock = asyncio.Lock()
+
+        async def stream_recipients():
+            while not cancel_event.is_set():
+                async with AsyncSessionLocal() as session:
+                    claimed = await claim_pending_recipients(session, broadcast_id, limit=batch_size)
+                if not claimed:
+                    return
+                recipient_ids.update((telegram_id, recipient_id) for recipient_id, telegram_id in claimed)
+                for _, telegram_id in claimed:
+                    yield telegram_id
+
+        async def flush_results() -> None:
+            async with flush_lock:
+                if not pending_results:
+                    return
+                batch = pending_results[:]
+                pending_results.clear()
+                async with AsyncSessionLocal() as session:
+                    await record_recipient_results(session, broadcast_id, batch)
             try:
                 if sse_broker is not None:
                     await sse_broker.publish("broadcasts.update")
             except Exception:
                 pass
 
-    async def _fetch_recipients(self, target: str):
+        async def on_result(telegram_id: int, success: bool, error: Optional[str]) -> None:
+            recipient_id = recipient_ids.pop(telegram_id, None)
+            if recipient_id is None:
+                return
+            started.discard(recipient_id)
+            pending_results.append((recipient_id, success, error))
+            if len(pending_results) >= batch_size:
+                await flush_results()
+
+        async def send(telegram_id: int) -> None:
+            recipient_id = recipient_ids.get(telegram_id)
+            if recipient_id is not None and recipient_id not in started:
+                started.add(recipient_id)
+                async with AsyncSessionLocal() as session:
+                    await mark_recipient_sending(session, recipient_id)
+            await self._deliver_message(telegram_id, config, keyboard)
+
+        try:
+            return await BroadcastEngine().run(
+                stream_recipients(),
+                send,
+                cancel_event=cancel_event,
+                on_result=on_result,
+            )
+        finally:
+            await flush_results()
+            if recipient_ids:
+                # Получатели, забранные, но не обработанные из-за остановки, возвращаются в очередь
+                async with AsyncSessionLocal() as session:
+                    await release_unsent_recipients(session, list(recipient_ids.values()))
+
+    async def resume_unfinished(self) -> int:
+        """Продолжает рассылки, прерванные перезапуском бота."""
+
+        if self._bot is None:
+            return 0
+
+        resumed = 0
         async with AsyncSessionLocal() as session:
-            if target.startswith("custom_"):
-                criteria = target[len("custom_"):]
-                return await get_custom_users(session, criteria)
-            return await get_target_users(session, target)
+            result = await session.execute(
+                select(BroadcastHistory).where(
+                    BroadcastHistory.status.in_(["queued", "in_progress", "cancelling"])
+                )
+            )
+            broadcasts = result.scalars().all()
+
+            for broadcast in broadcasts:
+                if broadcast_has_live_owner(broadcast, OWNER_STALE_AFTER):
+                    continue
+
+                if broadcast.status == "cancelling":
+                    broadcast.status = "cancelled"
+                    broadcast.completed_at = datetime.utcnow()
+                    continue
+
+                # Рассылки, начатые до появления broadcast_recipients, не
+                # возобновляем: неизвестно, кому сообщение уже отправлено.
+                # Новые рассылки получают recipients_phase вместе со статусом
+                # in_progress, поэтому пустой этап без получателей — только у старых.
+                if (
+                    broadcast.status == "in_progress"
+                    and broadcast.recipients_phase is None
+                    and not await count_broadcast_recipients(session, broadcast.id)
+                ):
+                    continue
+
+                resumed += 1
+                await self.start_broadcast(
+                    broadcast.id,
+                    self._config_from_history(broadcast),
+                    resume=broadcast.status == "in_progress",
+                )
+
+            await session.commit()
+
+        if resumed:
+            logger.info("🔁 Возобновлено рассылок после перезапуска: %s", resumed)
+        return resumed
+
+    @staticmethod
+    def _config_from_history(broadcast: BroadcastHistory) -> BroadcastConfig:
+        media = None
+        if broadcast.has_media and broadcast.media_type and broadcast.media_file_id:
+            media = BroadcastMediaConfig(
+                type=broadcast.media_type,
+                file_id=broadcast.media_file_id,
+                caption=broadcast.media_caption or broadcast.message_text or None,
+            )
+
+        return BroadcastConfig(
+            target=broadcast.target_type,
+            message_text=broadcast.message_text,
+            selected_buttons=list(broadcast.selected_buttons or []),
+            media=media,
+            initiator_name=broadcast.admin_name,
+        )
 
     def _build_keyboard(self, selected_buttons: Optional[list[str]]) -> Optional[InlineKeyboardMarkup]:
         if selected_buttons is None:
@@ -262,20 +452,16 @@ class BroadcastService:
     async def _mark_finished(
         self,
         broadcast_id: int,
-        sent_count: int,
-        failed_count: int,
         *,
         cancelled: bool,
     ) -> None:
         async with AsyncSessionLocal() as session:
             broadcast = await session.get(BroadcastHistory, broadcast_id)
-            if not broadcast:
+            if not broadcast or not self._owns(broadcast):
                 return
 
-            broadcast.sent_count = sent_count
-            broadcast.failed_count = failed_count
             broadcast.status = "cancelled" if cancelled else (
-                "completed" if failed_count == 0 else "partial"
+                "completed" if not broadcast.failed_count else "partial"
             )
             broadcast.completed_at = datetime.utcnow()
             await session.commit()
@@ -285,32 +471,19 @@ class BroadcastService:
         except Exception:
             pass
 
-    async def _mark_cancelled(
-        self,
-        broadcast_id: int,
-        sent_count: int,
-        failed_count: int,
-    ) -> None:
-        await self._mark_finished(
-            broadcast_id,
-            sent_count,
-            failed_count,
-            cancelled=True,
-        )
+    def _owns(self, broadcast: BroadcastHistory) -> bool:
+        # Рассылку, перехваченную другим экземпляром, он и завершит
+        return broadcast.owner_id in (None, self.instance_id)
 
-    async def _mark_failed(
-        self,
-        broadcast_id: int,
-        sent_count: int = 0,
-        failed_count: int = 0,
-    ) -> None:
+    async def _mark_cancelled(self, broadcast_id: int) -> None:
+        await self._mark_finished(broadcast_id, cancelled=True)
+
+    async def _mark_failed(self, broadcast_id: int) -> None:
         async with AsyncSessionLocal() as session:
             broadcast = await session.get(BroadcastHistory, broadcast_id)
-            if not broadcast:
+            if not broadcast or not self._owns(broadcast):
                 return
 
-            broadcast.sent_count = sent_count
-            broadcast.failed_count = failed_count or broadcast.failed_count
             broadcast.status = "failed"
             broadcast.completed_at = datetime.utcnow()
             await session.commit()
@@ -322,4 +495,3 @@ class BroadcastService:
 
 
 broadcast_service = BroadcastService()
-
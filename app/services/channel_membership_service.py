@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.enums import ChatMemberStatus
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import ChatMemberUpdated
+
+from app.config import settings
+from app.utils.cache import cache, cache_key
+
+
+logger = logging.getLogger(__name__)
+
+
+GOOD_MEMBER_STATUSES = (
+    ChatMemberStatus.MEMBER,
+    ChatMemberStatus.ADMINISTRATOR,
+    ChatMemberStatus.CREATOR,
+)
+
+ChannelId = Union[int, str]
+
+
+class ChannelMembershipService:
+    """Кеширует статусы участников обязательного канала.
+
+    Статус ищется в локальном LRU, затем в Redis и только потом запрашивается
+    у Telegram. Подписчики кешируются надолго, отписавшиеся — коротко, чтобы
+    подписка «на лету» быстро начинала действовать. Обновления chat_member
+    записывают новый статус сразу. Массовые проверки идут с ограничением
+    частоты, чтобы не выходить за лимиты Bot API.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        positive_ttl: Optional[int] = None,
+        negative_ttl: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+    ):
+        self.max_entries = max(100, max_entries or settings.CHANNEL_MEMBERSHIP_CACHE_SIZE)
+        self.positive_ttl = max(1, positive_ttl or settings.CHANNEL_MEMBERSHIP_POSITIVE_TTL)
+        self.negative_ttl = max(1, negative_ttl or settings.CHANNEL_MEMBERSHIP_NEGATIVE_TTL)
+        rate = requests_per_second or settings.CHANNEL_MEMBERSHIP_RECHECK_RATE
+        self._min_interval = 1.0 / max(0.1, rate)
+        self._local: "OrderedDict[Tuple[str, int], Tuple[str, float]]" = OrderedDict()
+        self._pace_lock = asyncio.Lock()
+        self._next_request_at = 0.0
+        self.stats: Dict[str, int] = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "api_requests": 0,
+            "invalidations": 0,
+        }
+
+    @staticmethod
+    def is_member_status(status: Optional[str]) -> bool:
+        return status in GOOD_MEMBER_STATUSES
+
+    async def get_status(
+        self,
+        bot: Bot,
+        channel_id: ChannelId,
+        user_id: int,
+        *,
+        force_refresh: bool = False,
+        paced: bool = False,
+    ) -> str:
+        """Возвращает статус пользователя в канале.
+
+        Ошибки Telegram (TelegramForbiddenError, TelegramBadRequest и т.п.)
+        пробрасываются вызывающему коду и не кешируются.
+        """
+
+        key = (str(channel_id), int(user_id))
+
+        if not force_refresh:
+            cached = await self._get_cached(key)
+            if cached is not None:
+                return cached
+
+        if paced:
+            await self._wait_for_slot()
+
+        self.stats["api_requests"] += 1
+        member = await bot.get_chat_member(chat_id=channel_id, user_id=user_id)
+        status = str(getattr(member.status, "value", member.status))
+        await self._store(key, status)
+        return status
+
+    async def is_member(
+        self,
+        bot: Bot,
+        channel_id: ChannelId,
+        user_id: int,
+        *,
+        force_refresh: bool = False,
+        paced: bool = False,
+    ) -> bool:
+        status = await self.get_status(
+            bot, channel_id, user_id, force_refresh=force_refresh, paced=paced
+        )
+        return self.is_member_status(status)
+
+    async def get_statuses(
+        self,
+        bot: Bot,
+        channel_id: ChannelId,
+        user_ids: Iterable[int],
+    ) -> Dict[int, Optional[str]]:
+        """Массовая проверка: закешированные статусы отдаются сразу,
+        остальные запрашиваются с ограничением частоты.
+
+        Для пользователей, которых не удалось проверить, возвращается None.
+        """
+
+        statuses: Dict[int, Optional[str]] = {}
+        user_ids = list(user_ids)
+        await self._prefetch(channel_id, user_ids)
+
+        for user_id in user_ids:
+            try:
+                statuses[user_id] = await self.get_status(bot, channel_id, user_id, paced=True)
+            except TelegramRetryAfter as error:
+                logger.warning(
+                    "⏳ Telegram ограничил проверку подписок, пауза %s с",
+                    error.retry_after,
+                )
+                await self._delay_requests(error.retry_after)
+                try:
+                    statuses[user_id] = await self.get_status(bot, channel_id, user_id, paced=True)
+                except Exception as retry_error:
+                    logger.error(
+                        "❌ Не удалось проверить подписку пользователя %s на канал %s: %s",
+                        user_id,
+                        channel_id,
+                        retry_error,
+                    )
+                    statuses[user_id] = None
+            except Exception as error:
+                logger.error(
+                    "❌ Не удалось проверить подписку пользователя %s на канал %s: %s",
+                    user_id,
+                    channel_id,
+                    error,
+                )
+                statuses[user_id] = None
+
+        return statuses
+
+    async def invalidate(self, channel_id: ChannelId, user_id: int) -> None:
+        key = (str(channel_id), int(user_id))
+        self._local.pop(key, None)
+        self.stats["invalidations"] += 1
+        await cache.delete(self._redis_key(key))
+
+    async def handle_chat_member_update(self, update: ChatMemberUpdated) -> None:
+        """Обновляет кеш по событию chat_member, не дожидаясь истечения TTL."""
+
+        user_id = update.new_chat_member.user.id
+        status = str(getattr(update.new_chat_member.status, "value", update.new_chat_member.status))
+
+        channel_keys = {str(update.chat.id)}
+        if update.chat.username:
+            channel_keys.add(f"@{update.chat.username}")
+
+        await self._store_many([(channel_key, user_id) for channel_key in channel_keys], status)
+
+        logger.debug(
+            "🔄 Обновлен статус пользователя %s в канале %s: %s",
+            user_id,
+            update.chat.id,
+            status,
+        )
+
+    def matches_channel(self, chat_id: int, username: Optional[str], channel_id: ChannelId) -> bool:
+        channel = str(channel_id or "").strip()
+        if not channel:
+            return False
+        if channel == str(chat_id):
+            return True
+        return bool(username) and channel.lstrip("@").lower() == username.lower()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "local_entries": len(self._local)}
+
+    async def _get_cached(self, key: Tuple[str, int]) -> Optional[str]:
+        entry = self._local.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            status, expires_at = entry
+            if expires_at > now:
+                self._local.move_to_end(key)
+                self.stats["local_hits"] += 1
+                return status
+            self._local.pop(key, None)
+
+        status = await cache.get(self._redis_key(key))
+        if status is not None:
+            self.stats["redis_hits"] += 1
+            # Остаток TTL в Redis неизвестен, поэтому локально держим коротко
+            self._remember(key, status, min(self._ttl_for(status), self.negative_ttl))
+            return status
+
+        return None
+
+    async def _prefetch(self, channel_id: ChannelId, user_ids: Iterable[int]) -> None:
+        """Подгружает из Redis одним запросом статусы, которых нет в памяти."""
+
+        now = time.monotonic()
+        keys = {}
+        for user_id in user_ids:
+            key = (str(channel_id), int(user_id))
+            entry = self._local.get(key)
+            if entry is None or entry[1] <= now:
+                keys[self._redis_key(key)] = key
+
+        if not keys:
+            return
+
+        for redis_key, status in (await cache.get_many(keys)).items():
+            key = keys[redis_key]
+            self.stats["redis_hits"] += 1
+            self._remember(key, status, min(self._ttl_for(status), self.negative_ttl))
+
+    async def _store(self, key: Tuple[str, int], status: str) -> None:
+        ttl = self._ttl_for(status)
+        self._remember(key, status, ttl)
+        await cache.set(self._redis_key(key), status, ttl)
+
+    async def _store_many(self, keys: Iterable[Tuple[str, int]], status: str) -> None:
+        ttl = self._ttl_for(status)
+        mapping = {}
+        for key in keys:
+            self._remember(key, status, ttl)
+            mapping[self._redis_key(key)] = status
+        await cache.set_many(mapping, ttl)
+
+    def _remember(self, key: Tuple[str, int], status: str, ttl: int) -> None:
+        self._local[key] = (status, time.monotonic() + ttl)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def _ttl_for(self, status: str) -> int:
+        return self.positive_ttl if self.is_member_status(status) else self.negative_ttl
+
+    @staticmethod
+    def _redis_key(key: Tuple[str, int]) -> str:
+        return cache_key("channel_member", key[0], key[1])
+
+    async def _wait_for_slot(self) -> None:
+        async with self._pace_lock:
+            now = time.monotonic()
+            delay = self._next_request_at - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+                now = time.monotonic()
+            self._next_request_at = now + self._min_interval
+
+    async def _delay_requests(self, seconds: float) -> None:
+        async with self._pace_lock:
+            self._next_request_at = max(self._next_request_at, time.monotonic() + seconds)
+
+
+channel_membership_service = ChannelMembershipService()
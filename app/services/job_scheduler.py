@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import AsyncSessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+
+JobFunc = Callable[[AsyncSession], Awaitable[Any]]
+
+
+@dataclass
+class JobStats:
+    runs: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    skipped_overlaps: int = 0
+    last_started_at: Optional[datetime] = None
+    last_finished_at: Optional[datetime] = None
+    last_duration: float = 0.0
+    max_duration: float = 0.0
+    total_duration: float = 0.0
+    last_error: Optional[str] = None
+
+    def record(self, duration: float) -> None:
+        self.runs += 1
+        self.last_duration = duration
+        self.total_duration += duration
+        if duration > self.max_duration:
+            self.max_duration = duration
+
+
+@dataclass
+class ScheduledJob:
+    name: str
+    func: JobFunc
+    interval: float
+    timeout: float
+    group: Optional[str] = None
+    next_run_at: float = 0.0
+    stats: JobStats = field(default_factory=JobStats)
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+
+class JobScheduler:
+    """Запускает периодические задачи независимо друг от друга.
+
+    У каждой задачи свой интервал, таймаут и собственная сессия БД. Задача
+    не стартует, пока не завершился её предыдущий запуск, а задачи одной
+    группы (group) выполняются строго по очереди. Одновременно выполняется
+    не больше max_concurrency задач.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 3,
+        gate: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        # Если gate() возвращает False, новые запуски не начинаются
+        # (например, экземпляр не является лидером среди реплик).
+        self.gate = gate
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._group_locks: Dict[str, asyncio.Lock] = {}
+        self._running = False
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def jobs(self) -> List[ScheduledJob]:
+        return list(self._jobs.values())
+
+    def add_job(
+        self,
+        name: str,
+        func: JobFunc,
+        interval: float,
+        timeout: float,
+        group: Optional[str] = None,
+    ) -> ScheduledJob:
+        job = ScheduledJob(
+            name=name,
+            func=func,
+            interval=max(1.0, interval),
+            timeout=max(1.0, timeout),
+            group=group,
+        )
+        self._jobs[name] = job
+        return job
+
+    def is_running(self) -> bool:
+        return self._running
+
+    async def run_forever(self) -> None:
+        self._running = True
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._wakeup = asyncio.Event()
+
+        try:
+            while self._running:
+                self.run_due_jobs()
+
+                delay = self._seconds_until_next_job()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            self._running = False
+
+    def stop(self) -> None:
+        self._running = False
+        if self._wakeup:
+            self._wakeup.set()
+        self.cancel_running()
+
+    def cancel_running(self) -> List[str]:
+        cancelled = []
+        for job in self._jobs.values():
+            if job.is_running:
+                job.task.cancel()
+                cancelled.append(job.name)
+        return cancelled
+
+    def run_due_jobs(self) -> List[str]:
+        if self.gate and not self.gate():
+            return []
+
+        now = time.monotonic()
+        started = []
+
+        for job in self._jobs.values():
+            if job.next_run_at > now:
+                continue
+
+            job.next_run_at = now + job.interval
+
+            if job.is_running:
+                job.stats.skipped_overlaps += 1
+                logger.warning(
+                    "⏭️ Задача %s пропущена: предыдущий запуск ещё выполняется",
+                    job.name,
+                )
+                continue
+
+            job.task = asyncio.create_task(self._run_job(job))
+            started.append(job.name)
+
+        return started
+
+    async def run_job_now(self, name: str) -> bool:
+        job = self._jobs[name]
+        if job.is_running:
+            return False
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        job.task = asyncio.create_task(self._run_job(job))
+        await job.task
+        return True
+
+    def get_status(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "name": job.name,
+                "group": job.group,
+                "interval_seconds": job.interval,
+                "timeout_seconds": job.timeout,
+                "is_running": job.is_running,
+                "next_run_in_seconds": max(0.0, round(job.next_run_at - now, 1)),
+                "runs": job.stats.runs,
+                "failures": job.stats.failures,
+                "timeouts": job.stats.timeouts,
+                "skipped_overlaps": job.stats.skipped_overlaps,
+                "last_started_at": job.stats.last_started_at,
+                "last_finished_at": job.stats.last_finished_at,
+                "last_duration_seconds": round(job.stats.last_duration, 3),
+                "max_duration_seconds": round(job.stats.max_duration, 3),
+                "avg_duration_seconds": round(
+                    job.stats.total_duration / job.stats.runs, 3
+                ) if job.stats.runs else 0.0,
+                "last_error": job.stats.last_error,
+            }
+            for job in self._jobs.values()
+        ]
+
+    def _seconds_until_next_job(self) -> float:
+        if not self._jobs:
+            return 60.0
+        if self.gate and not self.gate():
+            return 5.0
+        nearest = min(job.next_run_at for job in self._jobs.values())
+        return min(60.0, max(1.0, nearest - time.monotonic()))
+
+    def _group_lock(self, group: Optional[str]) -> Optional[asyncio.Lock]:
+        if not group:
+            return None
+        lock = self._group_locks.get(group)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._group_locks[group] = lock
+        return lock
+
+    async def _run_job(self, job: ScheduledJob) -> None:
+        group_lock = self._group_lock(job.group)
+
+        if group_lock:
+            await group_lock.acquire()
+        try:
+            async with self._semaphore:
+                if self.gate and not self.gate():
+                    return
+                await self._execute(job)
+        finally:
+            if group_lock:
+                group_lock.release()
+
+    async def _execute(self, job: ScheduledJob) -> None:
+        job.stats.last_started_at = datetime.utcnow()
+        started = time.perf_counter()
+
+        try:
+            async with AsyncSessionLocal() as db:
+                await asyncio.wait_for(job.func(db), timeout=job.timeout)
+            job.stats.last_error = None
+        except asyncio.TimeoutError:
+            job.stats.timeouts += 1
+            job.stats.failures += 1
+            job.stats.last_error = f"timeout after {job.timeout:.0f}s"
+            logger.error(
+                "⏱️ Задача %s прервана по таймауту (%.0f с)",
+                job.name,
+                job.timeout,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            job.stats.failures += 1
+            job.stats.last_error = str(error)
+            logger.error("❌ Ошибка задачи %s: %s", job.name, error)
+        finally:
+            duration = time.perf_counter() - started
+            job.stats.record(duration)
+            job.stats.last_finished_at = datetime.utcnow()
+            logger.debug("✅ Задача %s выполнена за %.2f с", job.name, duration)
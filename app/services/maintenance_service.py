@@ -5,7 +5,7 @@ from typing import Optional, Dict, Any
 from dataclasses import dataclass
 
 from app.config import settings
-from app.external.remnawave_api import RemnaWaveAPI, test_api_connection
+from app.external.remnawave_api import RemnaWaveAPI, get_circuit_breaker, test_api_connection
 from app.utils.cache import cache
 
 logger = logging.getLogger(__name__)
@@ -20,6 +20,7 @@ class MaintenanceStatus:
     auto_enabled: bool = False
     api_status: bool = True
     consecutive_failures: int = 0
+    circuit_state: str = "closed"
 
 
 class MaintenanceService:
@@ -273,8 +274,17 @@ class MaintenanceService:
                 password=auth_params["password"]
             )
             
+            breaker = api.circuit_breaker
+            self._status.circuit_state = breaker.state.value
+            if breaker.is_open:
+                logger.info(
+                    "🚧 Circuit breaker RemnaWave разомкнут, проверка API без запроса к панели (повтор через %.0fс)",
+                    breaker.retry_after(),
+                )
+
             async with api:
                 is_connected = await test_api_connection(api)
+                self._status.circuit_state = breaker.state.value
                 
                 if is_connected:
                     if not self._status.api_status:
@@ -397,6 +407,7 @@ API снова отвечает на запросы.""", "success")
             "auto_enabled": self._status.auto_enabled,
             "api_status": self._status.api_status,
             "consecutive_failures": self._status.consecutive_failures,
+            "circuit_breaker": get_circuit_breaker(settings.REMNAWAVE_API_URL or "").get_info(),
             "monitoring_active": self._check_task is not None and not self._check_task.done(),
             "auto_enable_configured": settings.is_maintenance_auto_enable(),
             "check_interval": settings.get_maintenance_check_interval(),
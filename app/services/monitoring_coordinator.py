@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.database.database import engine
+from app.utils.cache import cache, cache_key
+
+
+logger = logging.getLogger(__name__)
+
+
+LEADER_KEY = cache_key("monitoring", "leader")
+DEDUP_KEY_PREFIX = "monitoring:dedup"
+# Произвольная константа для pg_try_advisory_lock, общая для всех реплик
+ADVISORY_LOCK_ID = 7_421_001
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class MonitoringCoordinator:
+    """Выбирает одну реплику бота, которая выполняет задачи мониторинга.
+
+    Режимы (MONITORING_COORDINATION):
+      * none — координации нет, экземпляр всегда считается лидером;
+      * redis — аренда ключа в Redis с продлением по Lua-скрипту;
+      * postgres — pg_try_advisory_lock на выделенном соединении.
+
+    Координация работает по принципу fail closed: если Redis недоступен,
+    база не PostgreSQL или режим задан с ошибкой, экземпляр не становится
+    лидером и задачи не выполняются. Работа без координации возможна только
+    при явном MONITORING_COORDINATION=none.
+
+    При потере лидерства вызывается on_leadership_lost, чтобы прервать уже
+    запущенные задачи до того, как аренду получит другая реплика.
+    """
+
+    def __init__(self, mode: Optional[str] = None, lease_seconds: Optional[int] = None):
+        self.mode = (mode or settings.MONITORING_COORDINATION or "none").strip().lower()
+        self.lease_seconds = max(10, lease_seconds or settings.MONITORING_LEADER_LEASE_SECONDS)
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._is_leader = self.mode == "none"
+        self._task: Optional[asyncio.Task] = None
+        self._pg_connection: Optional[AsyncConnection] = None
+        self._leader_since: Optional[float] = None
+        self._redis_warning_logged = False
+        self.on_leadership_lost: Optional[Callable[[], None]] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+
+    async def start(self) -> None:
+        if self.mode == "none":
+            return
+
+        if self.mode == "postgres" and not settings.is_postgresql():
+            logger.error(
+                "❌ Координация мониторинга через PostgreSQL недоступна для текущей БД, "
+                "задачи мониторинга не выполняются (для одной реплики укажите MONITORING_COORDINATION=none)"
+            )
+            return
+
+        if self.mode not in {"redis", "postgres"}:
+            logger.error(
+                "❌ Неизвестный режим координации мониторинга %s, задачи мониторинга не выполняются",
+                self.mode,
+            )
+            return
+
+        await self._refresh()
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._renew_loop())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self._release()
+
+    def get_status(self) -> Dict[str, object]:
+        return {
+            "mode": self.mode,
+            "instance_id": self.instance_id,
+            "is_leader": self._is_leader,
+            "leader_for_seconds": (
+                round(time.monotonic() - self._leader_since, 1)
+                if self._is_leader and self._leader_since
+                else 0.0
+            ),
+        }
+
+    async def _renew_loop(self) -> None:
+        interval = max(1.0, self.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Зависшее продление не должно пережить аренду: иначе лидерами станут двое
+                await asyncio.wait_for(self._refresh(), timeout=interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.error("❌ Ошибка продления лидерства мониторинга: %s", error)
+                self._set_leader(False)
+
+    async def _refresh(self) -> None:
+        if self.mode == "redis":
+            self._set_leader(await self._refresh_redis())
+        elif self.mode == "postgres":
+            self._set_leader(await self._refresh_postgres())
+
+    def _set_leader(self, value: bool) -> None:
+        was_leader = self._is_leader
+        self._is_leader = value
+        if value and not was_leader:
+            self._leader_since = time.monotonic()
+            logger.info("👑 Экземпляр %s стал лидером мониторинга", self.instance_id)
+        elif not value and was_leader:
+            self._leader_since = None
+            logger.warning("⚠️ Экземпляр %s потерял лидерство мониторинга", self.instance_id)
+            if self.on_leadership_lost:
+                self.on_leadership_lost()
+
+    async def _refresh_redis(self) -> bool:
+        if not cache.is_connected:
+            if not self._redis_warning_logged:
+                logger.error(
+                    "❌ Redis недоступен, задачи мониторинга приостановлены до восстановления подключения"
+                )
+                self._redis_warning_logged = True
+            return False
+        self._redis_warning_logged = False
+
+        client = cache.redis_client
+        lease_ms = self.lease_seconds * 1000
+
+        if self._is_leader:
+            renewed = await client.eval(_RENEW_SCRIPT, 1, LEADER_KEY, self.instance_id, lease_ms)
+            if renewed:
+                return True
+
+        acquired = await client.set(LEADER_KEY, self.instance_id, px=lease_ms, nx=True)
+        return bool(acquired)
+
+    async def _refresh_postgres(self) -> bool:
+        if self._pg_connection is not None:
+            try:
+                await self._pg_connection.execute(text("SELECT 1"))
+                await self._pg_connection.commit()
+                return True
+            except Exception as error:
+                logger.warning("⚠️ Соединение с блокировкой лидера потеряно: %s", error)
+                await self._close_pg_connection()
+
+        connection = await engine.connect()
+        try:
+            result = await connection.execute(
+                text("SELECT pg_try_advisory_lock(:lock_id)"),
+                {"lock_id": ADVISORY_LOCK_ID},
+            )
+            acquired = bool(result.scalar())
+            # Завершаем неявную транзакцию: блокировка уровня сессии остаётся
+            await connection.commit()
+        except Exception:
+            await connection.close()
+            raise
+
+        if acquired:
+            self._pg_connection = connection
+            return True
+
+        await connection.close()
+        return False
+
+    async def _release(self) -> None:
+        try:
+            if self.mode == "redis" and self._is_leader and cache.is_connected:
+                await cache.redis_client.eval(_RELEASE_SCRIPT, 1, LEADER_KEY, self.instance_id)
+            elif self.mode == "postgres" and self._pg_connection is not None:
+                await self._pg_connection.execute(
+                    text("SELECT pg_advisory_unlock(:lock_id)"),
+                    {"lock_id": ADVISORY_LOCK_ID},
+                )
+                await self._pg_connection.commit()
+        except Exception as error:
+            logger.warning("⚠️ Не удалось освободить лидерство мониторинга: %s", error)
+        finally:
+            await self._close_pg_connection()
+            if self.mode != "none":
+                self._set_leader(False)
+
+    async def _close_pg_connection(self) -> None:
+        if self._pg_connection is None:
+            return
+        try:
+            await self._pg_connection.close()
+        except Exception:
+            pass
+        self._pg_connection = None
+
+
+class NotificationDedupStore:
+    """Общий для всех реплик набор «уже обработано» с TTL.
+
+    Ключи хранятся в Redis (SET NX EX); при недоступном Redis используется
+    локальный словарь с тем же TTL.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._local: Dict[str, float] = {}
+
+    async def claim(self, key: str, ttl_seconds: Optional[int] = None) -> bool:
+        ttl = ttl_seconds or self.ttl_seconds
+        claimed = await cache.set_if_absent(cache_key(DEDUP_KEY_PREFIX, key), 1, ttl)
+        if claimed is not None:
+            return claimed
+
+        now = time.monotonic()
+        expires_at = self._local.get(key)
+        if expires_at and expires_at > now:
+            return False
+        self._local[key] = now + ttl
+        return True
+
+    async def release(self, key: str) -> None:
+        self._local.pop(key, None)
+        await cache.delete(cache_key(DEDUP_KEY_PREFIX, key))
+
+    def prune_local(self) -> int:
+        now = time.monotonic()
+        expired = [key for key, expires_at in self._local.items() if expires_at <= now]
+        for key in expired:
+            del self._local[key]
+        return len(expired)
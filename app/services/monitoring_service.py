@@ -2,17 +2,15 @@ import asyncio
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Set
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
-from aiogram.enums import ChatMemberStatus
-from aiogram.types import FSInputFile
 from sqlalchemy import select, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.config import settings
-from app.database.database import get_db
+from app.database.database import AsyncSessionLocal
 from app.database.crud.discount_offer import (
     deactivate_expired_offers,
     get_latest_claimed_offer_for_user,
@@ -23,27 +21,38 @@ from app.database.crud.notification import (
     clear_notification_by_type,
     notification_sent,
     record_notification,
+    record_notifications,
 )
 from app.database.crud.subscription import (
     deactivate_subscription,
     extend_subscription,
     get_expired_subscriptions,
     get_expiring_subscriptions,
+    claim_autopay_subscription,
+    expire_overdue_subscriptions,
+    get_due_autopay_subscription_ids,
+    get_pending_expiring_notifications,
     get_subscriptions_for_autopay,
 )
 from app.database.crud.user import (
     delete_user,
     get_inactive_users,
     get_user_by_id,
+    reset_remnawave_push_hashes,
     subtract_user_balance,
     cleanup_expired_promo_offer_discounts,
 )
 from app.database.models import MonitoringLog, SubscriptionStatus, Subscription, User, Ticket, TicketStatus
 from app.localization.texts import get_texts
 from app.services.notification_settings_service import NotificationSettingsService
+from app.services.channel_membership_service import channel_membership_service
+from app.services.job_scheduler import JobScheduler
+from app.services.monitoring_coordinator import MonitoringCoordinator, NotificationDedupStore
 from app.services.payment_service import PaymentService
 from app.services.subscription_service import SubscriptionService
 from app.services.promo_offer_service import promo_offer_service
+from app.services.user_activity_service import user_activity_tracker
+from app.utils.media_registry import media_registry
 from app.utils.pricing_utils import apply_percentage_discount
 
 from app.external.remnawave_api import (
@@ -57,6 +66,8 @@ logger = logging.getLogger(__name__)
 
 
 LOGO_PATH = Path(settings.LOGO_FILE)
+# Сколько доставленных уведомлений копится перед записью в sent_notifications
+NOTIFICATION_RECORD_BATCH_SIZE = 20
 
 
 class MonitoringService:
@@ -66,9 +77,10 @@ class MonitoringService:
         self.subscription_service = SubscriptionService()
         self.payment_service = PaymentService()
         self.bot = bot
-        self._notified_users: Set[str] = set()
+        self._dedup = NotificationDedupStore()
         self._last_cleanup = datetime.utcnow()
-        self._sla_task = None
+        self._scheduler: Optional[JobScheduler] = None
+        self._coordinator: Optional[MonitoringCoordinator] = None
 
     async def _send_message_with_logo(
         self,
@@ -87,12 +99,15 @@ class MonitoringService:
             and (text is None or len(text) <= 1000)
         ):
             try:
-                return await self.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=FSInputFile(LOGO_PATH),
-                    caption=text,
-                    reply_markup=reply_markup,
-                    parse_mode=parse_mode,
+                return await media_registry.send_cached(
+                    LOGO_PATH,
+                    lambda photo: self.bot.send_photo(
+                        chat_id=chat_id,
+                        photo=photo,
+                        caption=text,
+                        reply_markup=reply_markup,
+                        parse_mode=parse_mode,
+                    ),
                 )
             except TelegramBadRequest as exc:
                 logger.warning(
@@ -149,114 +164,236 @@ class MonitoringService:
             return
         
         self.is_running = True
-        logger.info("🔄 Запуск службы мониторинга")
-        # Start dedicated SLA loop with its own interval for timely 5-min checks
+        self._coordinator = MonitoringCoordinator()
+        self._scheduler = self._build_scheduler()
+        self._scheduler.gate = lambda: self._coordinator.is_leader
+        self._coordinator.on_leadership_lost = self._on_leadership_lost
+        logger.info(
+            "🔄 Запуск службы мониторинга: %s задач, до %s одновременно, координация %s",
+            len(self._scheduler.jobs),
+            self._scheduler.max_concurrency,
+            self._coordinator.mode,
+        )
+
         try:
-            if not self._sla_task or self._sla_task.done():
-                self._sla_task = asyncio.create_task(self._sla_loop())
-        except Exception as e:
-            logger.error(f"Не удалось запустить SLA-мониторинг: {e}")
-        
-        while self.is_running:
-            try:
-                await self._monitoring_cycle()
-                await asyncio.sleep(settings.MONITORING_INTERVAL * 60) 
-                
-            except Exception as e:
-                logger.error(f"Ошибка в цикле мониторинга: {e}")
-                await asyncio.sleep(60) 
+            await self._coordinator.start()
+            await self._scheduler.run_forever()
+        except asyncio.CancelledError:
+            self._scheduler.stop()
+            raise
+        finally:
+            self.is_running = False
+            await self._coordinator.stop()
     
+    def _on_leadership_lost(self) -> None:
+        if not self._scheduler:
+            return
+        cancelled = self._scheduler.cancel_running()
+        if cancelled:
+            logger.warning(
+                "⚠️ Лидерство мониторинга потеряно, прерваны задачи: %s",
+                ", ".join(cancelled),
+            )
+
     def stop_monitoring(self):
         self.is_running = False
         logger.info("ℹ️ Мониторинг остановлен")
+        if self._scheduler:
+            self._scheduler.stop()
+
+    def _build_scheduler(self) -> JobScheduler:
+        scheduler = JobScheduler(
+            "monitoring",
+            max_concurrency=max(1, settings.MONITORING_MAX_CONCURRENT_JOBS),
+        )
+        default_interval = max(1, settings.MONITORING_INTERVAL) * 60
+        overrides = settings.get_monitoring_job_intervals()
+        timeout = max(30, settings.MONITORING_JOB_TIMEOUT_SECONDS)
+
         try:
-            if self._sla_task and not self._sla_task.done():
-                self._sla_task.cancel()
+            sla_interval = max(10, int(getattr(settings, 'SUPPORT_TICKET_SLA_CHECK_INTERVAL_SECONDS', 60)))
         except Exception:
-            pass
+            sla_interval = 60
+
+        # Задачи одной группы меняют одни и те же подписки и балансы,
+        # поэтому выполняются по очереди; остальные идут параллельно.
+        jobs = [
+            ("promo_cleanup", self._cleanup_promo_offers, default_interval, None),
+            ("expired", self._check_expired_subscriptions, default_interval, "subscriptions"),
+            ("autopay", self._process_autopayments, default_interval, "subscriptions"),
+            ("expiring", self._check_expiring_subscriptions, default_interval, "subscriptions"),
+            ("expired_followups", self._check_expired_subscription_followups, default_interval, "subscriptions"),
+            ("trial_expiring", self._check_trial_expiring_soon, default_interval, None),
+            ("trial_inactivity", self._check_trial_inactivity_notifications, default_interval, None),
+            ("trial_channels", self._check_trial_channel_subscriptions, default_interval, None),
+            ("inactive_users", self._cleanup_inactive_users, default_interval, "subscriptions"),
+            ("remnawave_sync", self._sync_with_remnawave, 3600, None),
+            ("ticket_sla", self._check_ticket_sla, sla_interval, None),
+        ]
+
+        for name, func, interval, group in jobs:
+            if name in overrides:
+                interval = overrides[name] * 60
+            scheduler.add_job(name, func, interval, timeout, group=group)
+
+        return scheduler
+
+    def get_coordination_status(self) -> Dict[str, Any]:
+        if not self._coordinator:
+            return {"mode": settings.MONITORING_COORDINATION, "is_leader": False}
+        return self._coordinator.get_status()
+
+    def get_jobs_status(self) -> List[Dict[str, Any]]:
+        if not self._scheduler:
+            return []
+        return self._scheduler.get_status()
     
     async def _monitoring_cycle(self):
-        async for db in get_db():
-            try:
-                await self._cleanup_notification_cache()
-
-                expired_offers = await deactivate_expired_offers(db)
-                if expired_offers:
-                    logger.info(f"🧹 Деактивировано {expired_offers} просроченных скидочных предложений")
-
-                expired_active_discounts = await cleanup_expired_promo_offer_discounts(db)
-                if expired_active_discounts:
-                    logger.info(
-                        "🧹 Сброшено %s активных скидок промо-предложений с истекшим сроком",
-                        expired_active_discounts,
-                    )
-
-                cleaned_test_access = await promo_offer_service.cleanup_expired_test_access(db)
-                if cleaned_test_access:
-                    logger.info(f"🧹 Отозвано {cleaned_test_access} истекших тестовых доступов к сквадам")
-
-                await self._check_expired_subscriptions(db)
-                await self._check_expiring_subscriptions(db)
-                await self._check_trial_expiring_soon(db)
-                await self._check_trial_inactivity_notifications(db)
-                await self._check_trial_channel_subscriptions(db)
-                await self._check_expired_subscription_followups(db)
-                await self._process_autopayments(db)
-                await self._cleanup_inactive_users(db)
-                await self._sync_with_remnawave(db)
-                
+        """Однократно выполняет все задачи мониторинга по очереди."""
+        scheduler = self._scheduler or self._build_scheduler()
+        failed = []
+
+        for job in scheduler.jobs:
+            failures_before = job.stats.failures
+            started = await scheduler.run_job_now(job.name)
+            if started and job.stats.failures > failures_before:
+                failed.append(job.name)
+
+        async with AsyncSessionLocal() as db:
+            if failed:
                 await self._log_monitoring_event(
-                    db, "monitoring_cycle_completed", 
-                    "Цикл мониторинга успешно завершен", 
-                    {"timestamp": datetime.utcnow().isoformat()}
+                    db, "monitoring_cycle_error",
+                    f"Ошибки в задачах мониторинга: {', '.join(failed)}",
+                    {"failed_jobs": failed},
+                    is_success=False
                 )
-                
-            except Exception as e:
-                logger.error(f"Ошибка в цикле мониторинга: {e}")
+            else:
                 await self._log_monitoring_event(
-                    db, "monitoring_cycle_error", 
-                    f"Ошибка в цикле мониторинга: {str(e)}", 
-                    {"error": str(e)},
-                    is_success=False
+                    db, "monitoring_cycle_completed",
+                    "Цикл мониторинга успешно завершен",
+                    {"timestamp": datetime.utcnow().isoformat()}
                 )
-            finally:
-                break 
+
+    async def _cleanup_promo_offers(self, db: AsyncSession):
+        await self._cleanup_notification_cache()
+
+        expired_offers = await deactivate_expired_offers(db)
+        if expired_offers:
+            logger.info(f"🧹 Деактивировано {expired_offers} просроченных скидочных предложений")
+
+        expired_active_discounts = await cleanup_expired_promo_offer_discounts(db)
+        if expired_active_discounts:
+            logger.info(
+                "🧹 Сброшено %s активных скидок промо-предложений с истекшим сроком",
+                expired_active_discounts,
+            )
+
+        cleaned_test_access = await promo_offer_service.cleanup_expired_test_access(db)
+        if cleaned_test_access:
+            logger.info(f"🧹 Отозвано {cleaned_test_access} истекших тестовых доступов к сквадам")
     
     async def _cleanup_notification_cache(self):
         current_time = datetime.utcnow()
         
         if (current_time - self._last_cleanup).total_seconds() >= 3600:
-            old_count = len(self._notified_users)
-            self._notified_users.clear()
+            removed_count = self._dedup.prune_local()
             self._last_cleanup = current_time
-            logger.info(f"🧹 Очищен кеш уведомлений ({old_count} записей)")
+            if removed_count:
+                logger.info(f"🧹 Очищен локальный кеш уведомлений ({removed_count} записей)")
     
     async def _check_expired_subscriptions(self, db: AsyncSession):
         try:
-            expired_subscriptions = await get_expired_subscriptions(db)
-            
-            for subscription in expired_subscriptions:
-                from app.database.crud.subscription import expire_subscription
-                await expire_subscription(db, subscription)
-                
-                user = await get_user_by_id(db, subscription.user_id)
-                if user and user.remnawave_uuid:
-                    await self.subscription_service.disable_remnawave_user(user.remnawave_uuid)
-                
-                if user and self.bot:
-                    await self._send_subscription_expired_notification(user)
-                
-                logger.info(f"🔴 Подписка пользователя {subscription.user_id} истекла и статус изменен на 'expired'")
-            
-            if expired_subscriptions:
+            batch_size = max(1, settings.MONITORING_EXPIRY_BATCH_SIZE)
+            now = datetime.utcnow()
+            total_expired = 0
+            total_disabled = 0
+            total_notified = 0
+
+            while True:
+                expired = await expire_overdue_subscriptions(db, now=now, batch_size=batch_size)
+                if not expired:
+                    break
+
+                total_expired += len(expired)
+
+                users_result = await db.execute(
+                    select(User).where(User.id.in_([user_id for _, user_id in expired]))
+                )
+                users = users_result.scalars().all()
+
+                disabled, notified = await asyncio.gather(
+                    self._disable_expired_panel_users(
+                        [user.remnawave_uuid for user in users if user.remnawave_uuid]
+                    ),
+                    self._notify_expired_users(users),
+                )
+                await reset_remnawave_push_hashes(db, disabled)
+                total_disabled += len(disabled)
+                total_notified += notified
+
+                for _, user_id in expired:
+                    logger.info(f"🔴 Подписка пользователя {user_id} истекла и статус изменен на 'expired'")
+
+                if len(expired) < batch_size:
+                    break
+
+            if total_expired:
                 await self._log_monitoring_event(
                     db, "expired_subscriptions_processed",
-                    f"Обработано {len(expired_subscriptions)} истёкших подписок",
-                    {"count": len(expired_subscriptions)}
+                    f"Обработано {total_expired} истёкших подписок",
+                    {
+                        "count": total_expired,
+                        "panel_disabled": total_disabled,
+                        "notified": total_notified,
+                    }
                 )
                 
         except Exception as e:
             logger.error(f"Ошибка проверки истёкших подписок: {e}")
+            raise
+
+    async def _disable_expired_panel_users(self, user_uuids: List[str]) -> List[str]:
+        """Отключает пользователей в панели через одну сессию API с ограничением параллельности.
+
+        Возвращает UUID успешно отключённых пользователей.
+        """
+
+        if not user_uuids:
+            return []
+
+        semaphore = asyncio.Semaphore(max(1, settings.REMNAWAVE_PUSH_CONCURRENCY))
+
+        try:
+            async with self.subscription_service.get_api_client() as api:
+
+                async def disable(user_uuid: str) -> bool:
+                    async with semaphore:
+                        try:
+                            await api.disable_user(user_uuid)
+                            return True
+                        except Exception as error:
+                            logger.error(f"Ошибка отключения RemnaWave пользователя {user_uuid}: {error}")
+                            return False
+
+                results = await asyncio.gather(*(disable(user_uuid) for user_uuid in user_uuids))
+        except Exception as e:
+            logger.error(f"Ошибка отключения истёкших пользователей в RemnaWave: {e}")
+            return []
+
+        disabled = [user_uuid for user_uuid, result in zip(user_uuids, results) if result]
+        logger.info(
+            f"✅ Отключено {len(disabled)} из {len(user_uuids)} пользователей RemnaWave с истёкшей подпиской"
+        )
+        return disabled
+
+    async def _notify_expired_users(self, users: List[User]) -> int:
+        if not self.bot or not users:
+            return 0
+
+        delivered = await self._deliver_notifications(
+            users, self._send_subscription_expired_notification
+        )
+        return len(delivered)
 
     async def update_remnawave_user(
         self,
@@ -299,6 +436,7 @@ class MonitoringService:
                 
                 subscription.subscription_url = updated_user.subscription_url
                 subscription.subscription_crypto_link = updated_user.happ_crypto_link
+                user.remnawave_push_hash = None
                 await db.commit()
                 
                 status_text = "активным" if is_active else "истёкшим"
@@ -314,56 +452,111 @@ class MonitoringService:
     
     async def _check_expiring_subscriptions(self, db: AsyncSession):
         try:
-            warning_days = settings.get_autopay_warning_days()
-            all_processed_users = set() 
-            
-            for days in warning_days:
-                expiring_subscriptions = await self._get_expiring_paid_subscriptions(db, days)
-                sent_count = 0
-                
-                for subscription in expiring_subscriptions:
-                    user = await get_user_by_id(db, subscription.user_id)
-                    if not user:
-                        continue
-
-                    user_key = f"user_{user.telegram_id}_today"
-
-                    if (await notification_sent(db, user.id, subscription.id, "expiring", days) or
-                        user_key in all_processed_users):
-                        logger.debug(f"🔄 Пропускаем дублирование для пользователя {user.telegram_id} на {days} дней")
-                        continue
-
-                    should_send = True
-                    for other_days in warning_days:
-                        if other_days < days:
-                            other_subs = await self._get_expiring_paid_subscriptions(db, other_days)
-                            if any(s.user_id == user.id for s in other_subs):
-                                should_send = False
-                                logger.debug(f"🎯 Пропускаем уведомление на {days} дней для пользователя {user.telegram_id}, есть более срочное на {other_days} дней")
-                                break
-
-                    if not should_send:
-                        continue
-
-                    if self.bot:
-                        success = await self._send_subscription_expiring_notification(user, subscription, days)
-                        if success:
-                            await record_notification(db, user.id, subscription.id, "expiring", days)
-                            all_processed_users.add(user_key)
-                            sent_count += 1
-                            logger.info(f"✅ Пользователю {user.telegram_id} отправлено уведомление об истечении подписки через {days} дней")
-                        else:
-                            logger.warning(f"❌ Не удалось отправить уведомление пользователю {user.telegram_id}")
-                
-                if sent_count > 0:
-                    await self._log_monitoring_event(
-                        db, "expiring_notifications_sent",
-                        f"Отправлено {sent_count} уведомлений об истечении через {days} дней",
-                        {"days": days, "count": sent_count}
+            planned = await get_pending_expiring_notifications(db, settings.get_autopay_warning_days())
+            if not planned:
+                return
+
+            logger.info(f"📊 Запланировано {len(planned)} уведомлений об истечении платных подписок")
+
+            if not self.bot:
+                return
+
+            async def send(item) -> bool:
+                subscription, days = item
+                user = subscription.user
+                success = await self._send_subscription_expiring_notification(user, subscription, days)
+                if success:
+                    logger.info(f"✅ Пользователю {user.telegram_id} отправлено уведомление об истечении подписки через {days} дней")
+                else:
+                    logger.warning(f"❌ Не удалось отправить уведомление пользователю {user.telegram_id}")
+                return success
+
+            async def record(batch) -> None:
+                try:
+                    await record_notifications(
+                        db,
+                        (
+                            (subscription.user_id, subscription.id, "expiring", days)
+                            for subscription, days in batch
+                        ),
                     )
+                except Exception:
+                    await db.rollback()
+                    raise
+
+            delivered = await self._deliver_notifications(planned, send, on_delivered=record)
+
+            sent_by_days: Dict[int, int] = {}
+            for _, days in delivered:
+                sent_by_days[days] = sent_by_days.get(days, 0) + 1
+
+            for days, sent_count in sorted(sent_by_days.items()):
+                await self._log_monitoring_event(
+                    db, "expiring_notifications_sent",
+                    f"Отправлено {sent_count} уведомлений об истечении через {days} дней",
+                    {"days": days, "count": sent_count}
+                )
                     
         except Exception as e:
             logger.error(f"Ошибка проверки истекающих подписок: {e}")
+            raise
+
+    async def _deliver_notifications(
+        self,
+        items: List[Any],
+        send: Callable[[Any], Awaitable[bool]],
+        on_delivered: Optional[Callable[[List[Any]], Awaitable[None]]] = None,
+    ) -> List[Any]:
+        """Разбирает очередь уведомлений несколькими воркерами и возвращает доставленные.
+
+        on_delivered получает доставленные уведомления пачками по
+        NOTIFICATION_RECORD_BATCH_SIZE по ходу рассылки, а остаток — и при
+        прерывании по таймауту, чтобы отправленное не ушло повторно.
+        """
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        delivered: List[Any] = []
+        pending: List[Any] = []
+        record_lock = asyncio.Lock()
+
+        async def flush() -> None:
+            nonlocal pending
+            if on_delivered is None:
+                return
+            async with record_lock:
+                if not pending:
+                    return
+                batch, pending = pending, []
+                try:
+                    await on_delivered(batch)
+                except Exception as error:
+                    logger.error(f"Ошибка записи {len(batch)} отправленных уведомлений: {error}")
+
+        async def worker() -> None:
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    if await send(item):
+                        delivered.append(item)
+                        pending.append(item)
+                except Exception as error:
+                    logger.error(f"Ошибка доставки уведомления: {error}")
+                    continue
+                if len(pending) >= NOTIFICATION_RECORD_BATCH_SIZE:
+                    await flush()
+
+        workers = min(max(1, settings.MONITORING_NOTIFICATION_CONCURRENCY), len(items))
+        try:
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        finally:
+            await flush()
+        return delivered
     
     async def _check_trial_expiring_soon(self, db: AsyncSession):
         try:
@@ -406,6 +599,7 @@ class MonitoringService:
                 
         except Exception as e:
             logger.error(f"Ошибка проверки истекающих тестовых подписок: {e}")
+            raise
 
     async def _check_trial_inactivity_notifications(self, db: AsyncSession):
         if not NotificationSettingsService.are_notifications_globally_enabled():
@@ -474,6 +668,7 @@ class MonitoringService:
 
         except Exception as e:
             logger.error(f"Ошибка проверки неактивных тестовых подписок: {e}")
+            raise
 
     async def _check_trial_channel_subscriptions(self, db: AsyncSession):
         if not settings.CHANNEL_IS_REQUIRED_SUB:
@@ -517,41 +712,25 @@ class MonitoringService:
             disabled_count = 0
             restored_count = 0
 
+            statuses = await channel_membership_service.get_statuses(
+                self.bot,
+                channel_id,
+                [
+                    subscription.user.telegram_id
+                    for subscription in subscriptions
+                    if subscription.user and subscription.user.telegram_id
+                ],
+            )
+
             for subscription in subscriptions:
                 user = subscription.user
                 if not user or not user.telegram_id:
                     continue
 
-                try:
-                    member = await self.bot.get_chat_member(channel_id, user.telegram_id)
-                    member_status = member.status
-                    is_member = member_status in (
-                        ChatMemberStatus.MEMBER,
-                        ChatMemberStatus.ADMINISTRATOR,
-                        ChatMemberStatus.CREATOR,
-                    )
-                except TelegramForbiddenError as error:
-                    logger.error(
-                        "❌ Не удалось проверить подписку пользователя %s на канал %s: бот заблокирован (%s)",
-                        user.telegram_id,
-                        channel_id,
-                        error,
-                    )
-                    continue
-                except TelegramBadRequest as error:
-                    logger.error(
-                        "❌ Ошибка Telegram при проверке подписки пользователя %s: %s",
-                        user.telegram_id,
-                        error,
-                    )
-                    continue
-                except Exception as error:
-                    logger.error(
-                        "❌ Неожиданная ошибка при проверке подписки пользователя %s: %s",
-                        user.telegram_id,
-                        error,
-                    )
+                member_status = statuses.get(user.telegram_id)
+                if member_status is None:
                     continue
+                is_member = channel_membership_service.is_member_status(member_status)
 
                 if subscription.status == SubscriptionStatus.ACTIVE.value and not is_member:
                     subscription = await deactivate_subscription(db, subscription)
@@ -564,7 +743,7 @@ class MonitoringService:
 
                     if user.remnawave_uuid:
                         try:
-                            await self.subscription_service.disable_remnawave_user(user.remnawave_uuid)
+                            await self.subscription_service.disable_remnawave_user(user.remnawave_uuid, db)
                         except Exception as api_error:
                             logger.error(
                                 "❌ Не удалось отключить пользователя RemnaWave %s: %s",
@@ -639,6 +818,7 @@ class MonitoringService:
 
         except Exception as error:
             logger.error(f"Ошибка проверки подписки на канал для триальных пользователей: {error}")
+            raise
 
     async def _check_expired_subscription_followups(self, db: AsyncSession):
         if not NotificationSettingsService.are_notifications_globally_enabled():
@@ -764,33 +944,8 @@ class MonitoringService:
 
         except Exception as e:
             logger.error(f"Ошибка проверки напоминаний об истекшей подписке: {e}")
+            raise
 
-    async def _get_expiring_paid_subscriptions(self, db: AsyncSession, days_before: int) -> List[Subscription]:
-        current_time = datetime.utcnow()
-        threshold_date = current_time + timedelta(days=days_before)
-        
-        result = await db.execute(
-            select(Subscription)
-            .options(selectinload(Subscription.user))
-            .where(
-                and_(
-                    Subscription.status == SubscriptionStatus.ACTIVE.value,
-                    Subscription.is_trial == False, 
-                    Subscription.end_date > current_time,
-                    Subscription.end_date <= threshold_date
-                )
-            )
-        )
-        
-        logger.debug(f"🔍 Поиск платных подписок, истекающих в ближайшие {days_before} дней")
-        logger.debug(f"📅 Текущее время: {current_time}")
-        logger.debug(f"📅 Пороговая дата: {threshold_date}")
-        
-        subscriptions = result.scalars().all()
-        logger.info(f"📊 Найдено {len(subscriptions)} платных подписок для уведомлений")
-        
-        return subscriptions
-    
     @staticmethod
     def _get_user_promo_offer_discount_percent(user: Optional[User]) -> int:
         if not user:
@@ -872,99 +1027,129 @@ class MonitoringService:
 
     async def _process_autopayments(self, db: AsyncSession):
         try:
-            current_time = datetime.utcnow()
-            
-            result = await db.execute(
-                select(Subscription)
-                .options(selectinload(Subscription.user))
-                .where(
-                    and_(
-                        Subscription.status == SubscriptionStatus.ACTIVE.value,
-                        Subscription.autopay_enabled == True,
-                        Subscription.is_trial == False 
-                    )
-                )
-            )
-            all_autopay_subscriptions = result.scalars().all()
-            
-            autopay_subscriptions = []
-            for sub in all_autopay_subscriptions:
-                days_before_expiry = (sub.end_date - current_time).days
-                if days_before_expiry <= sub.autopay_days_before:
-                    autopay_subscriptions.append(sub)
-            
-            processed_count = 0
-            failed_count = 0
-            
-            for subscription in autopay_subscriptions:
-                user = subscription.user
-                if not user:
-                    continue
-                
-                renewal_cost = settings.PRICE_30_DAYS
-                promo_discount_percent = self._get_user_promo_offer_discount_percent(user)
-                charge_amount = renewal_cost
-                promo_discount_value = 0
-
-                if renewal_cost > 0 and promo_discount_percent > 0:
-                    charge_amount, promo_discount_value = apply_percentage_discount(
-                        renewal_cost,
-                        promo_discount_percent,
-                    )
-
-                autopay_key = f"autopay_{user.telegram_id}_{subscription.id}"
-                if autopay_key in self._notified_users:
-                    continue
+            batch_size = max(1, settings.MONITORING_AUTOPAY_BATCH_SIZE)
+            semaphore = asyncio.Semaphore(max(1, settings.MONITORING_AUTOPAY_CONCURRENCY))
+            started_at = datetime.utcnow()
+            results: Dict[str, int] = {"processed": 0, "failed": 0, "skipped": 0}
+
+            async def process(subscription_id: int) -> str:
+                async with semaphore:
+                    async with AsyncSessionLocal() as worker_db:
+                        try:
+                            return await self._charge_autopay_subscription(
+                                worker_db, subscription_id, started_at
+                            )
+                        except Exception as error:
+                            await worker_db.rollback()
+                            logger.error(
+                                "💳 Ошибка автопродления подписки %s: %s",
+                                subscription_id,
+                                error,
+                            )
+                            return "failed"
 
-                if user.balance_kopeks >= charge_amount:
-                    success = await subtract_user_balance(
-                        db, user, charge_amount,
-                        "Автопродление подписки"
-                    )
+            last_id = 0
+            while True:
+                subscription_ids = await get_due_autopay_subscription_ids(
+                    db, after_id=last_id, limit=batch_size, now=started_at
+                )
+                if not subscription_ids:
+                    break
 
-                    if success:
-                        await extend_subscription(db, subscription, 30)
-                        await self.subscription_service.update_remnawave_user(
-                            db,
-                            subscription,
-                            reset_traffic=settings.RESET_TRAFFIC_ON_PAYMENT,
-                            reset_reason="автопродление подписки",
-                        )
+                outcomes = await asyncio.gather(
+                    *(process(subscription_id) for subscription_id in subscription_ids)
+                )
+                for outcome in outcomes:
+                    results[outcome] += 1
 
-                        if promo_discount_value > 0:
-                            await self._consume_user_promo_offer_discount(db, user)
+                if len(subscription_ids) < batch_size:
+                    break
+                last_id = subscription_ids[-1]
 
-                        if self.bot:
-                            await self._send_autopay_success_notification(user, charge_amount, 30)
+            processed_count = results["processed"]
+            failed_count = results["failed"]
 
-                        processed_count += 1
-                        self._notified_users.add(autopay_key)
-                        logger.info(
-                            "💳 Автопродление подписки пользователя %s успешно (списано %s, скидка %s%%)",
-                            user.telegram_id,
-                            charge_amount,
-                            promo_discount_percent,
-                        )
-                    else:
-                        failed_count += 1
-                        if self.bot:
-                            await self._send_autopay_failed_notification(user, user.balance_kopeks, charge_amount)
-                        logger.warning(f"💳 Ошибка списания средств для автопродления пользователя {user.telegram_id}")
-                else:
-                    failed_count += 1
-                    if self.bot:
-                        await self._send_autopay_failed_notification(user, user.balance_kopeks, charge_amount)
-                    logger.warning(f"💳 Недостаточно средств для автопродления у пользователя {user.telegram_id}")
-            
             if processed_count > 0 or failed_count > 0:
                 await self._log_monitoring_event(
                     db, "autopayments_processed",
                     f"Автоплатежи: успешно {processed_count}, неудачно {failed_count}",
-                    {"processed": processed_count, "failed": failed_count}
+                    {"processed": processed_count, "failed": failed_count, "skipped": results["skipped"]}
                 )
                 
         except Exception as e:
             logger.error(f"Ошибка обработки автоплатежей: {e}")
+            raise
+
+    async def _charge_autopay_subscription(
+        self,
+        db: AsyncSession,
+        subscription_id: int,
+        now: datetime,
+    ) -> str:
+        subscription = await claim_autopay_subscription(db, subscription_id, now)
+        if not subscription or not subscription.user:
+            await db.rollback()
+            return "skipped"
+
+        user = subscription.user
+
+        renewal_cost = settings.PRICE_30_DAYS
+        promo_discount_percent = self._get_user_promo_offer_discount_percent(user)
+        charge_amount = renewal_cost
+        promo_discount_value = 0
+
+        if renewal_cost > 0 and promo_discount_percent > 0:
+            charge_amount, promo_discount_value = apply_percentage_discount(
+                renewal_cost,
+                promo_discount_percent,
+            )
+
+        autopay_key = f"autopay_{user.telegram_id}_{subscription.id}"
+        if not await self._dedup.claim(autopay_key):
+            await db.rollback()
+            return "skipped"
+
+        if user.balance_kopeks < charge_amount:
+            await self._dedup.release(autopay_key)
+            if self.bot:
+                await self._send_autopay_failed_notification(user, user.balance_kopeks, charge_amount)
+            logger.warning(f"💳 Недостаточно средств для автопродления у пользователя {user.telegram_id}")
+            await db.rollback()
+            return "failed"
+
+        success = await subtract_user_balance(
+            db, user, charge_amount,
+            "Автопродление подписки"
+        )
+
+        if not success:
+            await self._dedup.release(autopay_key)
+            if self.bot:
+                await self._send_autopay_failed_notification(user, user.balance_kopeks, charge_amount)
+            logger.warning(f"💳 Ошибка списания средств для автопродления пользователя {user.telegram_id}")
+            return "failed"
+
+        await extend_subscription(db, subscription, 30)
+        await self.subscription_service.update_remnawave_user(
+            db,
+            subscription,
+            reset_traffic=settings.RESET_TRAFFIC_ON_PAYMENT,
+            reset_reason="автопродление подписки",
+        )
+
+        if promo_discount_value > 0:
+            await self._consume_user_promo_offer_discount(db, user)
+
+        if self.bot:
+            await self._send_autopay_success_notification(user, charge_amount, 30)
+
+        logger.info(
+            "💳 Автопродление подписки пользователя %s успешно (списано %s, скидка %s%%)",
+            user.telegram_id,
+            charge_amount,
+            promo_discount_percent,
+        )
+        return "processed"
     
     async def _send_subscription_expired_notification(self, user: User) -> bool:
         try:
@@ -1428,6 +1613,7 @@ class MonitoringService:
             if now.hour != 3: 
                 return
             
+            await user_activity_tracker.flush()
             inactive_users = await get_inactive_users(db, settings.INACTIVE_USER_DELETE_MONTHS)
             deleted_count = 0
             
@@ -1447,13 +1633,10 @@ class MonitoringService:
                 
         except Exception as e:
             logger.error(f"Ошибка очистки неактивных пользователей: {e}")
+            raise
     
     async def _sync_with_remnawave(self, db: AsyncSession):
         try:
-            now = datetime.utcnow()
-            if now.minute != 0:
-                return
-            
             async with self.subscription_service.api as api:
                 system_stats = await api.get_system_stats()
                 
@@ -1471,6 +1654,7 @@ class MonitoringService:
                 {"error": str(e)},
                 is_success=False
             )
+            raise
     
     async def _check_ticket_sla(self, db: AsyncSession):
         try:
@@ -1561,24 +1745,7 @@ class MonitoringService:
                 )
         except Exception as e:
             logger.error(f"Ошибка проверки SLA тикетов: {e}")
-
-    async def _sla_loop(self):
-        try:
-            interval_seconds = max(10, int(getattr(settings, 'SUPPORT_TICKET_SLA_CHECK_INTERVAL_SECONDS', 60)))
-        except Exception:
-            interval_seconds = 60
-        while self.is_running:
-            try:
-                async for db in get_db():
-                    try:
-                        await self._check_ticket_sla(db)
-                    finally:
-                        break
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Ошибка в SLA-цикле: {e}")
-            await asyncio.sleep(interval_seconds)
+            raise
 
     async def _log_monitoring_event(
         self,
@@ -1627,6 +1794,8 @@ class MonitoringService:
             return {
                 "is_running": self.is_running,
                 "last_update": datetime.utcnow(),
+                "coordination": self.get_coordination_status(),
+                "jobs": self.get_jobs_status(),
                 "recent_events": [
                     {
                         "type": event.event_type,
@@ -1649,6 +1818,8 @@ class MonitoringService:
             return {
                 "is_running": self.is_running,
                 "last_update": datetime.utcnow(),
+                "coordination": self.get_coordination_status(),
+                "jobs": self.get_jobs_status(),
                 "recent_events": [],
                 "stats_24h": {
                     "total_events": 0,
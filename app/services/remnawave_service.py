@@ -13,6 +13,20 @@ from app.external.remnawave_api import (
 )
 from app.database.crud.user import get_users_list, get_user_by_telegram_id, update_user
 from app.database.crud.subscription import get_subscription_by_user_id, update_subscription_usage
+from app.services.remnawave_sync_service import (
+    PanelSnapshot,
+    PanelUserPusher,
+    PanelUserReconciler,
+    build_panel_snapshot,
+    build_panel_subscription_values,
+    latest_timestamp,
+    load_sync_watermark,
+    reconcile_panel_state,
+    reconcile_panel_subscription,
+    store_sync_watermark,
+    to_naive_utc,
+    DELTA_TELEGRAM_IDS_LIMIT,
+)
 from app.database.models import (
     User, SubscriptionServer, Transaction, ReferralEarning, 
     PromoCodeUse, SubscriptionStatus
@@ -565,175 +579,68 @@ class RemnaWaveService:
             logger.error(f"Ошибка удаления сквада {uuid}: {e}")
             return False
     
-    async def sync_users_from_panel(self, db: AsyncSession, sync_type: str = "all") -> Dict[str, int]:
+    async def sync_users_from_panel(
+        self,
+        db: AsyncSession,
+        sync_type: str = "all",
+        incremental: bool = False,
+    ) -> Dict[str, int]:
         try:
-            stats = {"created": 0, "updated": 0, "errors": 0, "deleted": 0}
-            
             logger.info(f"🔄 Начинаем синхронизацию типа: {sync_type}")
             
+            watermark_name = f"panel_users:{sync_type}"
+            panel_since = await load_sync_watermark(db, watermark_name) if incremental else None
+            if panel_since:
+                logger.info(f"⏩ Инкрементальная синхронизация: изменения в панели после {panel_since}")
+            
+            reconciler = PanelUserReconciler(self, db, sync_type)
+            loaded = 0
+            changed = 0
+            latest_update = panel_since
+            panel_total = []
+            
             async with self.get_api_client() as api:
-                panel_users = []
-                start = 0
-                size = 100 
-                
-                while True:
-                    logger.info(f"📥 Загружаем пользователей: start={start}, size={size}")
-                    
-                    response = await api.get_all_users(start=start, size=size)
-                    users_batch = response['users']
-                    total_users = response['total']
-                    
-                    logger.info(f"📊 Получено {len(users_batch)} пользователей из {total_users}")
+                async for users_batch in api.iter_user_pages(
+                    size=settings.REMNAWAVE_SYNC_PAGE_SIZE,
+                    concurrency=settings.REMNAWAVE_SYNC_CONCURRENCY,
+                    on_total=panel_total.append,
+                ):
+                    loaded += len(users_batch)
+                    logger.info(f"📥 Получено пользователей из панели: {loaded}")
                     
+                    changed_batch = []
                     for user_obj in users_batch:
-                        user_dict = {
-                            'uuid': user_obj.uuid,
-                            'shortUuid': user_obj.short_uuid,
-                            'username': user_obj.username,
-                            'status': user_obj.status.value,
-                            'telegramId': user_obj.telegram_id,
-                            'expireAt': user_obj.expire_at.isoformat() + 'Z',
-                            'trafficLimitBytes': user_obj.traffic_limit_bytes,
-                            'usedTrafficBytes': user_obj.used_traffic_bytes,
-                            'hwidDeviceLimit': user_obj.hwid_device_limit,
-                            'subscriptionUrl': user_obj.subscription_url,
-                            'subscriptionCryptoLink': user_obj.happ_crypto_link,
-                            'activeInternalSquads': user_obj.active_internal_squads
-                        }
-                        panel_users.append(user_dict)
+                        updated_at = to_naive_utc(user_obj.updated_at)
+                        if latest_update is None or updated_at > latest_update:
+                            latest_update = updated_at
+                        if panel_since is None or updated_at > panel_since:
+                            changed_batch.append(user_obj)
                     
-                    if len(users_batch) < size:
-                        break
-                        
-                    start += size
-                    
-                    if start > total_users:
-                        break
+                    changed += len(changed_batch)
+                    await reconciler.add(self._panel_user_to_dict(user_obj) for user_obj in changed_batch)
                 
-                logger.info(f"✅ Всего загружено пользователей из панели: {len(panel_users)}")
-            
-            bot_users = await get_users_list(db, offset=0, limit=10000)
-            bot_users_by_telegram_id = {user.telegram_id: user for user in bot_users}
-            
-            logger.info(f"📊 Пользователей в боте: {len(bot_users)}")
-            
-            panel_users_with_tg = [
-                user for user in panel_users 
-                if user.get('telegramId') is not None
-            ]
-            
-            logger.info(f"📊 Пользователей в панели с Telegram ID: {len(panel_users_with_tg)}")
-            
-            panel_telegram_ids = set()
-            
-            for i, panel_user in enumerate(panel_users_with_tg):
-                try:
-                    telegram_id = panel_user.get('telegramId')
-                    if not telegram_id:
-                        continue
-                    
-                    panel_telegram_ids.add(telegram_id)
-                    
-                    if (i + 1) % 10 == 0: 
-                        logger.info(f"🔄 Обрабатываем пользователя {i+1}/{len(panel_users_with_tg)}: {telegram_id}")
-                    
-                    db_user = bot_users_by_telegram_id.get(telegram_id)
-                    
-                    if not db_user:
-                        if sync_type in ["new_only", "all"]:
-                            logger.info(f"🆕 Создание пользователя для telegram_id {telegram_id}")
-                            
-                            from app.database.crud.user import create_user
-                            
-                            db_user = await create_user(
-                                db=db,
-                                telegram_id=telegram_id,
-                                username=panel_user.get('username') or f"user_{telegram_id}",
-                                first_name=f"Panel User {telegram_id}",
-                                language="ru"
-                            )
-                            
-                            await update_user(db, db_user, remnawave_uuid=panel_user.get('uuid'))
-                            
-                            await self._create_subscription_from_panel_data(db, db_user, panel_user)
-                            
-                            stats["created"] += 1
-                            logger.info(f"✅ Создан пользователь {telegram_id} с подпиской")
-                    
+                await reconciler.finish()
+                
+                logger.info(
+                    f"✅ Всего загружено пользователей из панели: {loaded}, изменившихся: {changed}, "
+                    f"с Telegram ID: {len(reconciler.panel_telegram_ids)}"
+                )
+                
+                if sync_type == "all" and panel_since is None:
+                    if panel_total and loaded >= panel_total[0]:
+                        logger.info("🗑️ Деактивация подписок пользователей, отсутствующих в панели...")
+                        await reconciler.deactivate_missing(api)
                     else:
-                        if sync_type in ["update_only", "all"]:
-                            logger.debug(f"🔄 Обновление пользователя {telegram_id}")
-                            
-                            if not db_user.remnawave_uuid:
-                                await update_user(db, db_user, remnawave_uuid=panel_user.get('uuid'))
-                            
-                            await self._update_subscription_from_panel_data(db, db_user, panel_user)
-                            
-                            stats["updated"] += 1
-                            logger.debug(f"✅ Обновлён пользователь {telegram_id}")
-                            
-                except Exception as user_error:
-                    logger.error(f"❌ Ошибка обработки пользователя {telegram_id}: {user_error}")
-                    stats["errors"] += 1
-                    continue
+                        logger.warning(
+                            f"⚠️ Загружено {loaded} из {panel_total[0] if panel_total else '?'} пользователей панели, "
+                            f"деактивация отсутствующих пропущена"
+                        )
+                        reconciler.stats["errors"] += 1
             
-            if sync_type == "all":
-                logger.info("🗑️ Деактивация подписок пользователей, отсутствующих в панели...")
-                
-                for telegram_id, db_user in bot_users_by_telegram_id.items():
-                    if telegram_id not in panel_telegram_ids and db_user.subscription:
-                        try:
-                            logger.info(f"🗑️ Деактивация подписки пользователя {telegram_id} (нет в панели)")
-                            
-                            subscription = db_user.subscription
-                            
-                            if db_user.remnawave_uuid:
-                                try:
-                                    async with self.get_api_client() as api:
-                                        devices_reset = await api.reset_user_devices(db_user.remnawave_uuid)
-                                        if devices_reset:
-                                            logger.info(f"🔧 Сброшены HWID устройства для пользователя {telegram_id}")
-                                except Exception as hwid_error:
-                                    logger.error(f"❌ Ошибка сброса HWID устройств для {telegram_id}: {hwid_error}")
-                            
-                            try:
-                                from sqlalchemy import delete
-                                from app.database.models import SubscriptionServer
-                                
-                                await db.execute(
-                                    delete(SubscriptionServer).where(
-                                        SubscriptionServer.subscription_id == subscription.id
-                                    )
-                                )
-                                logger.info(f"🗑️ Удалены серверы подписки для {telegram_id}")
-                            except Exception as servers_error:
-                                logger.warning(f"⚠️ Не удалось удалить серверы подписки: {servers_error}")
-                            
-                            from app.database.models import SubscriptionStatus
-                            
-                            subscription.status = SubscriptionStatus.DISABLED.value
-                            subscription.is_trial = True 
-                            subscription.end_date = datetime.utcnow()
-                            subscription.traffic_limit_gb = 0
-                            subscription.traffic_used_gb = 0.0
-                            subscription.device_limit = 1
-                            subscription.connected_squads = []
-                            subscription.autopay_enabled = False
-                            subscription.remnawave_short_uuid = None
-                            subscription.subscription_url = ""
-                            subscription.subscription_crypto_link = ""
-                            
-                            db_user.remnawave_uuid = None
-                            
-                            await db.commit()
-                            
-                            stats["deleted"] += 1
-                            logger.info(f"✅ Деактивирована подписка пользователя {telegram_id} (сохранен баланс)")
-                            
-                        except Exception as delete_error:
-                            logger.error(f"❌ Ошибка деактивации подписки {telegram_id}: {delete_error}")
-                            stats["errors"] += 1
-                            await db.rollback()
+            stats = reconciler.stats
+            
+            if not stats["errors"]:
+                await store_sync_watermark(db, watermark_name, latest_update)
             
             logger.info(f"🎯 Синхронизация завершена: создано {stats['created']}, обновлено {stats['updated']}, деактивировано {stats['deleted']}, ошибок {stats['errors']}")
             return stats
@@ -742,55 +649,30 @@ class RemnaWaveService:
             logger.error(f"❌ Критическая ошибка синхронизации пользователей: {e}")
             return {"created": 0, "updated": 0, "errors": 1, "deleted": 0}
 
+    @staticmethod
+    def _panel_user_to_dict(user_obj: RemnaWaveUser) -> Dict[str, Any]:
+        return {
+            'uuid': user_obj.uuid,
+            'shortUuid': user_obj.short_uuid,
+            'username': user_obj.username,
+            'status': user_obj.status.value,
+            'telegramId': user_obj.telegram_id,
+            'expireAt': user_obj.expire_at.isoformat() + 'Z',
+            'trafficLimitBytes': user_obj.traffic_limit_bytes,
+            'usedTrafficBytes': user_obj.used_traffic_bytes,
+            'hwidDeviceLimit': user_obj.hwid_device_limit,
+            'subscriptionUrl': user_obj.subscription_url,
+            'subscriptionCryptoLink': user_obj.happ_crypto_link,
+            'activeInternalSquads': user_obj.active_internal_squads
+        }
+
     async def _create_subscription_from_panel_data(self, db: AsyncSession, user, panel_user):
         try:
             from app.database.crud.subscription import create_subscription
-            from app.database.models import SubscriptionStatus
-        
-            expire_at_str = panel_user.get('expireAt', '')
-            expire_at = self._parse_remnawave_date(expire_at_str)
-        
-            panel_status = panel_user.get('status', 'ACTIVE')
-            current_time = datetime.utcnow()
-        
-            if panel_status == 'ACTIVE' and expire_at > current_time:
-                status = SubscriptionStatus.ACTIVE
-            elif expire_at <= current_time:
-                status = SubscriptionStatus.EXPIRED
-            else:
-                status = SubscriptionStatus.DISABLED
         
-            traffic_limit_bytes = panel_user.get('trafficLimitBytes', 0)
-            traffic_limit_gb = traffic_limit_bytes // (1024**3) if traffic_limit_bytes > 0 else 0
-        
-            used_traffic_bytes = panel_user.get('usedTrafficBytes', 0)
-            traffic_used_gb = used_traffic_bytes / (1024**3)
-        
-            active_squads = panel_user.get('activeInternalSquads', [])
-            squad_uuids = []
-            if isinstance(active_squads, list):
-                for squad in active_squads:
-                    if isinstance(squad, dict) and 'uuid' in squad:
-                        squad_uuids.append(squad['uuid'])
-                    elif isinstance(squad, str):
-                        squad_uuids.append(squad)
-        
-            subscription_data = {
-                'user_id': user.id,
-                'status': status.value,
-                'is_trial': False,
-                'end_date': expire_at,
-                'traffic_limit_gb': traffic_limit_gb,
-                'traffic_used_gb': traffic_used_gb,
-                'device_limit': panel_user.get('hwidDeviceLimit', 1) or 1,
-                'connected_squads': squad_uuids,
-                'remnawave_short_uuid': panel_user.get('shortUuid'),
-                'subscription_url': panel_user.get('subscriptionUrl', ''),
-                'subscription_crypto_link': (
-                    panel_user.get('subscriptionCryptoLink')
-                    or (panel_user.get('happ') or {}).get('cryptoLink', '')
-                )
-            }
+            subscription_data = build_panel_subscription_values(panel_user, self._parse_remnawave_date)
+            subscription_data['user_id'] = user.id
+            expire_at = subscription_data['end_date']
         
             subscription = await create_subscription(db, **subscription_data)
             logger.info(f"✅ Создана подписка для пользователя {user.telegram_id} до {expire_at}")
@@ -825,7 +707,6 @@ class RemnaWaveService:
     async def _update_subscription_from_panel_data(self, db: AsyncSession, user, panel_user):
         try:
             from app.database.crud.subscription import get_subscription_by_user_id
-            from app.database.models import SubscriptionStatus
         
             subscription = await get_subscription_by_user_id(db, user.id)
             
@@ -833,78 +714,12 @@ class RemnaWaveService:
                 await self._create_subscription_from_panel_data(db, user, panel_user)
                 return
         
-            panel_status = panel_user.get('status', 'ACTIVE')
-            expire_at_str = panel_user.get('expireAt', '')
-            
-            if expire_at_str:
-                expire_at = self._parse_remnawave_date(expire_at_str)
-                
-                if abs((subscription.end_date - expire_at).total_seconds()) > 60: 
-                    subscription.end_date = expire_at
-                    logger.debug(f"Обновлена дата окончания подписки до {expire_at}")
-            
-            current_time = datetime.utcnow()
-            if panel_status == 'ACTIVE' and subscription.end_date > current_time:
-                new_status = SubscriptionStatus.ACTIVE.value
-            elif subscription.end_date <= current_time:
-                new_status = SubscriptionStatus.EXPIRED.value
-            elif panel_status == 'DISABLED':
-                new_status = SubscriptionStatus.DISABLED.value
-            else:
-                new_status = subscription.status 
-            
-            if subscription.status != new_status:
-                subscription.status = new_status
-                logger.debug(f"Обновлен статус подписки: {new_status}")
-        
-            used_traffic_bytes = panel_user.get('usedTrafficBytes', 0)
-            traffic_used_gb = used_traffic_bytes / (1024**3)
-        
-            if abs(subscription.traffic_used_gb - traffic_used_gb) > 0.01:
-                subscription.traffic_used_gb = traffic_used_gb
-                logger.debug(f"Обновлен использованный трафик: {traffic_used_gb} GB")
-            
-            traffic_limit_bytes = panel_user.get('trafficLimitBytes', 0)
-            traffic_limit_gb = traffic_limit_bytes // (1024**3) if traffic_limit_bytes > 0 else 0
-            
-            if subscription.traffic_limit_gb != traffic_limit_gb:
-                subscription.traffic_limit_gb = traffic_limit_gb
-                logger.debug(f"Обновлен лимит трафика: {traffic_limit_gb} GB")
-            
-            device_limit = panel_user.get('hwidDeviceLimit', 1) or 1
-            if subscription.device_limit != device_limit:
-                subscription.device_limit = device_limit
-                logger.debug(f"Обновлен лимит устройств: {device_limit}")
-        
-            if not subscription.remnawave_short_uuid:
-                subscription.remnawave_short_uuid = panel_user.get('shortUuid')
-        
-            panel_url = panel_user.get('subscriptionUrl', '')
-            if not subscription.subscription_url or subscription.subscription_url != panel_url:
-                subscription.subscription_url = panel_url
-
-            panel_crypto_link = (
-                panel_user.get('subscriptionCryptoLink')
-                or (panel_user.get('happ') or {}).get('cryptoLink', '')
-            )
-            if panel_crypto_link and subscription.subscription_crypto_link != panel_crypto_link:
-                subscription.subscription_crypto_link = panel_crypto_link
-        
-            active_squads = panel_user.get('activeInternalSquads', [])
-            squad_uuids = []
-            if isinstance(active_squads, list):
-                for squad in active_squads:
-                    if isinstance(squad, dict) and 'uuid' in squad:
-                        squad_uuids.append(squad['uuid'])
-                    elif isinstance(squad, str):
-                        squad_uuids.append(squad)
-        
-            current_squads = set(subscription.connected_squads or [])
-            new_squads = set(squad_uuids)
+            changes = reconcile_panel_subscription(subscription, panel_user, self._parse_remnawave_date)
+            for field, value in changes.items():
+                setattr(subscription, field, value)
             
-            if current_squads != new_squads:
-                subscription.connected_squads = squad_uuids
-                logger.debug(f"Обновлены подключенные сквады: {squad_uuids}")
+            if changes:
+                logger.debug(f"Обновлены поля подписки: {', '.join(changes)}")
         
             await db.commit()
             logger.debug(f"✅ Обновлена подписка для пользователя {user.telegram_id}")
@@ -913,71 +728,31 @@ class RemnaWaveService:
             logger.error(f"❌ Ошибка обновления подписки для пользователя {user.telegram_id}: {e}")
             await db.rollback()
     
-    async def sync_users_to_panel(self, db: AsyncSession) -> Dict[str, int]:
+    async def sync_users_to_panel(
+        self,
+        db: AsyncSession,
+        resume: bool = True,
+        force: bool = False,
+    ) -> Dict[str, int]:
+        """Выгружает пользователей в панель.
+
+        Пользователи с неизменившимся remnawave_push_hash пропускаются: другие
+        пути записи в панель сбрасывают хеш. force=True выгружает всех, например
+        чтобы исправить изменения, внесённые в панели вручную.
+        """
         try:
-            stats = {"created": 0, "updated": 0, "errors": 0}
-            
-            users = await get_users_list(db, offset=0, limit=10000)
-            
             async with self.get_api_client() as api:
-                for user in users:
-                    if not user.subscription:
-                        continue
-                    
-                    try:
-                        subscription = user.subscription
-                        
-                        if user.remnawave_uuid:
-                            await api.update_user(
-                                uuid=user.remnawave_uuid,
-                                status=UserStatus.ACTIVE if subscription.is_active else UserStatus.EXPIRED,
-                                expire_at=subscription.end_date,
-                                traffic_limit_bytes=subscription.traffic_limit_gb * (1024**3) if subscription.traffic_limit_gb > 0 else 0,
-                                traffic_limit_strategy=TrafficLimitStrategy.MONTH,
-                                hwid_device_limit=subscription.device_limit,
-                                description=settings.format_remnawave_user_description(
-                                    full_name=user.full_name,
-                                    username=user.username,
-                                    telegram_id=user.telegram_id
-                                ),
-                                active_internal_squads=subscription.connected_squads
-                            )
-                            stats["updated"] += 1
-                        else:
-                            username = f"user_{user.telegram_id}"
-                            
-                            new_user = await api.create_user(
-                                username=username,
-                                expire_at=subscription.end_date,
-                                status=UserStatus.ACTIVE if subscription.is_active else UserStatus.EXPIRED,
-                                traffic_limit_bytes=subscription.traffic_limit_gb * (1024**3) if subscription.traffic_limit_gb > 0 else 0,
-                                traffic_limit_strategy=TrafficLimitStrategy.MONTH,
-                                telegram_id=user.telegram_id,
-                                hwid_device_limit=subscription.device_limit,
-                                description=settings.format_remnawave_user_description(
-                                    full_name=user.full_name,
-                                    username=user.username,
-                                    telegram_id=user.telegram_id
-                                ),
-                                active_internal_squads=subscription.connected_squads
-                            )
-                            
-                            await update_user(db, user, remnawave_uuid=new_user.uuid)
-                            subscription.remnawave_short_uuid = new_user.short_uuid
-                            await db.commit()
-                            
-                            stats["created"] += 1
-                            
-                    except Exception as e:
-                        logger.error(f"Ошибка синхронизации пользователя {user.telegram_id} в панель: {e}")
-                        stats["errors"] += 1
+                stats = await PanelUserPusher(db, api).run(resume=resume, force=force)
             
-            logger.info(f"✅ Синхронизация в панель завершена: создано {stats['created']}, обновлено {stats['updated']}, ошибок {stats['errors']}")
+            logger.info(
+                f"✅ Синхронизация в панель завершена: создано {stats['created']}, обновлено {stats['updated']}, "
+                f"пропущено без изменений {stats['skipped']}, ошибок {stats['errors']}"
+            )
             return stats
             
         except Exception as e:
             logger.error(f"Ошибка синхронизации пользователей в панель: {e}")
-            return {"created": 0, "updated": 0, "errors": 1}
+            return {"created": 0, "updated": 0, "skipped": 0, "errors": 1}
     
     async def get_user_traffic_stats(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         try:
@@ -1470,45 +1245,49 @@ class RemnaWaveService:
             await db.rollback()
             return False
 
-    async def cleanup_orphaned_subscriptions(self, db: AsyncSession) -> Dict[str, int]:
+    async def get_panel_snapshot(self) -> PanelSnapshot:
+        async with self.get_api_client() as api:
+            return await build_panel_snapshot(api)
+
+    async def cleanup_orphaned_subscriptions(
+        self,
+        db: AsyncSession,
+        snapshot: Optional[PanelSnapshot] = None,
+    ) -> Dict[str, int]:
+        """Деактивирует подписки пользователей, которых нет в панели.
+
+        Всегда проверяет все активные подписки по полному снимку панели:
+        подписка становится «сиротой» при удалении пользователя в панели,
+        а это не меняет строк на стороне бота, поэтому инкрементальный
+        проход по изменившимся подпискам таких случаев не находит.
+        """
         try:
             stats = {"deactivated": 0, "errors": 0, "checked": 0}
         
             logger.info("🧹 Начинаем усиленную очистку неактуальных подписок...")
         
-            async with self.get_api_client() as api:
-                panel_users_data = await api._make_request('GET', '/api/users')
-                panel_users = panel_users_data['response']['users']
-        
-            panel_telegram_ids = set()
-            for panel_user in panel_users:
-                telegram_id = panel_user.get('telegramId')
-                if telegram_id:
-                    panel_telegram_ids.add(telegram_id)
-        
-            logger.info(f"📊 Найдено {len(panel_telegram_ids)} пользователей в панели")
+            if snapshot is None:
+                snapshot = await self.get_panel_snapshot()
         
-            from app.database.crud.subscription import get_all_subscriptions
-            from app.database.models import SubscriptionStatus
-        
-            page = 1
-            limit = 100
+            logger.info(f"📊 Найдено {len(snapshot)} пользователей в панели")
+            
+            if not snapshot.is_complete:
+                logger.warning("⚠️ Снимок панели неполный, очистка подписок пропущена")
+                stats["errors"] += 1
+                return stats
         
-            while True:
-                subscriptions, total_count = await get_all_subscriptions(db, page, limit)
-                
-                if not subscriptions:
-                    break
+            from app.database.crud.subscription import iter_subscriptions_by_id
+            from app.database.models import Subscription, SubscriptionStatus
             
+            conditions = [Subscription.status != SubscriptionStatus.DISABLED.value]
+        
+            async for subscriptions in iter_subscriptions_by_id(db, *conditions):
                 for subscription in subscriptions:
                     try:
                         stats["checked"] += 1
                         user = subscription.user
                     
-                        if subscription.status == SubscriptionStatus.DISABLED.value:
-                            continue
-                    
-                        if user.telegram_id not in panel_telegram_ids:
+                        if user.telegram_id not in snapshot:
                             logger.info(f"🗑️ ПОЛНАЯ деактивация подписки пользователя {user.telegram_id} (отсутствует в панели)")
                             
                             cleanup_success = await self.force_cleanup_user_data(db, user)
@@ -1521,10 +1300,6 @@ class RemnaWaveService:
                     except Exception as sub_error:
                         logger.error(f"❌ Ошибка обработки подписки {subscription.id}: {sub_error}")
                         stats["errors"] += 1
-            
-                page += 1
-                if len(subscriptions) < limit:
-                    break
         
             logger.info(f"🧹 Усиленная очистка завершена: проверено {stats['checked']}, деактивировано {stats['deactivated']}, ошибок {stats['errors']}")
             return stats
@@ -1534,61 +1309,86 @@ class RemnaWaveService:
             return {"deactivated": 0, "errors": 1, "checked": 0}
 
 
-    async def sync_subscription_statuses(self, db: AsyncSession) -> Dict[str, int]:
+    async def sync_subscription_statuses(
+        self,
+        db: AsyncSession,
+        incremental: bool = False,
+        snapshot: Optional[PanelSnapshot] = None,
+    ) -> Dict[str, int]:
         try:
             stats = {"updated": 0, "errors": 0, "checked": 0}
         
             logger.info("🔄 Начинаем синхронизацию статусов подписок...")
+            
+            panel_since = bot_since = None
+            if incremental:
+                panel_since = await load_sync_watermark(db, "subscription_statuses:panel")
+                bot_since = await load_sync_watermark(db, "subscription_statuses:bot")
+            bot_seen = bot_since
         
-            async with self.get_api_client() as api:
-                panel_users_data = await api._make_request('GET', '/api/users')
-                panel_users = panel_users_data['response']['users']
-        
-            panel_users_dict = {}
-            for panel_user in panel_users:
-                telegram_id = panel_user.get('telegramId')
-                if telegram_id:
-                    panel_users_dict[telegram_id] = panel_user
-        
-            logger.info(f"📊 Найдено {len(panel_users_dict)} пользователей в панели для синхронизации")
-        
-            from app.database.crud.subscription import get_all_subscriptions
-            from app.database.models import SubscriptionStatus
+            if snapshot is None:
+                snapshot = await self.get_panel_snapshot()
         
-            page = 1
-            limit = 100
+            logger.info(f"📊 Найдено {len(snapshot)} пользователей в панели для синхронизации")
         
-            while True:
-                subscriptions, total_count = await get_all_subscriptions(db, page, limit)
-            
-                if not subscriptions:
-                    break
+            from sqlalchemy import or_, select
+            from app.database.crud.subscription import iter_subscriptions_by_id
+            from app.database.models import Subscription, SubscriptionStatus
             
+            conditions = []
+            if panel_since and bot_since:
+                changed_telegram_ids = snapshot.changed_since(panel_since)
+                if len(changed_telegram_ids) <= DELTA_TELEGRAM_IDS_LIMIT:
+                    logger.info(
+                        f"⏩ Инкрементальная синхронизация: изменилось в панели {len(changed_telegram_ids)}, "
+                        f"подписки бота после {bot_since}"
+                    )
+                    conditions.append(
+                        or_(
+                            Subscription.updated_at > bot_since,
+                            Subscription.user_id.in_(
+                                select(User.id).where(User.telegram_id.in_(changed_telegram_ids))
+                            ),
+                        )
+                    )
+                else:
+                    logger.info(
+                        f"ℹ️ В панели изменилось {len(changed_telegram_ids)} пользователей, выполняем полный проход"
+                    )
+        
+            async for subscriptions in iter_subscriptions_by_id(db, *conditions):
+                current_time = datetime.utcnow()
+                
                 for subscription in subscriptions:
-                    try:
-                        stats["checked"] += 1
-                        user = subscription.user
+                    stats["checked"] += 1
+                    user = subscription.user
+                    state = snapshot.get(user.telegram_id)
                     
-                        panel_user = panel_users_dict.get(user.telegram_id)
+                    if state:
+                        changes = reconcile_panel_state(subscription, state, current_time)
+                    elif snapshot.is_complete and subscription.status != SubscriptionStatus.DISABLED.value:
+                        logger.info(f"🗑️ Деактивируем подписку пользователя {user.telegram_id} (нет в панели)")
+                        changes = {"status": SubscriptionStatus.DISABLED.value}
+                    else:
+                        changes = {}
                     
-                        if panel_user:
-                            await self._update_subscription_from_panel_data(db, user, panel_user)
-                            stats["updated"] += 1
-                        else:
-                            if subscription.status != SubscriptionStatus.DISABLED.value:
-                                logger.info(f"🗑️ Деактивируем подписку пользователя {user.telegram_id} (нет в панели)")
-                            
-                                from app.database.crud.subscription import deactivate_subscription
-                                await deactivate_subscription(db, subscription)
-                                stats["updated"] += 1
-                        
-                    except Exception as sub_error:
-                        logger.error(f"❌ Ошибка синхронизации подписки {subscription.id}: {sub_error}")
-                        stats["errors"] += 1
+                    if changes:
+                        changes["updated_at"] = current_time
+                        stats["updated"] += 1
+                    for field, value in changes.items():
+                        setattr(subscription, field, value)
+                    bot_seen = latest_timestamp(bot_seen, subscription.updated_at)
+                
+                try:
+                    await db.commit()
+                except Exception as page_error:
+                    logger.error(f"❌ Ошибка сохранения статусов подписок: {page_error}")
+                    stats["errors"] += len(subscriptions)
+                    await db.rollback()
             
-                page += 1
-                if len(subscriptions) < limit:
-                    break
+            if not stats["errors"] and snapshot.is_complete:
+                await store_sync_watermark(db, "subscription_statuses:panel", snapshot.latest_update)
+                await store_sync_watermark(db, "subscription_statuses:bot", bot_seen)
         
             logger.info(f"🔄 Синхронизация статусов завершена: проверено {stats['checked']}, обновлено {stats['updated']}, ошибок {stats['errors']}")
             return stats
@@ -1598,24 +1398,39 @@ class RemnaWaveService:
             return {"updated": 0, "errors": 1, "checked": 0}
 
 
-    async def validate_and_fix_subscriptions(self, db: AsyncSession) -> Dict[str, int]:
+    async def validate_and_fix_subscriptions(
+        self,
+        db: AsyncSession,
+        incremental: bool = False,
+        snapshot: Optional[PanelSnapshot] = None,
+    ) -> Dict[str, int]:
         try:
             stats = {"fixed": 0, "errors": 0, "checked": 0, "issues_found": 0}
         
             logger.info("🔍 Начинаем валидацию подписок...")
             
-            from app.database.crud.subscription import get_all_subscriptions
-            from app.database.models import SubscriptionStatus
-        
-            page = 1
-            limit = 100
-        
-            while True:
-                subscriptions, total_count = await get_all_subscriptions(db, page, limit)
+            bot_since = await load_sync_watermark(db, "subscription_validation") if incremental else None
+            bot_seen = bot_since
+            run_started_at = datetime.utcnow()
             
-                if not subscriptions:
-                    break
+            from sqlalchemy import and_, or_
+            from app.database.crud.subscription import iter_subscriptions_by_id
+            from app.database.models import Subscription, SubscriptionStatus
             
+            conditions = []
+            if bot_since:
+                logger.info(f"⏩ Проверяются подписки, изменённые после {bot_since}, и истёкшие активные")
+                conditions.append(
+                    or_(
+                        Subscription.updated_at > bot_since,
+                        and_(
+                            Subscription.status == SubscriptionStatus.ACTIVE.value,
+                            Subscription.end_date <= run_started_at,
+                        ),
+                    )
+                )
+        
+            async for subscriptions in iter_subscriptions_by_id(db, *conditions):
                 for subscription in subscriptions:
                     try:
                         stats["checked"] += 1
@@ -1628,7 +1443,12 @@ class RemnaWaveService:
                             subscription.status = SubscriptionStatus.EXPIRED.value
                             issues_fixed += 1
                 
-                        if not subscription.remnawave_short_uuid and user.remnawave_uuid:
+                        panel_state = snapshot.get(user.telegram_id) if snapshot is not None else None
+                        in_panel = snapshot is None or (
+                            panel_state is not None and panel_state.uuid == user.remnawave_uuid
+                        )
+                        
+                        if not subscription.remnawave_short_uuid and user.remnawave_uuid and in_panel:
                             try:
                                 async with self.get_api_client() as api:
                                     rw_user = await api.get_user_by_uuid(user.remnawave_uuid)
@@ -1662,18 +1482,19 @@ class RemnaWaveService:
                             issues_fixed += 1
                     
                         if issues_fixed > 0:
+                            subscription.updated_at = current_time
                             stats["issues_found"] += issues_fixed
                             stats["fixed"] += 1
                             await db.commit()
+                        bot_seen = latest_timestamp(bot_seen, subscription.updated_at)
                         
                     except Exception as sub_error:
                         logger.error(f"❌ Ошибка валидации подписки {subscription.id}: {sub_error}")
                         stats["errors"] += 1
                         await db.rollback()
             
-                page += 1
-                if len(subscriptions) < limit:
-                    break
+            if not stats["errors"]:
+                await store_sync_watermark(db, "subscription_validation", bot_seen)
         
             logger.info(f"🔍 Валидация завершена: проверено {stats['checked']}, исправлено подписок {stats['fixed']}, найдено проблем {stats['issues_found']}, ошибок {stats['errors']}")
             return stats
@@ -1683,6 +1504,19 @@ class RemnaWaveService:
             return {"fixed": 0, "errors": 1, "checked": 0, "issues_found": 0}
 
 
+    async def reconcile_subscriptions_with_panel(
+        self,
+        db: AsyncSession,
+        incremental: bool = False,
+    ) -> Dict[str, Dict[str, int]]:
+        snapshot = await self.get_panel_snapshot()
+        
+        return {
+            "statuses": await self.sync_subscription_statuses(db, incremental=incremental, snapshot=snapshot),
+            "validation": await self.validate_and_fix_subscriptions(db, incremental=incremental, snapshot=snapshot),
+            "cleanup": await self.cleanup_orphaned_subscriptions(db, snapshot=snapshot),
+        }
+
     async def get_sync_recommendations(self, db: AsyncSession) -> Dict[str, Any]:
         try:
             recommendations = {
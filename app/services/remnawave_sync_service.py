@@ -0,0 +1,907 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import settings
+from app.database.crud.system_setting import (
+    delete_system_setting,
+    get_system_setting_value,
+    upsert_system_setting,
+)
+from app.database.crud.user import (
+    _resolve_sse_broker,
+    generate_referral_code,
+    get_or_create_default_promo_group,
+)
+from app.database.models import Subscription, SubscriptionServer, SubscriptionStatus, User
+from app.external.remnawave_api import RemnaWaveAPI, TrafficLimitStrategy, UserStatus
+from app.utils.validators import sanitize_telegram_name
+
+
+logger = logging.getLogger(__name__)
+
+
+SUBSCRIPTION_SYNC_FIELDS = (
+    "status",
+    "end_date",
+    "traffic_limit_gb",
+    "traffic_used_gb",
+    "device_limit",
+    "connected_squads",
+    "remnawave_short_uuid",
+    "subscription_url",
+    "subscription_crypto_link",
+)
+
+
+class PanelUserState(NamedTuple):
+    """Сжатое состояние пользователя панели, достаточное для сверки статусов."""
+
+    uuid: str
+    short_uuid: Optional[str]
+    status: str
+    expire_at: Optional[datetime]
+    used_traffic_bytes: int
+    traffic_limit_bytes: int
+    updated_at: Optional[datetime]
+
+
+def _extract_squad_uuids(panel_user: Dict[str, Any]) -> List[str]:
+    active_squads = panel_user.get('activeInternalSquads', [])
+    squad_uuids = []
+    if isinstance(active_squads, list):
+        for squad in active_squads:
+            if isinstance(squad, dict) and 'uuid' in squad:
+                squad_uuids.append(squad['uuid'])
+            elif isinstance(squad, str):
+                squad_uuids.append(squad)
+    return squad_uuids
+
+
+def _extract_crypto_link(panel_user: Dict[str, Any]) -> str:
+    return (
+        panel_user.get('subscriptionCryptoLink')
+        or (panel_user.get('happ') or {}).get('cryptoLink', '')
+    )
+
+
+def _traffic_limit_gb(panel_user: Dict[str, Any]) -> int:
+    traffic_limit_bytes = panel_user.get('trafficLimitBytes', 0)
+    return traffic_limit_bytes // (1024**3) if traffic_limit_bytes > 0 else 0
+
+
+def build_panel_subscription_values(
+    panel_user: Dict[str, Any],
+    parse_date: Callable[[str], datetime],
+    now: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Значения новой подписки, созданной по данным пользователя панели."""
+
+    current_time = now or datetime.utcnow()
+    expire_at = parse_date(panel_user.get('expireAt', ''))
+    panel_status = panel_user.get('status', 'ACTIVE')
+
+    if panel_status == 'ACTIVE' and expire_at > current_time:
+        status = SubscriptionStatus.ACTIVE
+    elif expire_at <= current_time:
+        status = SubscriptionStatus.EXPIRED
+    else:
+        status = SubscriptionStatus.DISABLED
+
+    return {
+        'status': status.value,
+        'is_trial': False,
+        'end_date': expire_at,
+        'traffic_limit_gb': _traffic_limit_gb(panel_user),
+        'traffic_used_gb': panel_user.get('usedTrafficBytes', 0) / (1024**3),
+        'device_limit': panel_user.get('hwidDeviceLimit', 1) or 1,
+        'connected_squads': _extract_squad_uuids(panel_user),
+        'remnawave_short_uuid': panel_user.get('shortUuid'),
+        'subscription_url': panel_user.get('subscriptionUrl', ''),
+        'subscription_crypto_link': _extract_crypto_link(panel_user),
+    }
+
+
+def reconcile_panel_state(
+    subscription: Any,
+    state: PanelUserState,
+    now: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Расхождения подписки с панелью по сроку, статусу и трафику."""
+
+    changes: Dict[str, Any] = {}
+    current_time = now or datetime.utcnow()
+
+    end_date = subscription.end_date
+    if state.expire_at:
+        if end_date is None or abs((end_date - state.expire_at).total_seconds()) > 60:
+            end_date = state.expire_at
+            changes['end_date'] = state.expire_at
+
+    if state.status == 'ACTIVE' and end_date > current_time:
+        new_status = SubscriptionStatus.ACTIVE.value
+    elif end_date <= current_time:
+        new_status = SubscriptionStatus.EXPIRED.value
+    elif state.status == 'DISABLED':
+        new_status = SubscriptionStatus.DISABLED.value
+    else:
+        new_status = subscription.status
+
+    if subscription.status != new_status:
+        changes['status'] = new_status
+
+    traffic_used_gb = (state.used_traffic_bytes or 0) / (1024**3)
+    if abs((subscription.traffic_used_gb or 0.0) - traffic_used_gb) > 0.01:
+        changes['traffic_used_gb'] = traffic_used_gb
+
+    traffic_limit_bytes = state.traffic_limit_bytes or 0
+    traffic_limit_gb = traffic_limit_bytes // (1024**3) if traffic_limit_bytes > 0 else 0
+    if subscription.traffic_limit_gb != traffic_limit_gb:
+        changes['traffic_limit_gb'] = traffic_limit_gb
+
+    return changes
+
+
+def reconcile_panel_subscription(
+    subscription: Any,
+    panel_user: Dict[str, Any],
+    parse_date: Callable[[str], datetime],
+    now: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Возвращает только те поля подписки, которые расходятся с панелью.
+
+    `subscription` может быть ORM-объектом или строкой выборки с теми же
+    атрибутами, что перечислены в SUBSCRIPTION_SYNC_FIELDS.
+    """
+
+    expire_at_str = panel_user.get('expireAt', '')
+    state = PanelUserState(
+        uuid=panel_user.get('uuid'),
+        short_uuid=panel_user.get('shortUuid'),
+        status=panel_user.get('status', 'ACTIVE'),
+        expire_at=parse_date(expire_at_str) if expire_at_str else None,
+        used_traffic_bytes=panel_user.get('usedTrafficBytes', 0),
+        traffic_limit_bytes=panel_user.get('trafficLimitBytes', 0),
+        updated_at=None,
+    )
+    changes = reconcile_panel_state(subscription, state, now)
+
+    device_limit = panel_user.get('hwidDeviceLimit', 1) or 1
+    if subscription.device_limit != device_limit:
+        changes['device_limit'] = device_limit
+
+    if not subscription.remnawave_short_uuid and panel_user.get('shortUuid'):
+        changes['remnawave_short_uuid'] = panel_user.get('shortUuid')
+
+    panel_url = panel_user.get('subscriptionUrl', '')
+    if subscription.subscription_url != panel_url:
+        changes['subscription_url'] = panel_url
+
+    panel_crypto_link = _extract_crypto_link(panel_user)
+    if panel_crypto_link and subscription.subscription_crypto_link != panel_crypto_link:
+        changes['subscription_crypto_link'] = panel_crypto_link
+
+    squad_uuids = _extract_squad_uuids(panel_user)
+    if set(subscription.connected_squads or []) != set(squad_uuids):
+        changes['connected_squads'] = squad_uuids
+
+    return changes
+
+
+class PanelUserReconciler:
+    """Сверяет пользователей панели с базой бота пакетами по telegram_id.
+
+    Пользователи панели копятся в буфере и обрабатываются чанками: на чанк
+    приходится по одному SELECT пользователей и подписок, bulk INSERT новых
+    записей (ON CONFLICT DO NOTHING) и bulk UPDATE изменившихся подписок в
+    отдельной транзакции. Если чанк не удалось применить пакетно или СУБД
+    не поддерживает INSERT ... ON CONFLICT, он обрабатывается построчно через
+    RemnaWaveService.
+    """
+
+    def __init__(
+        self,
+        service: Any,
+        db: AsyncSession,
+        sync_type: str = "all",
+        chunk_size: Optional[int] = None,
+    ) -> None:
+        self.service = service
+        self.db = db
+        self.sync_type = sync_type
+        self.chunk_size = max(1, chunk_size or settings.REMNAWAVE_SYNC_CHUNK_SIZE)
+        self.stats = {"created": 0, "updated": 0, "errors": 0, "deleted": 0}
+        self.panel_telegram_ids: Set[int] = set()
+        self.processed = 0
+        self._buffer: Dict[int, Dict[str, Any]] = {}
+        self._chunks = 0
+        self._bulk_created = 0
+
+    @property
+    def creates_users(self) -> bool:
+        return self.sync_type in ("new_only", "all")
+
+    @property
+    def updates_users(self) -> bool:
+        return self.sync_type in ("update_only", "all")
+
+    async def add(self, panel_users: Iterable[Dict[str, Any]]) -> None:
+        for panel_user in panel_users:
+            telegram_id = panel_user.get('telegramId')
+            if not telegram_id:
+                continue
+
+            self.panel_telegram_ids.add(telegram_id)
+            self._buffer[telegram_id] = panel_user
+
+            if len(self._buffer) >= self.chunk_size:
+                await self._flush_chunk()
+
+    async def finish(self) -> Dict[str, int]:
+        if self._buffer:
+            await self._flush_chunk()
+
+        # Построчный путь оповещает подписчиков SSE сам, через create_user
+        if self._bulk_created:
+            try:
+                broker = _resolve_sse_broker()
+                if broker is not None:
+                    await broker.publish("users.update")
+            except Exception:
+                pass
+
+        return self.stats
+
+    @property
+    def supports_bulk(self) -> bool:
+        return self.db.bind.dialect.name in ("postgresql", "sqlite")
+
+    async def _flush_chunk(self) -> None:
+        chunk = self._buffer
+        self._buffer = {}
+        self._chunks += 1
+
+        if not self.supports_bulk:
+            await self._apply_chunk_row_by_row(chunk)
+            self._log_chunk(chunk)
+            return
+
+        try:
+            created, updated = await self._apply_chunk(chunk)
+            await self.db.commit()
+            self.stats["created"] += created
+            self.stats["updated"] += updated
+            self._bulk_created += created
+        except Exception as error:
+            await self.db.rollback()
+            logger.warning(
+                "⚠️ Пакетная сверка чанка %s не удалась (%s), повторяем построчно",
+                self._chunks,
+                error,
+            )
+            await self._apply_chunk_row_by_row(chunk)
+
+        self._log_chunk(chunk)
+
+    def _log_chunk(self, chunk: Dict[int, Dict[str, Any]]) -> None:
+        self.processed += len(chunk)
+        logger.info(
+            "📦 Чанк %s: обработано %s пользователей (всего %s), создано %s, обновлено %s, ошибок %s",
+            self._chunks,
+            len(chunk),
+            self.processed,
+            self.stats["created"],
+            self.stats["updated"],
+            self.stats["errors"],
+        )
+
+    async def _apply_chunk(self, chunk: Dict[int, Dict[str, Any]]) -> Tuple[int, int]:
+        db = self.db
+        now = datetime.utcnow()
+
+        result = await db.execute(
+            select(User.id, User.telegram_id, User.remnawave_uuid)
+            .where(User.telegram_id.in_(list(chunk.keys())))
+        )
+        existing_users = {row.telegram_id: row for row in result}
+
+        created = 0
+        created_ids: Dict[int, int] = {}
+        if self.creates_users:
+            new_telegram_ids = [tg_id for tg_id in chunk if tg_id not in existing_users]
+            if new_telegram_ids:
+                created, created_ids = await self._insert_users(
+                    [(tg_id, chunk[tg_id]) for tg_id in new_telegram_ids]
+                )
+
+        updated = 0
+        uuid_updates = []
+        subscription_owner_ids: Dict[int, int] = dict(created_ids)
+
+        if self.updates_users:
+            for telegram_id, row in existing_users.items():
+                subscription_owner_ids[telegram_id] = row.id
+                if not row.remnawave_uuid and chunk[telegram_id].get('uuid'):
+                    uuid_updates.append({
+                        "b_user_id": row.id,
+                        "b_remnawave_uuid": chunk[telegram_id]['uuid'],
+                    })
+            updated = len(existing_users)
+
+        if uuid_updates:
+            users_table = User.__table__
+            await db.execute(
+                update(users_table)
+                .where(users_table.c.id == bindparam("b_user_id"))
+                .values(remnawave_uuid=bindparam("b_remnawave_uuid")),
+                uuid_updates,
+            )
+
+        if not subscription_owner_ids:
+            return created, updated
+
+        result = await db.execute(
+            select(
+                Subscription.id,
+                Subscription.user_id,
+                *[getattr(Subscription, field) for field in SUBSCRIPTION_SYNC_FIELDS],
+            ).where(Subscription.user_id.in_(list(subscription_owner_ids.values())))
+        )
+        subscriptions_by_user = {row.user_id: row for row in result}
+
+        new_subscriptions = []
+        changed_subscriptions = []
+
+        for telegram_id, user_id in subscription_owner_ids.items():
+            panel_user = chunk[telegram_id]
+            current = subscriptions_by_user.get(user_id)
+
+            if current is None:
+                values = build_panel_subscription_values(
+                    panel_user, self.service._parse_remnawave_date, now
+                )
+                values['user_id'] = user_id
+                new_subscriptions.append(values)
+                continue
+
+            changes = reconcile_panel_subscription(
+                current, panel_user, self.service._parse_remnawave_date, now
+            )
+            if changes:
+                params = {f"b_{field}": getattr(current, field) for field in SUBSCRIPTION_SYNC_FIELDS}
+                params.update({f"b_{field}": value for field, value in changes.items()})
+                params["b_subscription_id"] = current.id
+                changed_subscriptions.append(params)
+
+        if new_subscriptions:
+            await db.execute(
+                self._insert(Subscription.__table__).on_conflict_do_nothing(
+                    index_elements=["user_id"]
+                ),
+                new_subscriptions,
+            )
+
+        if changed_subscriptions:
+            subscriptions_table = Subscription.__table__
+            await db.execute(
+                update(subscriptions_table)
+                .where(subscriptions_table.c.id == bindparam("b_subscription_id"))
+                .values({field: bindparam(f"b_{field}") for field in SUBSCRIPTION_SYNC_FIELDS}),
+                changed_subscriptions,
+            )
+
+        logger.debug(
+            "Чанк %s: новых пользователей %s, новых подписок %s, изменённых подписок %s",
+            self._chunks,
+            created,
+            len(new_subscriptions),
+            len(changed_subscriptions),
+        )
+        return created, updated
+
+    async def _insert_users(
+        self, panel_users: List[Tuple[int, Dict[str, Any]]]
+    ) -> Tuple[int, Dict[int, int]]:
+        """Вставляет новых пользователей и возвращает число реально созданных
+        строк и словарь telegram_id -> id для всех пользователей чанка."""
+
+        db = self.db
+
+        # Группа читается в транзакции чанка: после отката предыдущего чанка
+        # созданная им группа по умолчанию не существует
+        default_group = await get_or_create_default_promo_group(db)
+
+        rows = [
+            {
+                "telegram_id": telegram_id,
+                "username": panel_user.get('username') or f"user_{telegram_id}",
+                "first_name": sanitize_telegram_name(f"Panel User {telegram_id}"),
+                "language": "ru",
+                "referral_code": generate_referral_code(),
+                "balance_kopeks": 0,
+                "has_had_paid_subscription": False,
+                "has_made_first_topup": False,
+                "promo_group_id": default_group.id,
+                "remnawave_uuid": panel_user.get('uuid'),
+            }
+            for telegram_id, panel_user in panel_users
+        ]
+
+        users_table = User.__table__
+        inserted = await db.execute(
+            self._insert(users_table)
+            .on_conflict_do_nothing(index_elements=["telegram_id"])
+            .returning(users_table.c.id),
+            rows,
+        )
+        created = len(inserted.all())
+
+        result = await db.execute(
+            select(User.id, User.telegram_id)
+            .where(User.telegram_id.in_([telegram_id for telegram_id, _ in panel_users]))
+        )
+        return created, {row.telegram_id: row.id for row in result}
+
+    def _insert(self, table):
+        dialect = self.db.bind.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(table)
+
+    async def _apply_chunk_row_by_row(self, chunk: Dict[int, Dict[str, Any]]) -> None:
+        from app.database.crud.user import create_user, get_user_by_telegram_id, update_user
+
+        for telegram_id, panel_user in chunk.items():
+            try:
+                db_user = await get_user_by_telegram_id(self.db, telegram_id)
+
+                if not db_user:
+                    if self.creates_users:
+                        db_user = await create_user(
+                            db=self.db,
+                            telegram_id=telegram_id,
+                            username=panel_user.get('username') or f"user_{telegram_id}",
+                            first_name=f"Panel User {telegram_id}",
+                            language="ru"
+                        )
+                        await update_user(self.db, db_user, remnawave_uuid=panel_user.get('uuid'))
+                        await self.service._create_subscription_from_panel_data(self.db, db_user, panel_user)
+                        self.stats["created"] += 1
+
+                elif self.updates_users:
+                    if not db_user.remnawave_uuid:
+                        await update_user(self.db, db_user, remnawave_uuid=panel_user.get('uuid'))
+                    await self.service._update_subscription_from_panel_data(self.db, db_user, panel_user)
+                    self.stats["updated"] += 1
+
+            except Exception as user_error:
+                logger.error(f"❌ Ошибка обработки пользователя {telegram_id}: {user_error}")
+                self.stats["errors"] += 1
+                await self.db.rollback()
+
+    async def deactivate_missing(self, api: Optional[RemnaWaveAPI] = None) -> int:
+        """Деактивирует подписки пользователей бота, которых нет в панели.
+
+        Пользователи с подписками читаются постранично по возрастанию id,
+        поэтому ограничения на размер базы нет.
+        """
+
+        db = self.db
+        last_user_id = 0
+        deactivated = 0
+
+        while True:
+            result = await db.execute(
+                select(User.id, User.telegram_id, User.remnawave_uuid, Subscription.id.label("subscription_id"))
+                .join(Subscription, Subscription.user_id == User.id)
+                .where(User.id > last_user_id)
+                .order_by(User.id)
+                .limit(self.chunk_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+
+            last_user_id = rows[-1].id
+            missing = [row for row in rows if row.telegram_id not in self.panel_telegram_ids]
+            if not missing:
+                continue
+
+            if api is not None:
+                await self._reset_devices(api, [row for row in missing if row.remnawave_uuid])
+
+            try:
+                subscription_ids = [row.subscription_id for row in missing]
+                user_ids = [row.id for row in missing]
+
+                await db.execute(
+                    delete(SubscriptionServer).where(
+                        SubscriptionServer.subscription_id.in_(subscription_ids)
+                    )
+                )
+                await db.execute(
+                    update(Subscription)
+                    .where(Subscription.id.in_(subscription_ids))
+                    .values(
+                        status=SubscriptionStatus.DISABLED.value,
+                        is_trial=True,
+                        end_date=datetime.utcnow(),
+                        traffic_limit_gb=0,
+                        traffic_used_gb=0.0,
+                        device_limit=1,
+                        connected_squads=[],
+                        autopay_enabled=False,
+                        remnawave_short_uuid=None,
+                        subscription_url="",
+                        subscription_crypto_link="",
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await db.execute(
+                    update(User)
+                    .where(User.id.in_(user_ids))
+                    .values(remnawave_uuid=None)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            except Exception as error:
+                await db.rollback()
+                logger.error(f"❌ Ошибка деактивации подписок {len(missing)} пользователей: {error}")
+                self.stats["errors"] += len(missing)
+                continue
+
+            deactivated += len(missing)
+            self.stats["deleted"] += len(missing)
+            logger.info(
+                "🗑️ Деактивировано подписок отсутствующих в панели пользователей: %s (всего %s)",
+                len(missing),
+                deactivated,
+            )
+
+        return deactivated
+
+    async def _reset_devices(self, api: RemnaWaveAPI, rows: List[Any]) -> None:
+        if not rows:
+            return
+
+        semaphore = asyncio.Semaphore(max(1, settings.REMNAWAVE_SYNC_CONCURRENCY))
+
+        async def reset(row) -> None:
+            async with semaphore:
+                try:
+                    if await api.reset_user_devices(row.remnawave_uuid):
+                        logger.info(f"🔧 Сброшены HWID устройства для пользователя {row.telegram_id}")
+                except Exception as hwid_error:
+                    logger.error(f"❌ Ошибка сброса HWID устройств для {row.telegram_id}: {hwid_error}")
+
+        await asyncio.gather(*(reset(row) for row in rows))
+
+
+PUSH_CURSOR_KEY = "remnawave_push_cursor"
+WATERMARK_KEY_PREFIX = "remnawave_sync_watermark:"
+# При большем числе изменившихся в панели пользователей дешевле полный проход по подпискам
+DELTA_TELEGRAM_IDS_LIMIT = 5000
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def load_sync_watermark(db: AsyncSession, name: str) -> Optional[datetime]:
+    """Отметка времени, до которой изменения уже синхронизированы (UTC)."""
+
+    value = await get_system_setting_value(db, WATERMARK_KEY_PREFIX + name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        logger.warning("⚠️ Некорректная отметка синхронизации %s: %s", name, value)
+        return None
+
+
+def latest_timestamp(current: Optional[datetime], candidate: Optional[datetime]) -> Optional[datetime]:
+    """Большая из двух отметок; используется для водяного знака по фактически увиденным updated_at."""
+
+    candidate = to_naive_utc(candidate)
+    if candidate is None:
+        return current
+    if current is None or candidate > current:
+        return candidate
+    return current
+
+
+async def store_sync_watermark(db: AsyncSession, name: str, value: Optional[datetime]) -> None:
+    if value is None:
+        return
+    await upsert_system_setting(db, WATERMARK_KEY_PREFIX + name, to_naive_utc(value).isoformat())
+    await db.commit()
+
+
+def build_panel_push_payload(user: User, subscription: Subscription) -> Dict[str, Any]:
+    """Поля пользователя панели, которые бот выставляет при выгрузке."""
+
+    return {
+        'status': UserStatus.ACTIVE if subscription.is_active else UserStatus.EXPIRED,
+        'expire_at': subscription.end_date,
+        'traffic_limit_bytes': (
+            subscription.traffic_limit_gb * (1024**3) if subscription.traffic_limit_gb > 0 else 0
+        ),
+        'traffic_limit_strategy': TrafficLimitStrategy.MONTH,
+        'hwid_device_limit': subscription.device_limit,
+        'description': settings.format_remnawave_user_description(
+            full_name=user.full_name,
+            username=user.username,
+            telegram_id=user.telegram_id
+        ),
+        'active_internal_squads': subscription.connected_squads,
+    }
+
+
+def compute_panel_push_hash(remnawave_uuid: Optional[str], payload: Dict[str, Any]) -> str:
+    normalized = {
+        'uuid': remnawave_uuid,
+        'status': payload['status'].value,
+        'expire_at': payload['expire_at'].isoformat() if payload['expire_at'] else None,
+        'traffic_limit_bytes': payload['traffic_limit_bytes'],
+        'traffic_limit_strategy': payload['traffic_limit_strategy'].value,
+        'hwid_device_limit': payload['hwid_device_limit'],
+        'description': payload['description'],
+        'active_internal_squads': sorted(payload['active_internal_squads'] or []),
+    }
+    encoded = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+_PUSH_FAILED: Dict[str, Any] = {"failed": True}
+
+
+class PanelUserPusher:
+    """Выгружает пользователей бота в панель пулом воркеров.
+
+    Пользователи с подписками читаются страницами по возрастанию id. Запросы
+    к панели внутри страницы идут параллельно (не больше
+    REMNAWAVE_PUSH_CONCURRENCY одновременно), а результаты записываются в
+    базу одним пакетом после страницы. Курсор хранится в system_settings и
+    не продвигается дальше первого пользователя, которого не удалось
+    выгрузить, поэтому повторный запуск продолжит с него. Пользователи, чей
+    хеш выгружаемых полей совпадает с сохранённым, пропускаются, если не
+    задан force.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        api: RemnaWaveAPI,
+        concurrency: Optional[int] = None,
+        page_size: Optional[int] = None,
+    ) -> None:
+        self.db = db
+        self.api = api
+        self.concurrency = max(1, concurrency or settings.REMNAWAVE_PUSH_CONCURRENCY)
+        self.page_size = max(1, page_size or settings.REMNAWAVE_SYNC_PAGE_SIZE)
+        self.stats = {"created": 0, "updated": 0, "skipped": 0, "errors": 0}
+
+    async def run(self, resume: bool = True, force: bool = False) -> Dict[str, int]:
+        cursor = await self._load_cursor() if resume else 0
+        if cursor:
+            logger.info(f"⏯️ Продолжаем выгрузку в панель с пользователя id>{cursor}")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        processed = 0
+        saved_cursor = cursor
+        has_failures = False
+
+        while True:
+            result = await self.db.execute(
+                select(User)
+                .join(Subscription, Subscription.user_id == User.id)
+                .options(selectinload(User.subscription))
+                .where(User.id > cursor)
+                .order_by(User.id)
+                .limit(self.page_size)
+            )
+            users = result.scalars().all()
+            if not users:
+                break
+
+            outcomes = await asyncio.gather(
+                *(self._push_user(semaphore, user, force) for user in users)
+            )
+            await self._apply_outcomes(users, outcomes)
+
+            cursor = users[-1].id
+            if not has_failures:
+                for user, outcome in zip(users, outcomes):
+                    if outcome is _PUSH_FAILED:
+                        has_failures = True
+                        break
+                    saved_cursor = user.id
+            await upsert_system_setting(self.db, PUSH_CURSOR_KEY, str(saved_cursor))
+            await self.db.commit()
+
+            processed += len(users)
+            logger.info(
+                "📤 Выгрузка в панель: обработано %s, создано %s, обновлено %s, пропущено %s, ошибок %s",
+                processed,
+                self.stats["created"],
+                self.stats["updated"],
+                self.stats["skipped"],
+                self.stats["errors"],
+            )
+
+        if has_failures:
+            logger.warning(
+                "⚠️ Выгрузка в панель завершена с ошибками, следующий запуск продолжит с пользователя id>%s",
+                saved_cursor,
+            )
+        else:
+            await delete_system_setting(self.db, PUSH_CURSOR_KEY)
+            await self.db.commit()
+        return self.stats
+
+    async def _load_cursor(self) -> int:
+        value = await get_system_setting_value(self.db, PUSH_CURSOR_KEY)
+        try:
+            return int(value) if value else 0
+        except ValueError:
+            return 0
+
+    async def _push_user(
+        self,
+        semaphore: asyncio.Semaphore,
+        user: User,
+        force: bool,
+    ) -> Optional[Dict[str, Any]]:
+        subscription = user.subscription
+        payload = build_panel_push_payload(user, subscription)
+
+        if user.remnawave_uuid:
+            push_hash = compute_panel_push_hash(user.remnawave_uuid, payload)
+            if not force and user.remnawave_push_hash == push_hash:
+                self.stats["skipped"] += 1
+                return None
+
+            async with semaphore:
+                try:
+                    await self.api.update_user(uuid=user.remnawave_uuid, **payload)
+                except Exception as e:
+                    logger.error(f"Ошибка синхронизации пользователя {user.telegram_id} в панель: {e}")
+                    self.stats["errors"] += 1
+                    return _PUSH_FAILED
+
+            self.stats["updated"] += 1
+            return {"push_hash": push_hash}
+
+        async with semaphore:
+            try:
+                new_user = await self.api.create_user(
+                    username=f"user_{user.telegram_id}",
+                    telegram_id=user.telegram_id,
+                    **payload
+                )
+            except Exception as e:
+                logger.error(f"Ошибка синхронизации пользователя {user.telegram_id} в панель: {e}")
+                self.stats["errors"] += 1
+                return _PUSH_FAILED
+
+        self.stats["created"] += 1
+        return {
+            "remnawave_uuid": new_user.uuid,
+            "remnawave_short_uuid": new_user.short_uuid,
+            "push_hash": compute_panel_push_hash(new_user.uuid, payload),
+        }
+
+    async def _apply_outcomes(
+        self,
+        users: List[User],
+        outcomes: List[Optional[Dict[str, Any]]],
+    ) -> None:
+        for user, outcome in zip(users, outcomes):
+            if not outcome or outcome is _PUSH_FAILED:
+                continue
+
+            if "remnawave_uuid" in outcome:
+                user.remnawave_uuid = outcome["remnawave_uuid"]
+                user.subscription.remnawave_short_uuid = outcome["remnawave_short_uuid"]
+            user.remnawave_push_hash = outcome["push_hash"]
+
+
+class PanelSnapshot:
+    """Индекс telegram_id → PanelUserState по всем пользователям панели.
+
+    Строится один раз постраничным обходом панели и переиспользуется
+    синхронизацией статусов, валидацией и очисткой в рамках одного прогона.
+
+    Если загружено меньше пользователей, чем панель сообщила в total,
+    снимок неполный (is_complete=False), и по отсутствию пользователя в нём
+    нельзя делать вывод, что его нет в панели.
+    """
+
+    def __init__(self) -> None:
+        self.users: Dict[int, PanelUserState] = {}
+        self.loaded = 0
+        self.expected_total: Optional[int] = None
+        self.latest_update: Optional[datetime] = None
+        self.built_at = datetime.utcnow()
+
+    def __contains__(self, telegram_id: int) -> bool:
+        return telegram_id in self.users
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    @property
+    def is_complete(self) -> bool:
+        return self.expected_total is not None and self.loaded >= self.expected_total
+
+    def set_expected_total(self, total: int) -> None:
+        self.expected_total = total
+
+    def get(self, telegram_id: int) -> Optional[PanelUserState]:
+        return self.users.get(telegram_id)
+
+    def add(self, user_obj: Any) -> None:
+        self.loaded += 1
+
+        updated_at = to_naive_utc(user_obj.updated_at)
+        if updated_at and (self.latest_update is None or updated_at > self.latest_update):
+            self.latest_update = updated_at
+
+        if not user_obj.telegram_id:
+            return
+
+        self.users[user_obj.telegram_id] = PanelUserState(
+            uuid=user_obj.uuid,
+            short_uuid=user_obj.short_uuid,
+            status=user_obj.status.value,
+            expire_at=to_naive_utc(user_obj.expire_at),
+            used_traffic_bytes=user_obj.used_traffic_bytes,
+            traffic_limit_bytes=user_obj.traffic_limit_bytes,
+            updated_at=updated_at,
+        )
+
+    def changed_since(self, since: Optional[datetime]) -> List[int]:
+        if since is None:
+            return list(self.users)
+        return [
+            telegram_id
+            for telegram_id, state in self.users.items()
+            if state.updated_at is None or state.updated_at > since
+        ]
+
+
+async def build_panel_snapshot(api: RemnaWaveAPI) -> PanelSnapshot:
+    snapshot = PanelSnapshot()
+
+    async for users_batch in api.iter_user_pages(
+        size=settings.REMNAWAVE_SYNC_PAGE_SIZE,
+        concurrency=settings.REMNAWAVE_SYNC_CONCURRENCY,
+        on_total=snapshot.set_expected_total,
+    ):
+        for user_obj in users_batch:
+            snapshot.add(user_obj)
+
+    logger.info(
+        "📸 Снимок панели: загружено %s пользователей, с Telegram ID %s",
+        snapshot.loaded,
+        len(snapshot),
+    )
+    if not snapshot.is_complete:
+        logger.warning(
+            "⚠️ Снимок панели неполный: загружено %s из %s пользователей, деактивация отсутствующих отключена",
+            snapshot.loaded,
+            snapshot.expected_total,
+        )
+    return snapshot
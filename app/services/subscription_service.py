@@ -8,9 +8,9 @@ from app.config import settings
 from app.database.models import Subscription, User, SubscriptionStatus, PromoGroup
 from app.external.remnawave_api import (
     RemnaWaveAPI, RemnaWaveUser, UserStatus,
-    TrafficLimitStrategy, RemnaWaveAPIError
+    TrafficLimitStrategy, RemnaWaveAPIError, remnawave_session_pool
 )
-from app.database.crud.user import get_user_by_id
+from app.database.crud.user import get_user_by_id, reset_remnawave_push_hashes
 from app.utils.pricing_utils import (
     calculate_months_from_days,
     get_remaining_months,
@@ -105,6 +105,8 @@ class SubscriptionService:
         if config_signature == self._last_config_signature:
             return
 
+        previous_session_key = self.api.session_key if self.api else None
+
         if not base_url:
             self._config_error = "REMNAWAVE_API_URL не настроен"
             self.api = None
@@ -121,6 +123,10 @@ class SubscriptionService:
                 password=password,
             )
 
+        current_session_key = self.api.session_key if self.api else None
+        if previous_session_key and previous_session_key != current_session_key:
+            remnawave_session_pool.discard(previous_session_key)
+
         if self._config_error:
             logger.warning(
                 "RemnaWave API недоступен: %s. Подписочный сервис будет работать в оффлайн-режиме.",
@@ -237,6 +243,7 @@ class SubscriptionService:
                 subscription.subscription_url = updated_user.subscription_url
                 subscription.subscription_crypto_link = updated_user.happ_crypto_link
                 user.remnawave_uuid = updated_user.uuid
+                user.remnawave_push_hash = None
                 
                 await db.commit()
                 
@@ -307,6 +314,7 @@ class SubscriptionService:
 
                 subscription.subscription_url = updated_user.subscription_url
                 subscription.subscription_crypto_link = updated_user.happ_crypto_link
+                user.remnawave_push_hash = None
                 await db.commit()
                 
                 status_text = "активным" if is_actually_active else "истёкшим"
@@ -343,13 +351,20 @@ class SubscriptionService:
                 f"⚠️ Не удалось сбросить трафик RemnaWave для пользователя {telegram_id}: {exc}"
             )
 
-    async def disable_remnawave_user(self, user_uuid: str) -> bool:
+    async def disable_remnawave_user(
+        self,
+        user_uuid: str,
+        db: Optional[AsyncSession] = None,
+    ) -> bool:
 
         try:
             async with self.get_api_client() as api:
                 await api.disable_user(user_uuid)
                 logger.info(f"✅ Отключен RemnaWave пользователь {user_uuid}")
-                return True
+
+            if db is not None:
+                await reset_remnawave_push_hashes(db, [user_uuid])
+            return True
                 
         except Exception as e:
             logger.error(f"Ошибка отключения RemnaWave пользователя: {e}")
@@ -696,23 +711,22 @@ class SubscriptionService:
         promo_group_id: Optional[int] = None,
     ) -> Tuple[int, List[int]]:
         try:
-            from app.database.crud.server_squad import get_server_squad_by_uuid
+            from app.database.crud.server_squad import get_server_squad_info
             
             total_price = 0
             prices_list = []
             
             for country_uuid in country_uuids:
-                server = await get_server_squad_by_uuid(db, country_uuid)
+                server = await get_server_squad_info(db, country_uuid)
                 is_allowed = True
                 if promo_group_id is not None and server:
-                    allowed_ids = {pg.id for pg in server.allowed_promo_groups}
-                    is_allowed = promo_group_id in allowed_ids
+                    is_allowed = promo_group_id in server["allowed_promo_group_ids"]
 
-                if server and server.is_available and not server.is_full and is_allowed:
-                    price = server.price_kopeks
+                if server and server["is_available"] and not server["is_full"] and is_allowed:
+                    price = server["price_kopeks"]
                     total_price += price
                     prices_list.append(price)
-                    logger.debug(f"🏷️ Страна {server.display_name}: {price/100}₽")
+                    logger.debug(f"🏷️ Страна {server['display_name']}: {price/100}₽")
                 else:
                     default_price = 0  
                     total_price += default_price
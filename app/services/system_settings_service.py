@@ -156,6 +156,7 @@ class BotConfigurationService:
     CATEGORY_KEY_OVERRIDES: Dict[str, str] = {
         "DATABASE_URL": "DATABASE",
         "DATABASE_MODE": "DATABASE",
+        "USER_ACTIVITY_FLUSH_INTERVAL": "DATABASE",
         "LOCALES_PATH": "LOCALIZATION",
         "CHANNEL_SUB_ID": "CHANNEL",
         "CHANNEL_LINK": "CHANNEL",
@@ -277,6 +278,11 @@ class BotConfigurationService:
             ChoiceOption("postgresql", "🐘 PostgreSQL"),
             ChoiceOption("sqlite", "💾 SQLite"),
         ],
+        "DATABASE_POOL_MODE": [
+            ChoiceOption("auto", "🤖 Авто"),
+            ChoiceOption("queue", "🔁 Пул соединений"),
+            ChoiceOption("null", "🚫 Без пула (pgbouncer)"),
+        ],
         "REMNAWAVE_AUTH_TYPE": [
             ChoiceOption("api_key", "🔑 API Key"),
             ChoiceOption("basic_auth", "🧾 Basic Auth"),
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, or_, update
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import User
+
+
+logger = logging.getLogger(__name__)
+
+
+class UserActivityTracker:
+    """Откладывает запись User.last_activity и сбрасывает ее пачками.
+
+    Вместо UPDATE на каждое сообщение или нажатие кнопки касания копятся
+    в памяти процесса и раз в USER_ACTIVITY_FLUSH_INTERVAL секунд
+    записываются одним bulk UPDATE. Читатели видят данные, отстающие
+    не более чем на один интервал сброса.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[int, datetime] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def flush_interval(self) -> int:
+        return max(0, settings.USER_ACTIVITY_FLUSH_INTERVAL)
+
+    def is_enabled(self) -> bool:
+        return self.flush_interval > 0
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def touch(self, user: User, at: Optional[datetime] = None) -> None:
+        activity_at = at or datetime.utcnow()
+
+        if not self.is_running() or not user.id:
+            user.last_activity = activity_at
+            return
+
+        previous = self._pending.get(user.id)
+        if previous is None or previous < activity_at:
+            self._pending[user.id] = activity_at
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            batch = self._pending
+            self._pending = {}
+
+            users_table = User.__table__
+            statement = (
+                update(users_table)
+                .where(users_table.c.id == bindparam("b_user_id"))
+                .where(
+                    or_(
+                        users_table.c.last_activity.is_(None),
+                        users_table.c.last_activity < bindparam("b_activity_at"),
+                    )
+                )
+                .values(last_activity=bindparam("b_activity_at"))
+            )
+            params = [
+                {"b_user_id": user_id, "b_activity_at": activity_at}
+                for user_id, activity_at in batch.items()
+            ]
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(statement, params)
+                    await db.commit()
+            except Exception as error:
+                for user_id, activity_at in batch.items():
+                    current = self._pending.get(user_id)
+                    if current is None or current < activity_at:
+                        self._pending[user_id] = activity_at
+                logger.error("❌ Ошибка записи активности пользователей: %s", error)
+                return 0
+
+            logger.debug("💾 Записана активность %s пользователей", len(params))
+            return len(params)
+
+    async def start(self) -> None:
+        if not self.is_enabled():
+            logger.info("Отложенная запись активности отключена, last_activity пишется сразу")
+            return
+
+        if self.is_running():
+            return
+
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info(
+            "🕒 Отложенная запись активности запущена: сброс каждые %sс",
+            self.flush_interval,
+        )
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval or 1)
+            try:
+                await self.flush()
+            except Exception as error:
+                logger.error("Ошибка в цикле записи активности: %s", error)
+
+
+user_activity_tracker = UserActivityTracker()
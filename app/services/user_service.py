@@ -23,6 +23,7 @@ from app.database.models import (
     TransactionType
 )
 from app.config import settings
+from app.services.user_activity_service import user_activity_tracker
 
 logger = logging.getLogger(__name__)
 
@@ -116,6 +117,9 @@ class UserService:
     ) -> Dict[str, Any]:
         try:
             offset = (page - 1) * limit
+
+            if order_by_last_activity:
+                await user_activity_tracker.flush()
             
             users = await get_users_list(
                 db, offset=offset, limit=limit, search=query
@@ -158,6 +162,9 @@ class UserService:
     ) -> Dict[str, Any]:
         try:
             offset = (page - 1) * limit
+
+            if order_by_last_activity:
+                await user_activity_tracker.flush()
             
             users = await get_users_list(
                 db,
@@ -403,7 +410,7 @@ class UserService:
                 try:
                     from app.services.subscription_service import SubscriptionService
                     subscription_service = SubscriptionService()
-                    await subscription_service.disable_remnawave_user(user.remnawave_uuid)
+                    await subscription_service.disable_remnawave_user(user.remnawave_uuid, db)
                     logger.info(f"✅ RemnaWave пользователь {user.remnawave_uuid} деактивирован при блокировке")
                 except Exception as e:
                     logger.error(f"❌ Ошибка деактивации RemnaWave пользователя при блокировке: {e}")
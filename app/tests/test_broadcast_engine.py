@@ -0,0 +1,192 @@
+import os
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+os.environ.setdefault("BOT_TOKEN", "test-token")
+os.environ.setdefault("DATABASE_MODE", "sqlite")
+os.environ.setdefault("ADMIN_IDS", "")
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter  # noqa: E402
+from aiogram.methods import SendMessage  # noqa: E402
+
+from app.services import broadcast_engine  # noqa: E402
+from app.services.broadcast_engine import BroadcastEngine, TokenBucket  # noqa: E402
+
+
+_METHOD = SendMessage(chat_id=1, text="test")
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    def test_burst_then_waits_for_refill(self) -> None:
+        bucket = TokenBucket(rate=50, capacity=2)
+
+        async def run() -> float:
+            await bucket.acquire()
+            await bucket.acquire()
+            started = time.monotonic()
+            await bucket.acquire()
+            return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(run()), 0.015)
+
+    def test_penalize_pauses_and_slows_down(self) -> None:
+        bucket = TokenBucket(rate=20, capacity=20)
+
+        async def run() -> float:
+            bucket.penalize(0.05)
+            started = time.monotonic()
+            await bucket.acquire()
+            return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(run()), 0.04)
+        self.assertAlmostEqual(bucket.rate, 14.0)
+
+    def test_rate_recovers_after_successes(self) -> None:
+        bucket = TokenBucket(rate=10)
+        bucket.penalize(0)
+        penalized_rate = bucket.rate
+
+        for _ in range(49):
+            bucket.record_success()
+        self.assertEqual(bucket.rate, penalized_rate)
+
+        bucket.record_success()
+        self.assertAlmostEqual(bucket.rate, penalized_rate * 1.1)
+
+        for _ in range(1000):
+            bucket.record_success()
+        self.assertEqual(bucket.rate, bucket.max_rate)
+
+    def test_rate_never_drops_below_one(self) -> None:
+        bucket = TokenBucket(rate=2)
+        for _ in range(5):
+            bucket.penalize(0)
+        self.assertEqual(bucket.rate, 1.0)
+
+
+class BroadcastEngineTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.delays = []
+        self.clock = 1000.0
+        real_sleep = asyncio.sleep
+
+        async def fast_sleep(delay, *args, **kwargs):
+            self.delays.append(delay)
+            # Часы всегда идут вперёд, иначе ошибки округления при пополнении
+            # корзины оставляют её чуть ниже одного токена
+            self.clock += max(delay, 0.001)
+            await real_sleep(0)
+
+        # Задержки не ждём по-настоящему: они записываются и сдвигают часы движка
+        for patcher in (
+            patch.object(broadcast_engine.asyncio, "sleep", fast_sleep),
+            patch.object(broadcast_engine, "time", SimpleNamespace(monotonic=lambda: self.clock)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.engine = BroadcastEngine(rate=1000, concurrency=2, max_retries=2)
+        self.results = []
+
+    async def _on_result(self, telegram_id, success, error) -> None:
+        self.results.append((telegram_id, success, error))
+
+    def _run(self, recipients, send, **kwargs):
+        return asyncio.run(
+            self.engine.run(recipients, send, on_result=self._on_result, **kwargs)
+        )
+
+    def test_retry_after_is_retried(self) -> None:
+        attempts = []
+
+        async def send(telegram_id):
+            attempts.append(telegram_id)
+            if len(attempts) == 1:
+                raise TelegramRetryAfter(method=_METHOD, message="flood", retry_after=3)
+
+        result = self._run([1], send)
+
+        self.assertEqual((result.sent, result.failed, result.retried), (1, 0, 1))
+        self.assertEqual(attempts, [1, 1])
+        self.assertEqual(self.results, [(1, True, None)])
+        self.assertTrue(any(delay >= 2.9 for delay in self.delays))
+
+    def test_transient_error_backs_off_then_fails(self) -> None:
+        async def send(telegram_id):
+            raise TelegramNetworkError(method=_METHOD, message="timeout")
+
+        result = self._run([1], send)
+
+        self.assertEqual((result.sent, result.failed, result.retried), (0, 1, 2))
+        self.assertEqual([delay for delay in self.delays if delay >= 1], [1, 2])
+        self.assertFalse(self.results[0][1])
+
+    def test_permanent_error_is_not_retried(self) -> None:
+        attempts = []
+
+        async def send(telegram_id):
+            attempts.append(telegram_id)
+            if telegram_id == 2:
+                raise TelegramForbiddenError(method=_METHOD, message="bot was blocked by the user")
+
+        result = self._run([1, 2, 3], send)
+
+        self.assertEqual((result.sent, result.failed, result.retried), (2, 1, 0))
+        self.assertEqual(sorted(attempts), [1, 2, 3])
+        self.assertEqual(
+            sorted((telegram_id, success) for telegram_id, success, _ in self.results),
+            [(1, True), (2, False), (3, True)],
+        )
+
+    def test_endless_retry_after_stops_at_limit(self) -> None:
+        async def send(telegram_id):
+            raise TelegramRetryAfter(method=_METHOD, message="flood", retry_after=0)
+
+        result = self._run([1], send)
+
+        self.assertEqual(result.failed, 1)
+        self.assertEqual(self.results, [(1, False, "retry limit exceeded")])
+        self.assertEqual(result.retried, self.engine.max_retries + 6)
+
+    def test_cancel_skips_remaining_recipients(self) -> None:
+        cancel_event = asyncio.Event()
+
+        async def send(telegram_id):
+            if telegram_id == 3:
+                cancel_event.set()
+
+        result = self._run(range(1, 101), send, cancel_event=cancel_event)
+
+        self.assertTrue(result.cancelled)
+        self.assertLess(result.processed, 100)
+
+    def test_on_result_error_stops_sending(self) -> None:
+        sent_after_error = []
+        failed = []
+        consumed = []
+
+        async def recipients():
+            for telegram_id in range(1, 1001):
+                consumed.append(telegram_id)
+                yield telegram_id
+
+        async def send(telegram_id):
+            if failed:
+                sent_after_error.append(telegram_id)
+
+        async def on_result(telegram_id, success, error):
+            if telegram_id == 5:
+                failed.append(telegram_id)
+                raise RuntimeError("db is down")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.engine.run(recipients(), send, on_result=on_result))
+
+        self.assertEqual(sent_after_error, [])
+        self.assertLess(len(consumed), 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
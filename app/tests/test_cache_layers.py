@@ -0,0 +1,220 @@
+import os
+import asyncio
+import json
+import time
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("BOT_TOKEN", "test-token")
+os.environ.setdefault("DATABASE_MODE", "sqlite")
+os.environ.setdefault("ADMIN_IDS", "")
+
+from app.config import settings  # noqa: E402
+from app.utils import cache as cache_module  # noqa: E402
+from app.utils.cache import CacheService, LocalCache  # noqa: E402
+
+
+class _FakeRedis:
+    def __init__(self, data: dict) -> None:
+        self.data = {key: json.dumps(value) for key, value in data.items()}
+        self.published = []
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None, nx=False):
+        self.data[key] = value
+        return True
+
+    async def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    async def publish(self, channel, message):
+        self.published.append(json.loads(message))
+
+
+class LocalCacheTestCase(unittest.TestCase):
+    def test_expired_entry_is_dropped(self) -> None:
+        local = LocalCache()
+        local.set("key", "value", time.time() - 1)
+
+        self.assertIsNone(local.get("key"))
+        self.assertEqual(len(local), 0)
+
+    def test_least_recently_used_entry_is_evicted(self) -> None:
+        local = LocalCache(max_entries=2)
+        expires_at = time.time() + 60
+        local.set("a", 1, expires_at)
+        local.set("b", 2, expires_at)
+        local.get("a")
+        local.set("c", 3, expires_at)
+
+        self.assertIsNotNone(local.get("a"))
+        self.assertIsNone(local.get("b"))
+        self.assertIsNotNone(local.get("c"))
+
+    def test_source_expiry_defaults_to_local_expiry(self) -> None:
+        local = LocalCache()
+        expires_at = time.time() + 60
+        local.set("a", 1, expires_at, 0.5)
+        local.set("b", 2, expires_at, 0.5, expires_at + 600)
+
+        self.assertEqual(local.get("a")[3], expires_at)
+        self.assertEqual(local.get("b")[3], expires_at + 600)
+
+    def test_delete_pattern(self) -> None:
+        local = LocalCache()
+        expires_at = time.time() + 60
+        local.set("countries:1", 1, expires_at)
+        local.set("countries:2", 2, expires_at)
+        local.set("other", 3, expires_at)
+
+        self.assertEqual(local.delete_pattern("countries:*"), 2)
+        self.assertIsNotNone(local.get("other"))
+
+
+class GetOrSetTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = patch.multiple(settings, CACHE_LOCAL_TTL_SECONDS=30)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = CacheService()
+
+    def test_concurrent_misses_share_one_load(self) -> None:
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"value": len(calls)}
+
+        async def run():
+            return await asyncio.gather(
+                *(self.cache.get_or_set("key", loader, expire=60) for _ in range(5))
+            )
+
+        results = asyncio.run(run())
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"value": 1}] * 5)
+        self.assertEqual(self.cache.stats["coalesced"], 4)
+
+    def test_cancelled_loader_lets_waiter_load_again(self) -> None:
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        async def run():
+            first = asyncio.create_task(self.cache.get_or_set("key", loader, expire=60))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(self.cache.get_or_set("key", loader, expire=60))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+            return await second
+
+        self.assertEqual(asyncio.run(run()), 2)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.cache.get_stats()["inflight"], 0)
+
+    def test_loader_error_reaches_waiters_and_is_not_cached(self) -> None:
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def run():
+            return await asyncio.gather(
+                *(self.cache.get_or_set("key", loader, expire=60) for _ in range(2)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertIsNone(self.cache.local.get("key"))
+
+    def test_none_is_not_cached_with_zero_negative_expire(self) -> None:
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return None
+
+        async def run():
+            await self.cache.get_or_set("key", loader, expire=60, negative_expire=0)
+            await self.cache.get_or_set("key", loader, expire=60, negative_expire=0)
+
+        asyncio.run(run())
+        self.assertEqual(len(calls), 2)
+
+    def test_early_refresh_uses_source_expiry(self) -> None:
+        now = time.time()
+        # В L1 запись скоро вытесняется, но в Redis живёт ещё долго
+        self.cache.local.set("key", "cached", now + 1, 0.5, now + 3600)
+
+        async def loader():
+            raise AssertionError("loader must not be called")
+
+        with patch.object(cache_module.random, "random", return_value=1e-9):
+            value = asyncio.run(self.cache.get_or_set("key", loader, expire=3600))
+
+        self.assertEqual(value, "cached")
+        self.assertEqual(self.cache.stats["early_refreshes"], 0)
+
+    def test_early_refresh_near_source_expiry(self) -> None:
+        now = time.time()
+        self.cache.local.set("key", "stale", now + 1, 0.5, now + 1)
+
+        async def loader():
+            return "fresh"
+
+        with patch.object(cache_module.random, "random", return_value=1e-9):
+            value = asyncio.run(self.cache.get_or_set("key", loader, expire=60))
+
+        self.assertEqual(value, "fresh")
+        self.assertEqual(self.cache.stats["early_refreshes"], 1)
+        self.assertEqual(self.cache.local.get("key")[0], "fresh")
+
+
+class EnvelopeReadTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = CacheService()
+        self.cache.prefix = ""
+        self.cache.redis_client = _FakeRedis({
+            "wrapped": {"v": [1, 2], "e": time.time() + 60, "d": 0.1},
+            "plain": {"v": 1, "other": 2},
+        })
+        self.cache._connected = True
+
+    def test_get_unwraps_envelope(self) -> None:
+        self.assertEqual(asyncio.run(self.cache.get("wrapped")), [1, 2])
+        self.assertEqual(asyncio.run(self.cache.get("plain")), {"v": 1, "other": 2})
+
+    def test_get_many_unwraps_envelope(self) -> None:
+        result = asyncio.run(self.cache.get_many(["wrapped", "plain", "missing"]))
+
+        self.assertEqual(result, {"wrapped": [1, 2], "plain": {"v": 1, "other": 2}})
+
+    def test_only_invalidate_publishes(self) -> None:
+        redis_client = self.cache.redis_client
+
+        async def run():
+            await self.cache.set("plain", 1, 60)
+            await self.cache.delete("plain")
+            await self.cache.invalidate("wrapped")
+
+        asyncio.run(run())
+
+        self.assertEqual([message["keys"] for message in redis_client.published], [["wrapped"]])
+        self.assertNotIn("wrapped", redis_client.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
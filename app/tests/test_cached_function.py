@@ -0,0 +1,117 @@
+import os
+import asyncio
+import unittest
+from datetime import datetime
+from enum import Enum
+from unittest.mock import patch
+
+os.environ.setdefault("BOT_TOKEN", "test-token")
+os.environ.setdefault("DATABASE_MODE", "sqlite")
+os.environ.setdefault("ADMIN_IDS", "")
+
+from app.utils import cache as cache_module  # noqa: E402
+from app.utils.cache import CacheService, cached_function  # noqa: E402
+
+
+class _Period(Enum):
+    DAY = "day"
+
+
+class CachedFunctionTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = CacheService()
+        patcher = patch.object(cache_module, "cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = []
+
+    def _decorate(self, **options):
+        calls = self.calls
+
+        @cached_function("stats", expire=60, **options)
+        async def load(db, squad_uuid, period=_Period.DAY, ids=None):
+            calls.append((squad_uuid, period, ids))
+            return {"squad": squad_uuid, "calls": len(calls)}
+
+        return load
+
+    def test_key_ignores_session_and_applies_defaults(self) -> None:
+        load = self._decorate()
+
+        async def run():
+            first = await load(object(), "sq-1")
+            second = await load(object(), "sq-1", _Period.DAY)
+            third = await load(db=object(), squad_uuid="sq-2")
+            return first, second, third
+
+        first, second, third = asyncio.run(run())
+
+        self.assertEqual(first, second)
+        self.assertEqual(third["calls"], 2)
+        self.assertIsNotNone(self.cache.local.get("fn:stats:sq-1:day:None"))
+        self.assertIsNotNone(self.cache.local.get("fn:stats:sq-2:day:None"))
+
+    def test_key_parts_are_stable(self) -> None:
+        load = self._decorate()
+
+        async def run():
+            await load(None, "sq", ids={3, 1, 2})
+            await load(None, "sq", ids=frozenset({2, 3, 1}))
+            await load(None, datetime(2024, 1, 2, 3, 4, 5))
+
+        asyncio.run(run())
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertIsNotNone(self.cache.local.get("fn:stats:sq:day:[1,2,3]"))
+        self.assertIsNotNone(self.cache.local.get("fn:stats:2024-01-02T03:04:05:day:None"))
+
+    def test_tags_are_resolved_from_arguments(self) -> None:
+        load = self._decorate(tags=("statistics", "server_squad:{squad_uuid}"))
+
+        async def run():
+            await load(None, "sq-1")
+            await load(None, "sq-2")
+            dropped = await self.cache.invalidate_tags("server_squad:sq-1")
+            await load(None, "sq-1")
+            await load(None, "sq-2")
+            return dropped
+
+        dropped = asyncio.run(run())
+
+        self.assertEqual(dropped, 1)
+        self.assertEqual([call[0] for call in self.calls], ["sq-1", "sq-2", "sq-1"])
+
+    def test_invalidate_drops_single_key(self) -> None:
+        load = self._decorate()
+
+        async def run():
+            await load(None, "sq-1")
+            await load.invalidate(None, "sq-1")
+            await load(None, "sq-1")
+            await load.uncached(None, "sq-1")
+
+        asyncio.run(run())
+        self.assertEqual(len(self.calls), 3)
+
+    def test_tag_invalidation_during_load_discards_value(self) -> None:
+        calls = self.calls
+        cache = self.cache
+
+        @cached_function("stats", expire=60, tags=("statistics",))
+        async def load(db, value):
+            calls.append(value)
+            if len(calls) == 1:
+                await cache.invalidate_tags("statistics")
+            return len(calls)
+
+        async def run():
+            first = await load(None, "x")
+            second = await load(None, "x")
+            third = await load(None, "x")
+            return first, second, third
+
+        self.assertEqual(asyncio.run(run()), (1, 2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
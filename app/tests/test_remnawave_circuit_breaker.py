@@ -0,0 +1,179 @@
+import os
+import asyncio
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("BOT_TOKEN", "test-token")
+os.environ.setdefault("DATABASE_MODE", "sqlite")
+os.environ.setdefault("ADMIN_IDS", "")
+
+from app.config import settings  # noqa: E402
+from app.external.remnawave_api import (  # noqa: E402
+    CircuitBreaker,
+    CircuitState,
+    RemnaWaveAPI,
+    RemnaWaveAPIError,
+    RemnaWaveCircuitOpenError,
+)
+
+
+def _expire_open_state(breaker: CircuitBreaker) -> None:
+    breaker._opened_at -= breaker.recovery_timeout
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = patch.multiple(
+            settings,
+            REMNAWAVE_API_CIRCUIT_FAILURE_THRESHOLD=2,
+            REMNAWAVE_API_CIRCUIT_RECOVERY_SECONDS=30,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("test")
+
+    def test_full_recovery_cycle(self) -> None:
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitState.CLOSED)
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitState.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(self.breaker.total_rejected, 1)
+
+        _expire_open_state(self.breaker)
+        self.assertEqual(self.breaker.state, CircuitState.HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitState.CLOSED)
+        self.assertEqual(self.breaker.consecutive_failures, 0)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_probe_reopens(self) -> None:
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        _expire_open_state(self.breaker)
+
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitState.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+
+class CircuitBreakerRequestTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = patch.multiple(
+            settings,
+            REMNAWAVE_API_CIRCUIT_FAILURE_THRESHOLD=1,
+            REMNAWAVE_API_CIRCUIT_RECOVERY_SECONDS=30,
+            REMNAWAVE_API_RETRY_ATTEMPTS=2,
+            REMNAWAVE_API_RETRY_BACKOFF_SECONDS=0,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api = RemnaWaveAPI(f"http://panel-{id(self)}.test", "key")
+        self.api.session = object()
+        self.breaker = self.api.circuit_breaker
+
+    def _open_to_half_open(self) -> None:
+        self.breaker.record_failure()
+        _expire_open_state(self.breaker)
+        self.assertEqual(self.breaker.state, CircuitState.HALF_OPEN)
+
+    def test_cancelled_probe_releases_half_open_slot(self) -> None:
+        self._open_to_half_open()
+
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(3600)
+
+        async def run() -> None:
+            with patch.object(self.api, "_send_request", hang):
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.api._make_request("GET", "/api/users"), 0.01)
+
+        asyncio.run(run())
+
+        self.assertEqual(self.breaker.state, CircuitState.HALF_OPEN)
+        self.assertEqual(self.breaker.total_failures, 1)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_cancelled_requests_do_not_open_breaker(self) -> None:
+        started = []
+
+        async def hang(*args, **kwargs):
+            started.append(1)
+            await asyncio.sleep(3600)
+
+        async def run() -> None:
+            with patch.object(self.api, "_send_request", hang):
+                tasks = [
+                    asyncio.create_task(self.api._make_request("GET", "/api/users"))
+                    for _ in range(settings.REMNAWAVE_API_CIRCUIT_FAILURE_THRESHOLD + 4)
+                ]
+                while len(started) < len(tasks):
+                    await asyncio.sleep(0)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        with patch.multiple(settings, REMNAWAVE_API_CIRCUIT_FAILURE_THRESHOLD=5):
+            asyncio.run(run())
+
+            self.assertEqual(self.breaker.state, CircuitState.CLOSED)
+            self.assertEqual(self.breaker.consecutive_failures, 0)
+            self.assertEqual(self.breaker.total_failures, 0)
+
+    def test_unexpected_error_releases_half_open_slot(self) -> None:
+        self._open_to_half_open()
+
+        async def broken(*args, **kwargs):
+            raise AttributeError("'list' object has no attribute 'get'")
+
+        async def run() -> None:
+            with patch.object(self.api, "_send_request", broken):
+                with self.assertRaises(AttributeError):
+                    await self.api._make_request("GET", "/api/users")
+
+        asyncio.run(run())
+
+        _expire_open_state(self.breaker)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_retries_check_breaker_once_per_call(self) -> None:
+        calls = []
+
+        async def flaky(*args, **kwargs):
+            calls.append(1)
+            if len(calls) < 2:
+                raise RemnaWaveAPIError("Too many requests", 429)
+            return {"response": "ok"}
+
+        async def run() -> dict:
+            with patch.object(self.api, "_send_request", flaky):
+                return await self.api._make_request("GET", "/api/users")
+
+        self.assertEqual(asyncio.run(run()), {"response": "ok"})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.breaker.total_rejected, 0)
+        self.assertEqual(self.breaker.state, CircuitState.CLOSED)
+
+    def test_open_breaker_rejects_without_request(self) -> None:
+        self.breaker.record_failure()
+
+        async def unexpected(*args, **kwargs):
+            raise AssertionError("request must not be sent")
+
+        async def run() -> None:
+            with patch.object(self.api, "_send_request", unexpected):
+                with self.assertRaises(RemnaWaveCircuitOpenError):
+                    await self.api._make_request("GET", "/api/users")
+
+        asyncio.run(run())
+        self.assertEqual(self.breaker.total_rejected, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import unittest
+
+os.environ.setdefault("BOT_TOKEN", "test-token")
+os.environ.setdefault("DATABASE_MODE", "sqlite")
+os.environ.setdefault("ADMIN_IDS", "")
+
+from app.middlewares.throttling import SlidingWindowLimiter, ThrottleRule  # noqa: E402
+
+
+class SlidingWindowLimiterTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rule = ThrottleRule(limit=2, window=10.0)
+        self.limiter = SlidingWindowLimiter(max_window=10.0)
+
+    def test_limit_within_window(self) -> None:
+        self.assertTrue(self.limiter.hit("user", self.rule, now=100.0))
+        self.assertTrue(self.limiter.hit("user", self.rule, now=101.0))
+        self.assertFalse(self.limiter.hit("user", self.rule, now=102.0))
+
+    def test_window_slides(self) -> None:
+        self.limiter.hit("user", self.rule, now=100.0)
+        self.limiter.hit("user", self.rule, now=105.0)
+
+        self.assertFalse(self.limiter.hit("user", self.rule, now=109.9))
+        self.assertTrue(self.limiter.hit("user", self.rule, now=110.0))
+        self.assertFalse(self.limiter.hit("user", self.rule, now=114.0))
+        self.assertTrue(self.limiter.hit("user", self.rule, now=115.0))
+
+    def test_rejected_hit_does_not_extend_window(self) -> None:
+        self.limiter.hit("user", self.rule, now=100.0)
+        self.limiter.hit("user", self.rule, now=100.0)
+        for moment in (101.0, 105.0, 109.0):
+            self.assertFalse(self.limiter.hit("user", self.rule, now=moment))
+
+        self.assertTrue(self.limiter.hit("user", self.rule, now=110.0))
+
+    def test_keys_are_independent(self) -> None:
+        self.limiter.hit("first", self.rule, now=100.0)
+        self.limiter.hit("first", self.rule, now=100.0)
+
+        self.assertFalse(self.limiter.hit("first", self.rule, now=101.0))
+        self.assertTrue(self.limiter.hit("second", self.rule, now=101.0))
+
+    def test_idle_keys_expire(self) -> None:
+        self.limiter.hit("idle", self.rule, now=100.0)
+        self.limiter.hit("active", self.rule, now=105.0)
+        self.assertEqual(len(self.limiter), 2)
+
+        self.limiter.hit("active", self.rule, now=110.5)
+
+        self.assertEqual(len(self.limiter), 1)
+        self.assertNotIn("idle", self.limiter._events)
+
+    def test_expiry_stops_at_recent_key(self) -> None:
+        self.limiter.hit("old", self.rule, now=100.0)
+        self.limiter.hit("recent", self.rule, now=108.0)
+        self.limiter.hit("old", self.rule, now=109.0)
+
+        # "old" стал самым свежим ключом и не должен быть снят вместе с окном первого события
+        self.limiter.hit("other", self.rule, now=118.5)
+
+        self.assertEqual(set(self.limiter._events), {"old", "other"})
+
+
+if __name__ == "__main__":
+    unittest.main()
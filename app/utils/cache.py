@@ -1,6 +1,17 @@
+import asyncio
+import fnmatch
+import functools
+import hashlib
+import inspect
 import json
 import logging
-from typing import Any, Optional, Union
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
 from datetime import datetime, timedelta
 import redis.asyncio as redis
 
@@ -9,11 +20,113 @@ from app.config import settings
 logger = logging.getLogger(__name__)
 
 
+INVALIDATION_CHANNEL = "cache:invalidate"
+SCAN_BATCH_SIZE = 500
+UNLINK_CHUNK_SIZE = 100
+
+_INCREMENT_SCRIPT = """
+local current = redis.call('INCRBY', KEYS[1], ARGV[1])
+if tonumber(ARGV[2]) > 0 and redis.call('TTL', KEYS[1]) == -1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return current
+"""
+# Коэффициент вероятностного досрочного обновления (XFetch): чем больше, тем раньше
+EARLY_REFRESH_BETA = 1.0
+
+_MISSING = object()
+_ENVELOPE_FIELDS = frozenset(("v", "e", "d"))
+
+
+def _is_envelope(data: Any) -> bool:
+    return isinstance(data, dict) and data.keys() == _ENVELOPE_FIELDS
+
+
+def _unwrap_envelope(data: Any) -> Any:
+    return data["v"] if _is_envelope(data) else data
+
+
+class LocalCache:
+    """Ограниченный по размеру LRU в памяти процесса с TTL на каждую запись.
+
+    Запись хранит значение, момент вытеснения из памяти, время вычисления
+    (delta) и момент истечения исходного значения в Redis (source_expires_at).
+    Досрочное обновление решается только по source_expires_at: вытеснение
+    из L1 — обычный промах с переходом в L2.
+    """
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[Any, float, float, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float, float, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        expires_at: float,
+        delta: float = 0.0,
+        source_expires_at: Optional[float] = None,
+    ) -> None:
+        source_expires_at = expires_at if source_expires_at is None else source_expires_at
+        self._entries[key] = (value, expires_at, delta, source_expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> bool:
+        return self._entries.pop(key, None) is not None
+
+    def delete_pattern(self, pattern: str) -> int:
+        keys = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _should_refresh_early(expires_at: float, delta: float, now: Optional[float] = None) -> bool:
+    if delta <= 0:
+        return False
+    now = time.time() if now is None else now
+    return now - delta * EARLY_REFRESH_BETA * math.log(random.random() or 1e-12) >= expires_at
+
+
 class CacheService:
     
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
         self._connected = False
+        self.local = LocalCache(settings.CACHE_LOCAL_MAX_ENTRIES)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._local_tags: Dict[str, set] = {}
+        self._local_tag_generations: Dict[str, int] = {}
+        self._instance_id = uuid.uuid4().hex
+        self._listener_task: Optional[asyncio.Task] = None
+        self.prefix = (settings.CACHE_KEY_PREFIX or "").strip(":")
+        self.stats: Dict[str, int] = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "coalesced": 0,
+            "early_refreshes": 0,
+            "invalidations_received": 0,
+        }
     
     async def connect(self):
         try:
@@ -21,23 +134,311 @@ class CacheService:
             await self.redis_client.ping()
             self._connected = True
             logger.info("✅ Подключение к Redis кешу установлено")
+            if not self._listener_task or self._listener_task.done():
+                self._listener_task = asyncio.create_task(self._listen_invalidations())
         except Exception as e:
             logger.warning(f"⚠️ Не удалось подключиться к Redis: {e}")
             self._connected = False
     
+    @property
+    def is_connected(self) -> bool:
+        return self._connected and self.redis_client is not None
+
     async def disconnect(self):
+        if self._listener_task and not self._listener_task.done():
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+        self._listener_task = None
         if self.redis_client:
             await self.redis_client.close()
             self._connected = False
+
+    def _k(self, key: str) -> str:
+        return f"{self.prefix}:{key}" if self.prefix else key
+
+    def _strip_prefix(self, key: str) -> str:
+        if self.prefix and key.startswith(self.prefix + ":"):
+            return key[len(self.prefix) + 1:]
+        return key
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "local_entries": len(self.local), "inflight": len(self._inflight)}
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        expire: Union[int, timedelta] = 300,
+        local_ttl: Optional[int] = None,
+        negative_expire: Optional[int] = None,
+        tags: Iterable[str] = (),
+    ) -> Any:
+        """Возвращает значение из L1 (память процесса) или L2 (Redis), иначе вызывает loader.
+
+        negative_expire задаёт TTL для результата None (0 — не кешировать None).
+        tags связывает записанное значение с тегами для invalidate_tags.
+
+        Одновременные промахи по одному ключу ждут один вызов loader. Незадолго
+        до истечения значение с некоторой вероятностью обновляется заранее
+        (XFetch), при этом ожидающие получают текущее значение. Ключи,
+        записанные этим методом, не следует перезаписывать через set, а
+        сбрасывать нужно через invalidate, delete_pattern или invalidate_tags:
+        только они оповещают L1 остальных процессов.
+        """
+
+        if isinstance(expire, timedelta):
+            expire = int(expire.total_seconds())
+        local_ttl = settings.CACHE_LOCAL_TTL_SECONDS if local_ttl is None else local_ttl
+        tags = tuple(tags)
+
+        now = time.time()
+        entry = self.local.get(key)
+        if entry is not None:
+            value, _, delta, source_expires_at = entry
+            if not _should_refresh_early(source_expires_at, delta, now):
+                self.stats["local_hits"] += 1
+                return value
+            return await self._refresh(key, loader, expire, local_ttl, negative_expire, tags, stale=value)
+
+        envelope = await self._get_envelope(key)
+        if envelope is not None:
+            value, expires_at, delta = envelope
+            self.local.set(key, value, min(expires_at, now + local_ttl), delta, expires_at)
+            if not _should_refresh_early(expires_at, delta, now):
+                self.stats["redis_hits"] += 1
+                return value
+            return await self._refresh(key, loader, expire, local_ttl, negative_expire, tags, stale=value)
+
+        self.stats["misses"] += 1
+        return await self._refresh(key, loader, expire, local_ttl, negative_expire, tags)
+
+    async def _refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        expire: int,
+        local_ttl: int,
+        negative_expire: Optional[int] = None,
+        tags: Tuple[str, ...] = (),
+        stale: Any = _MISSING,
+    ) -> Any:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            if stale is not _MISSING:
+                return stale
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # Загрузка отменена вместе с вызвавшей её задачей — пробуем сами
+                return await self._refresh(key, loader, expire, local_ttl, negative_expire, tags)
+
+        if stale is not _MISSING:
+            self.stats["early_refreshes"] += 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            generations = await self._tag_generations(tags) if tags else None
+            started = time.monotonic()
+            value = await loader()
+            delta = time.monotonic() - started
+            self.stats["loads"] += 1
+
+            ttl = negative_expire if value is None and negative_expire is not None else expire
+            if ttl > 0:
+                expires_at = time.time() + ttl
+                self.local.set(key, value, min(expires_at, time.time() + local_ttl), delta, expires_at)
+                await self._set_envelope(key, value, ttl, expires_at, delta)
+                if tags:
+                    await self.tag_key(key, tags, ttl)
+                    # Теги сброшены во время загрузки: значение могло устареть
+                    if await self._tag_generations(tags) != generations:
+                        await self.invalidate(key)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            if not future.done():
+                future.set_exception(error)
+                # Исключение забирается здесь, чтобы не было предупреждения, если никто не ждал
+                future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def tag_key(self, key: str, tags: Iterable[str], expire: int) -> None:
+        """Связывает ключ с тегами, чтобы сбросить его через invalidate_tags."""
+
+        tags = list(tags)
+        if not tags:
+            return
+        for tag in tags:
+            self._local_tags.setdefault(tag, set()).add(key)
+        if not self._connected:
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    tag_set = self._k(cache_key("cache_tag", tag))
+                    pipe.sadd(tag_set, key)
+                    pipe.expire(tag_set, max(expire, 60))
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Ошибка записи тегов кеша для {key}: {e}")
+
+    async def _tag_generations(self, tags: Iterable[str]) -> Tuple[Any, ...]:
+        """Текущие поколения тегов: меняются при каждом invalidate_tags."""
+
+        tags = list(tags)
+        local = tuple(self._local_tag_generations.get(tag, 0) for tag in tags)
+        if not self._connected:
+            return local
+        try:
+            remote = await self.redis_client.mget(
+                [self._k(cache_key("cache_tag_gen", tag)) for tag in tags]
+            )
+            return local + tuple(remote)
+        except Exception as e:
+            logger.error(f"Ошибка чтения поколений тегов кеша {tags}: {e}")
+            return local
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Удаляет все ключи, связанные с тегами, во всех процессах.
+
+        Поколение тега увеличивается до удаления ключей, поэтому загрузка,
+        начатая до сброса, не оставит в кеше устаревшее значение.
+        """
+
+        for tag in tags:
+            self._local_tag_generations[tag] = self._local_tag_generations.get(tag, 0) + 1
+
+        keys = set()
+        for tag in tags:
+            keys.update(self._local_tags.pop(tag, ()))
+
+        if self._connected:
+            try:
+                tag_sets = [self._k(cache_key("cache_tag", tag)) for tag in tags]
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for tag in tags:
+                        pipe.incr(self._k(cache_key("cache_tag_gen", tag)))
+                    await pipe.execute()
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for tag_set in tag_sets:
+                        pipe.smembers(tag_set)
+                    members = await pipe.execute()
+                for tag_keys in members:
+                    keys.update(
+                        member.decode() if isinstance(member, bytes) else member
+                        for member in tag_keys or ()
+                    )
+                await self.redis_client.delete(*tag_sets, *(self._k(key) for key in keys))
+            except Exception as e:
+                logger.error(f"Ошибка сброса тегов кеша {tags}: {e}")
+
+        self._invalidate_local(keys)
+        if keys:
+            await self._publish_invalidation(keys=keys)
+        return len(keys)
+
+    async def _get_envelope(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        if not self._connected:
+            return None
+        try:
+            raw = await self.redis_client.get(self._k(key))
+            if not raw:
+                return None
+            data = json.loads(raw)
+            if not _is_envelope(data):
+                return None
+            return data["v"], float(data.get("e", 0)), float(data.get("d", 0))
+        except Exception as e:
+            logger.error(f"Ошибка получения из кеша {key}: {e}")
+            return None
+
+    async def _set_envelope(self, key: str, value: Any, expire: int, expires_at: float, delta: float) -> None:
+        if not self._connected:
+            return
+        try:
+            payload = json.dumps({"v": value, "e": expires_at, "d": round(delta, 4)}, default=str)
+            await self.redis_client.set(self._k(key), payload, ex=expire)
+            await self._publish_invalidation(keys=[key])
+        except Exception as e:
+            logger.error(f"Ошибка записи в кеш {key}: {e}")
+
+    async def _publish_invalidation(
+        self,
+        keys: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+    ) -> None:
+        if not self._connected:
+            return
+        message = {"source": self._instance_id}
+        if keys is not None:
+            message["keys"] = list(keys)
+        if pattern is not None:
+            message["pattern"] = pattern
+        try:
+            await self.redis_client.publish(INVALIDATION_CHANNEL, json.dumps(message))
+        except Exception as e:
+            logger.debug(f"Не удалось отправить инвалидацию кеша: {e}")
+
+    def _invalidate_local(self, keys: Optional[Iterable[str]] = None, pattern: Optional[str] = None) -> None:
+        for key in keys or ():
+            self.local.delete(key)
+        if pattern is not None:
+            self.local.delete_pattern(pattern)
+
+    async def _listen_invalidations(self) -> None:
+        while self._connected:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        data = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    if data.get("source") == self._instance_id:
+                        continue
+                    self.stats["invalidations_received"] += 1
+                    self._invalidate_local(data.get("keys"), data.get("pattern"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Подписка на инвалидацию кеша прервана: {e}")
+                # Пока подписки нет, L1 мог пропустить инвалидации
+                self.local.clear()
+                await asyncio.sleep(5)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
     
     async def get(self, key: str) -> Optional[Any]:
+        entry = self.local.get(key)
+        if entry is not None:
+            self.stats["local_hits"] += 1
+            return entry[0]
+
         if not self._connected:
             return None
         
         try:
-            value = await self.redis_client.get(key)
+            value = await self.redis_client.get(self._k(key))
             if value:
-                return json.loads(value)
+                return _unwrap_envelope(json.loads(value))
             return None
         except Exception as e:
             logger.error(f"Ошибка получения из кеша {key}: {e}")
@@ -58,44 +459,141 @@ class CacheService:
             if isinstance(expire, timedelta):
                 expire = int(expire.total_seconds())
             
-            await self.redis_client.set(key, serialized_value, ex=expire)
+            self.local.delete(key)
+            await self.redis_client.set(self._k(key), serialized_value, ex=expire)
             return True
         except Exception as e:
             logger.error(f"Ошибка записи в кеш {key}: {e}")
             return False
     
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Читает несколько ключей за один MGET; в ответе только найденные ключи."""
+
+        result: Dict[str, Any] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            entry = self.local.get(key)
+            if entry is not None:
+                self.stats["local_hits"] += 1
+                result[key] = entry[0]
+            else:
+                missing.append(key)
+
+        if not missing or not self._connected:
+            return result
+
+        try:
+            values = await self.redis_client.mget([self._k(key) for key in missing])
+            for key, value in zip(missing, values):
+                if value:
+                    result[key] = _unwrap_envelope(json.loads(value))
+        except Exception as e:
+            logger.error(f"Ошибка пакетного получения из кеша ({len(missing)} ключей): {e}")
+        return result
+
+    async def set_many(
+        self,
+        mapping: Dict[str, Any],
+        expire: Union[int, timedelta] = None
+    ) -> bool:
+        """Записывает несколько ключей с общим TTL одним pipeline."""
+        if not self._connected or not mapping:
+            return False
+
+        try:
+            if isinstance(expire, timedelta):
+                expire = int(expire.total_seconds())
+
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    self.local.delete(key)
+                    pipe.set(self._k(key), json.dumps(value, default=str), ex=expire)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка пакетной записи в кеш ({len(mapping)} ключей): {e}")
+            return False
+
+    async def set_if_absent(
+        self,
+        key: str,
+        value: Any,
+        expire: Union[int, timedelta] = None
+    ) -> Optional[bool]:
+        """SET NX: True — ключ записан, False — уже существовал, None — Redis недоступен."""
+        if not self._connected:
+            return None
+
+        try:
+            if isinstance(expire, timedelta):
+                expire = int(expire.total_seconds())
+
+            result = await self.redis_client.set(
+                self._k(key), json.dumps(value, default=str), ex=expire, nx=True
+            )
+            return bool(result)
+        except Exception as e:
+            logger.error(f"Ошибка условной записи в кеш {key}: {e}")
+            return None
+
     async def delete(self, key: str) -> bool:
+        local_deleted = self.local.delete(key)
         if not self._connected:
-            return False
+            return local_deleted
 
         try:
-            deleted = await self.redis_client.delete(key)
-            return deleted > 0
+            deleted = await self.redis_client.delete(self._k(key))
+            return deleted > 0 or local_deleted
         except Exception as e:
             logger.error(f"Ошибка удаления из кеша {key}: {e}")
             return False
 
+    async def invalidate(self, key: str) -> bool:
+        """Удаляет ключ, записанный get_or_set, в Redis и в L1 всех процессов."""
+
+        deleted = await self.delete(key)
+        await self._publish_invalidation(keys=[key])
+        return deleted
+
     async def delete_pattern(self, pattern: str) -> int:
+        local_deleted = self.local.delete_pattern(pattern)
         if not self._connected:
-            return 0
+            return local_deleted
 
         try:
-            keys = await self.redis_client.keys(pattern)
-            if not keys:
-                return 0
-
-            deleted = await self.redis_client.delete(*keys)
-            return int(deleted)
+            await self._publish_invalidation(pattern=pattern)
+            return await self._unlink_matching(self._k(pattern))
         except Exception as e:
             logger.error(f"Ошибка удаления ключей по шаблону {pattern}: {e}")
             return 0
+
+    async def _unlink_matching(self, pattern: str) -> int:
+        """Удаляет ключи по шаблону через SCAN и UNLINK пачками, не блокируя Redis."""
+
+        deleted = 0
+        batch = []
+        async for key in self.redis_client.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+            batch.append(key)
+            if len(batch) >= SCAN_BATCH_SIZE:
+                deleted += await self._unlink_batch(batch)
+                batch = []
+        if batch:
+            deleted += await self._unlink_batch(batch)
+        return deleted
+
+    async def _unlink_batch(self, keys: list) -> int:
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for start in range(0, len(keys), UNLINK_CHUNK_SIZE):
+                pipe.unlink(*keys[start:start + UNLINK_CHUNK_SIZE])
+            results = await pipe.execute()
+        return sum(int(result or 0) for result in results)
     
     async def exists(self, key: str) -> bool:
         if not self._connected:
             return False
         
         try:
-            return await self.redis_client.exists(key)
+            return await self.redis_client.exists(self._k(key))
         except Exception as e:
             logger.error(f"Ошибка проверки существования в кеше {key}: {e}")
             return False
@@ -105,7 +603,7 @@ class CacheService:
             return False
         
         try:
-            return await self.redis_client.expire(key, seconds)
+            return await self.redis_client.expire(self._k(key), seconds)
         except Exception as e:
             logger.error(f"Ошибка установки TTL для {key}: {e}")
             return False
@@ -115,30 +613,44 @@ class CacheService:
             return []
         
         try:
-            keys = await self.redis_client.keys(pattern)
-            return [key.decode() if isinstance(key, bytes) else key for key in keys]
+            keys = []
+            async for key in self.redis_client.scan_iter(match=self._k(pattern), count=SCAN_BATCH_SIZE):
+                keys.append(self._strip_prefix(key.decode() if isinstance(key, bytes) else key))
+            return keys
         except Exception as e:
             logger.error(f"Ошибка получения ключей по паттерну {pattern}: {e}")
             return []
     
     async def flush_all(self) -> bool:
+        """Удаляет все ключи кеша (с префиксом CACHE_KEY_PREFIX), не трогая FSM и прочие данные."""
         if not self._connected:
             return False
         
+        if not self.prefix:
+            logger.warning("⚠️ CACHE_KEY_PREFIX не задан, очистка кеша в Redis пропущена")
+            return False
+
+        self.local.clear()
+        self._local_tags.clear()
         try:
-            await self.redis_client.flushall()
-            logger.info("🗑️ Кеш полностью очищен")
+            deleted = await self._unlink_matching(self._k("*"))
+            await self._publish_invalidation(pattern="*")
+            logger.info(f"🗑️ Кеш очищен, удалено ключей: {deleted}")
             return True
         except Exception as e:
             logger.error(f"Ошибка очистки кеша: {e}")
             return False
     
-    async def increment(self, key: str, amount: int = 1) -> Optional[int]:
+    async def increment(self, key: str, amount: int = 1, expire: int = None) -> Optional[int]:
+        """INCRBY; с expire счётчик получает TTL при создании в том же атомарном вызове."""
         if not self._connected:
             return None
         
+        self.local.delete(key)
         try:
-            return await self.redis_client.incrby(key, amount)
+            if expire:
+                return int(await self.redis_client.eval(_INCREMENT_SCRIPT, 1, self._k(key), amount, int(expire)))
+            return await self.redis_client.incrby(self._k(key), amount)
         except Exception as e:
             logger.error(f"Ошибка инкремента {key}: {e}")
             return None
@@ -148,9 +660,9 @@ class CacheService:
             return False
         
         try:
-            await self.redis_client.hset(name, mapping=mapping)
+            await self.redis_client.hset(self._k(name), mapping=mapping)
             if expire:
-                await self.redis_client.expire(name, expire)
+                await self.redis_client.expire(self._k(name), expire)
             return True
         except Exception as e:
             logger.error(f"Ошибка записи хеша {name}: {e}")
@@ -162,10 +674,10 @@ class CacheService:
         
         try:
             if key:
-                value = await self.redis_client.hget(name, key)
+                value = await self.redis_client.hget(self._k(name), key)
                 return value.decode() if value else None
             else:
-                hash_data = await self.redis_client.hgetall(name)
+                hash_data = await self.redis_client.hgetall(self._k(name))
                 return {k.decode(): v.decode() for k, v in hash_data.items()}
         except Exception as e:
             logger.error(f"Ошибка получения хеша {name}: {e}")
@@ -179,18 +691,73 @@ def cache_key(*parts) -> str:
     return ":".join(str(part) for part in parts)
 
 
-async def cached_function(key: str, expire: int = 300):
+def _key_part(value: Any) -> str:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return str(value)
+    if isinstance(value, Enum):
+        return str(value.value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=str) if isinstance(value, (set, frozenset)) else value
+        return "[" + ",".join(_key_part(item) for item in items) + "]"
+    return hashlib.sha1(repr(value).encode()).hexdigest()[:16]
+
+
+def cached_function(
+    namespace: str,
+    expire: int = 300,
+    *,
+    negative_expire: Optional[int] = 60,
+    tags: Iterable[str] = (),
+    ignore_args: Iterable[str] = ("db",),
+):
+    """Кеширует результат асинхронной функции по её аргументам.
+
+    Ключ строится из namespace и значений аргументов (кроме ignore_args,
+    по умолчанию сессии БД). Результат должен сериализоваться в JSON.
+    None кешируется на negative_expire секунд (0 — не кешируется).
+    Теги могут ссылаться на аргументы, например "server_squad:{squad_uuid}",
+    и сбрасываются через cache.invalidate_tags. У обёртки есть
+    invalidate(*args, **kwargs) для сброса одного ключа и uncached для
+    вызова без кеша. Значение из памяти процесса отдаётся без копирования,
+    изменять его нельзя.
+    """
+
+    tag_templates = tuple(tags)
+    ignored = set(ignore_args)
+
     def decorator(func):
+        signature = inspect.signature(func)
+
+        def resolve(*args, **kwargs) -> Tuple[str, list]:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {
+                name: value for name, value in bound.arguments.items() if name not in ignored
+            }
+            key = cache_key("fn", namespace, *(_key_part(value) for value in arguments.values()))
+            return key, [template.format(**arguments) for template in tag_templates]
+
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            cache_result = await cache.get(key)
-            if cache_result is not None:
-                return cache_result
-            
-            result = await func(*args, **kwargs)
-            await cache.set(key, result, expire)
-            return result
-        
+            key, resolved_tags = resolve(*args, **kwargs)
+            return await cache.get_or_set(
+                key,
+                lambda: func(*args, **kwargs),
+                expire=expire,
+                negative_expire=negative_expire,
+                tags=resolved_tags,
+            )
+
+        async def invalidate(*args, **kwargs) -> bool:
+            key, _ = resolve(*args, **kwargs)
+            return await cache.invalidate(key)
+
+        wrapper.invalidate = invalidate
+        wrapper.uncached = func
         return wrapper
+
     return decorator
 
 
@@ -266,17 +833,8 @@ class RateLimitCache:
     @staticmethod
     async def is_rate_limited(user_id: int, action: str, limit: int, window: int) -> bool:
         key = cache_key("rate_limit", user_id, action)
-        current = await cache.get(key)
-        
-        if current is None:
-            await cache.set(key, 1, window)
-            return False
-        
-        if current >= limit:
-            return True
-        
-        await cache.increment(key)
-        return False
+        current = await cache.increment(key, expire=window)
+        return current is not None and current > limit
     
     @staticmethod
     async def reset_rate_limit(user_id: int, action: str) -> bool:
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar, Union
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, Message
+
+from app.config import settings
+from app.utils.cache import cache, cache_key
+
+
+logger = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+PhotoMedia = Union[str, FSInputFile]
+
+FILE_ID_TTL = 30 * 24 * 3600
+_STALE_FILE_ID_MARKERS = (
+    "wrong file identifier",
+    "wrong remote file",
+    "file_reference",
+    "file reference",
+)
+
+
+def is_stale_file_id_error(error: Exception) -> bool:
+    if not isinstance(error, TelegramBadRequest):
+        return False
+    description = str(error).lower()
+    return any(marker in description for marker in _STALE_FILE_ID_MARKERS)
+
+
+class MediaRegistry:
+    """Хранит file_id загруженных в Telegram статических картинок.
+
+    Файл загружается один раз, полученный file_id сохраняется в памяти и в
+    Redis по хешу содержимого и id бота, дальше отправляется только file_id.
+    При смене файла меняется хеш, и картинка загружается заново.
+    """
+
+    def __init__(self) -> None:
+        self._file_ids: Dict[str, str] = {}
+        self._digests: Dict[str, Tuple[float, int, str]] = {}
+
+    async def get_photo(self, path: Path) -> PhotoMedia:
+        key = self._key(path)
+        if key is None:
+            return FSInputFile(path)
+
+        file_id = self._file_ids.get(key)
+        if file_id:
+            return file_id
+
+        file_id = await cache.get(key)
+        if file_id:
+            self._file_ids[key] = file_id
+            return file_id
+
+        return FSInputFile(path)
+
+    async def remember(self, path: Path, sent: Any) -> None:
+        file_id = self._extract_file_id(sent)
+        key = self._key(path)
+        if not file_id or key is None:
+            return
+
+        self._file_ids[key] = file_id
+        await cache.set(key, file_id, FILE_ID_TTL)
+        logger.debug("🖼️ Сохранен file_id для %s", path)
+
+    async def forget(self, path: Path) -> None:
+        key = self._key(path)
+        if key is None:
+            return
+        self._file_ids.pop(key, None)
+        await cache.delete(key)
+
+    async def send_cached(self, path: Path, send: Callable[[PhotoMedia], Awaitable[T]]) -> T:
+        """Вызывает send с file_id (или файлом, если file_id ещё нет) и запоминает результат.
+
+        Если Telegram отклонил сохранённый file_id, он забывается и файл
+        загружается заново.
+        """
+
+        media = await self.get_photo(path)
+        try:
+            result = await send(media)
+        except TelegramBadRequest as error:
+            if not isinstance(media, str) or not is_stale_file_id_error(error):
+                raise
+            logger.warning("🖼️ Сохраненный file_id для %s отклонен Telegram: %s", path, error)
+            await self.forget(path)
+            media = FSInputFile(path)
+            result = await send(media)
+
+        if not isinstance(media, str):
+            await self.remember(path, result)
+        return result
+
+    def _key(self, path: Path) -> Optional[str]:
+        digest = self._digest(path)
+        if digest is None:
+            return None
+        bot_id = settings.BOT_TOKEN.split(":", 1)[0]
+        return cache_key("media_file_id", bot_id, digest)
+
+    def _digest(self, path: Path) -> Optional[str]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+
+        cache_entry = self._digests.get(str(path))
+        if cache_entry and cache_entry[0] == stat.st_mtime and cache_entry[1] == stat.st_size:
+            return cache_entry[2]
+
+        try:
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        except OSError:
+            return None
+
+        self._digests[str(path)] = (stat.st_mtime, stat.st_size, digest)
+        return digest
+
+    @staticmethod
+    def _extract_file_id(sent: Any) -> Optional[str]:
+        if isinstance(sent, Message) and sent.photo:
+            return sent.photo[-1].file_id
+        return None
+
+
+media_registry = MediaRegistry()
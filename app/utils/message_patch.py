@@ -2,10 +2,11 @@ from pathlib import Path
 from typing import Any, Dict
 
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.types import FSInputFile, InputMediaPhoto, Message
+from aiogram.types import InputMediaPhoto, Message
 
 from app.config import settings
 from app.localization.texts import get_texts
+from app.utils.media_registry import media_registry
 
 LOGO_PATH = Path(settings.LOGO_FILE)
 _PRIVACY_RESTRICTED_CODE = "BUTTON_USER_PRIVACY_RESTRICTED"
@@ -69,6 +70,10 @@ def prepare_privacy_safe_kwargs(kwargs: Dict[str, Any] | None = None) -> Dict[st
     return safe_kwargs
 
 
+def is_message_not_modified_error(error: Exception) -> bool:
+    return isinstance(error, TelegramBadRequest) and "message is not modified" in str(error).lower()
+
+
 def is_privacy_restricted_error(error: Exception) -> bool:
     if not isinstance(error, TelegramBadRequest):
         return False
@@ -93,7 +98,10 @@ async def _answer_with_photo(self: Message, text: str = None, **kwargs):
     if LOGO_PATH.exists():
         try:
             # Отправляем caption как есть; при ошибке парсинга ниже сработает фоллбек
-            return await self.answer_photo(FSInputFile(LOGO_PATH), caption=text, **kwargs)
+            return await media_registry.send_cached(
+                LOGO_PATH,
+                lambda photo: self.answer_photo(photo, caption=text, **kwargs),
+            )
         except TelegramBadRequest as error:
             if is_privacy_restricted_error(error):
                 fallback_text = append_privacy_hint(text, language)
@@ -123,23 +131,26 @@ async def _edit_with_photo(self: Message, text: str, **kwargs):
         except Exception:
             pass
         # Всегда используем логотип если включен режим логотипа,
-        # кроме специальных случаев (QR сообщения)
-        if settings.ENABLE_LOGO_MODE and LOGO_PATH.exists() and not is_qr_message(self):
-            media = FSInputFile(LOGO_PATH)
-        elif is_qr_message(self) and LOGO_PATH.exists():
-            media = FSInputFile(LOGO_PATH)
-        else:
-            media = self.photo[-1].file_id
-        media_kwargs = {"media": media, "caption": text}
+        # в том числе для QR сообщений
+        use_logo = LOGO_PATH.exists()
+        media_kwargs = {"caption": text}
         edit_kwargs = dict(kwargs)
         if "parse_mode" in edit_kwargs:
             _pm = edit_kwargs.pop("parse_mode")
             media_kwargs["parse_mode"] = _pm if _pm is not None else "HTML"
         else:
             media_kwargs["parse_mode"] = "HTML"
+
+        async def edit_photo(media):
+            return await self.edit_media(InputMediaPhoto(media=media, **media_kwargs), **edit_kwargs)
+
         try:
-            return await self.edit_media(InputMediaPhoto(**media_kwargs), **edit_kwargs)
+            if use_logo:
+                return await media_registry.send_cached(LOGO_PATH, edit_photo)
+            return await edit_photo(self.photo[-1].file_id)
         except TelegramBadRequest as error:
+            if is_message_not_modified_error(error):
+                return self
             if is_privacy_restricted_error(error):
                 fallback_text = append_privacy_hint(text, language)
                 safe_kwargs = prepare_privacy_safe_kwargs(kwargs)
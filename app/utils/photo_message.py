@@ -3,9 +3,11 @@ from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import FSInputFile, InputMediaPhoto
 
 from app.config import settings
+from .media_registry import media_registry
 from .message_patch import (
     LOGO_PATH,
     append_privacy_hint,
+    is_message_not_modified_error,
     is_privacy_restricted_error,
     is_qr_message,
     prepare_privacy_safe_kwargs,
@@ -99,12 +101,21 @@ async def edit_or_answer_photo(
         return
 
     media = _resolve_media(callback.message)
-    try:
-        await callback.message.edit_media(
-            InputMediaPhoto(media=media, caption=caption, parse_mode=(parse_mode or "HTML")),
+
+    async def edit_photo(photo):
+        return await callback.message.edit_media(
+            InputMediaPhoto(media=photo, caption=caption, parse_mode=(parse_mode or "HTML")),
             reply_markup=keyboard,
         )
+
+    try:
+        if isinstance(media, FSInputFile):
+            await media_registry.send_cached(LOGO_PATH, edit_photo)
+        else:
+            await edit_photo(media)
     except TelegramBadRequest as error:
+        if is_message_not_modified_error(error):
+            return
         if is_privacy_restricted_error(error):
             try:
                 await callback.message.delete()
@@ -119,11 +130,14 @@ async def edit_or_answer_photo(
             pass
         try:
             # Отправим как фото с логотипом
-            await callback.message.answer_photo(
-                photo=media if isinstance(media, FSInputFile) else FSInputFile(LOGO_PATH),
-                caption=caption,
-                reply_markup=keyboard,
-                parse_mode=resolved_parse_mode,
+            await media_registry.send_cached(
+                LOGO_PATH,
+                lambda photo: callback.message.answer_photo(
+                    photo=photo,
+                    caption=caption,
+                    reply_markup=keyboard,
+                    parse_mode=resolved_parse_mode,
+                ),
             )
         except TelegramBadRequest as photo_error:
             await _answer_text(callback, caption, keyboard, resolved_parse_mode, photo_error)
@@ -72,6 +72,7 @@ async def create_broadcast(
         media_type=media_payload.type if media_payload else None,
         media_file_id=media_payload.file_id if media_payload else None,
         media_caption=media_payload.caption if media_payload else None,
+        selected_buttons=list(payload.selected_buttons or []),
         total_count=0,
         sent_count=0,
         failed_count=0,
@@ -3,10 +3,11 @@ from __future__ import annotations
 from fastapi import APIRouter, Security
 
 from app.config import settings
+from app.database.database import get_pool_status
 from app.services.version_service import version_service
 
 from ..dependencies import require_api_token
-from ..schemas.health import HealthCheckResponse, HealthFeatureFlags
+from ..schemas.health import DatabasePoolStatus, HealthCheckResponse, HealthFeatureFlags
 
 router = APIRouter()
 
@@ -23,4 +24,5 @@ async def health_check(_: object = Security(require_api_token)) -> HealthCheckRe
             reporting=True,
             webhooks=bool(settings.WEBHOOK_URL),
         ),
+        database_pool=DatabasePoolStatus(**get_pool_status()),
     )
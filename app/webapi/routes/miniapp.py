@@ -8,7 +8,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.database.crud.server_squad import get_server_squad_by_uuid
+from app.database.crud.server_squad import get_server_squad_info
 from app.database.crud.user import get_user_by_telegram_id
 from app.database.models import Subscription, Transaction, User
 from app.services.remnawave_service import (
@@ -110,9 +110,9 @@ async def _resolve_connected_servers(
     for squad_uuid in squad_uuids:
         if squad_uuid in resolved:
             continue
-        server = await get_server_squad_by_uuid(db, squad_uuid)
-        if server and server.display_name:
-            resolved[squad_uuid] = server.display_name
+        server = await get_server_squad_info(db, squad_uuid)
+        if server and server["display_name"]:
+            resolved[squad_uuid] = server["display_name"]
         else:
             missing.append(squad_uuid)
 
@@ -382,7 +382,7 @@ async def sync_from_panel(
     _ensure_service_configured(service)
 
     try:
-        stats = await service.sync_users_from_panel(db, payload.mode)
+        stats = await service.sync_users_from_panel(db, payload.mode, incremental=payload.incremental)
         detail = "Синхронизация из панели выполнена"
         return RemnaWaveGenericSyncResponse(success=True, detail=detail, data=stats)
     except Exception as exc:  # pragma: no cover - точный тип зависит от импорта
@@ -393,26 +393,29 @@ async def sync_from_panel(
 
 @router.post("/sync/to-panel", response_model=RemnaWaveGenericSyncResponse)
 async def sync_to_panel(
+    force: bool = Query(False),
+    resume: bool = Query(True),
     _: Any = Security(require_api_token),
     db: AsyncSession = Depends(get_db_session),
 ) -> RemnaWaveGenericSyncResponse:
     service = _get_service()
     _ensure_service_configured(service)
 
-    stats = await service.sync_users_to_panel(db)
+    stats = await service.sync_users_to_panel(db, resume=resume, force=force)
     detail = "Синхронизация в панель выполнена"
     return RemnaWaveGenericSyncResponse(success=True, detail=detail, data=stats)
 
 
 @router.post("/sync/subscriptions/validate", response_model=RemnaWaveGenericSyncResponse)
 async def validate_and_fix_subscriptions(
+    incremental: bool = Query(False),
     _: Any = Security(require_api_token),
     db: AsyncSession = Depends(get_db_session),
 ) -> RemnaWaveGenericSyncResponse:
     service = _get_service()
     _ensure_service_configured(service)
 
-    stats = await service.validate_and_fix_subscriptions(db)
+    stats = await service.validate_and_fix_subscriptions(db, incremental=incremental)
     detail = "Подписки проверены"
     return RemnaWaveGenericSyncResponse(success=True, detail=detail, data=stats)
 
@@ -430,15 +433,30 @@ async def cleanup_orphaned_subscriptions(
     return RemnaWaveGenericSyncResponse(success=True, detail=detail, data=stats)
 
 
+@router.post("/sync/subscriptions/reconcile", response_model=RemnaWaveGenericSyncResponse)
+async def reconcile_subscriptions_with_panel(
+    incremental: bool = Query(False),
+    _: Any = Security(require_api_token),
+    db: AsyncSession = Depends(get_db_session),
+) -> RemnaWaveGenericSyncResponse:
+    service = _get_service()
+    _ensure_service_configured(service)
+
+    stats = await service.reconcile_subscriptions_with_panel(db, incremental=incremental)
+    detail = "Подписки сверены с панелью"
+    return RemnaWaveGenericSyncResponse(success=True, detail=detail, data=stats)
+
+
 @router.post("/sync/subscriptions/statuses", response_model=RemnaWaveGenericSyncResponse)
 async def sync_subscription_statuses(
+    incremental: bool = Query(False),
     _: Any = Security(require_api_token),
     db: AsyncSession = Depends(get_db_session),
 ) -> RemnaWaveGenericSyncResponse:
     service = _get_service()
     _ensure_service_configured(service)
 
-    stats = await service.sync_subscription_statuses(db)
+    stats = await service.sync_subscription_statuses(db, incremental=incremental)
     detail = "Статусы подписок синхронизированы"
     return RemnaWaveGenericSyncResponse(success=True, detail=detail, data=stats)
 
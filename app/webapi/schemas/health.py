@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from pydantic import BaseModel, ConfigDict
 
 
@@ -14,6 +16,28 @@ class HealthFeatureFlags(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
 
+class DatabasePoolStatus(BaseModel):
+    """Состояние пула соединений с базой данных."""
+
+    mode: str
+    pool_class: str
+    checkouts: int
+    connects: int
+    timeouts: int
+    avg_wait_ms: float
+    max_wait_ms: float
+    avg_hold_ms: float
+    max_hold_ms: float
+    avg_connect_ms: float
+    max_connect_ms: float
+    size: Optional[int] = None
+    checked_in: Optional[int] = None
+    checked_out: Optional[int] = None
+    overflow: Optional[int] = None
+
+    model_config = ConfigDict(extra="forbid")
+
+
 class HealthCheckResponse(BaseModel):
     """Ответ на health-check административного API."""
 
@@ -21,5 +45,6 @@ class HealthCheckResponse(BaseModel):
     api_version: str
     bot_version: str | None
     features: HealthFeatureFlags
+    database_pool: Optional[DatabasePoolStatus] = None
 
     model_config = ConfigDict(extra="forbid")
@@ -171,6 +171,7 @@ class RemnaWaveUserTrafficResponse(BaseModel):
 
 class RemnaWaveSyncFromPanelRequest(BaseModel):
     mode: Literal["all", "new_only", "update_only"] = "all"
+    incremental: bool = False
 
 
 class RemnaWaveGenericSyncResponse(BaseModel):
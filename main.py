@@ -23,6 +23,8 @@ from app.services.reporting_service import reporting_service
 from app.localization.loader import ensure_locale_templates
 from app.services.system_settings_service import bot_configuration_service
 from app.services.broadcast_service import broadcast_service
+from app.services.user_activity_service import user_activity_tracker
+from app.external.remnawave_api import remnawave_session_pool
 from app.utils.startup_timeline import StartupTimeline
 
 
@@ -149,6 +151,13 @@ async def main():
             version_service.set_notification_service(admin_notification_service)
             stage.log(f"Репозиторий версий: {version_service.repo}")
             stage.log(f"Текущая версия: {version_service.current_version}")
+            try:
+                resumed_broadcasts = await broadcast_service.resume_unfinished()
+                if resumed_broadcasts:
+                    stage.log(f"Возобновлено рассылок: {resumed_broadcasts}")
+            except Exception as error:
+                stage.warning(f"Не удалось возобновить рассылки: {error}")
+                logger.error(f"❌ Не удалось возобновить рассылки: {error}")
             stage.success("Мониторинг, уведомления и рассылки подключены")
 
         async with timeline.stage(
@@ -241,6 +250,17 @@ async def main():
             else:
                 stage.skip("PayPalych отключен настройками")
 
+        async with timeline.stage(
+            "Трекер активности пользователей",
+            "🕒",
+            success_message="Трекер активности запущен",
+        ) as stage:
+            if user_activity_tracker.is_enabled():
+                await user_activity_tracker.start()
+                stage.log(f"Интервал записи: {settings.USER_ACTIVITY_FLUSH_INTERVAL}с")
+            else:
+                stage.skip("last_activity записывается сразу (USER_ACTIVITY_FLUSH_INTERVAL=0)")
+
         async with timeline.stage(
             "Служба мониторинга",
             "📈",
@@ -453,6 +473,12 @@ async def main():
             except asyncio.CancelledError:
                 pass
         
+        logger.info("ℹ️ Запись отложенной активности пользователей...")
+        try:
+            await user_activity_tracker.stop()
+        except Exception as e:
+            logger.error(f"Ошибка остановки трекера активности: {e}")
+
         if webhook_server:
             logger.info("ℹ️ Остановка webhook сервера...")
             await webhook_server.stop()
@@ -464,6 +490,12 @@ async def main():
             except Exception as error:
                 logger.error(f"Ошибка остановки веб-API: {error}")
         
+        try:
+            await remnawave_session_pool.close_all()
+            logger.info("✅ Сессии RemnaWave API закрыты")
+        except Exception as e:
+            logger.error(f"Ошибка закрытия сессий RemnaWave API: {e}")
+
         if 'bot' in locals():
             try:
                 await bot.session.close()